@@ -3,24 +3,44 @@
 from flask import Flask
 from flasgger import Swagger
 from config import Config
-import logging
 
+from .loader import DatasetLoader
 from .models import MaritimeData
+from .rules import ValidationRules
 from . import logging_config
 
 app = Flask(__name__)
 Swagger(app)
 app.config.from_object(Config)
 
-# Attempt to initialize MaritimeData
 csv_path = app.config["CSV_PATH"]
-try:
-    maritime_data = MaritimeData(csv_path)
-    # Make maritime_data accessible app-wide by storing it in app's config
-    app.config["maritime_data"] = maritime_data
-except Exception as e:
-    logging.error(f"Failed to initialize MaritimeData with CSV path {csv_path}: {e}")
-    # You might want to handle initialization failure here
+# Compile the data cleansing rules once, failing at startup if they are malformed
+validation_rules = ValidationRules.load(app.config["VALIDATION_RULES"])
+
+
+def build_maritime_data(progress):
+    """Builds the MaritimeData instance served by the application."""
+    return MaritimeData(
+        csv_path,
+        cache_dir=app.config["CACHE_DIR"],
+        chunk_mb=app.config["INGEST_CHUNK_MB"],
+        workers=app.config["INGEST_WORKERS"],
+        progress=progress,
+        outlier_mode=app.config["OUTLIER_MODE"],
+        validation_rules=validation_rules,
+        validation_workers=app.config["VALIDATION_WORKERS"],
+    )
+
+
+# Load MaritimeData in the background so that the application can answer health
+# checks while the dataset is being built. Make the loader accessible app-wide by
+# storing it in app's config. The entry point starts it (see run.py), so that importing
+# the package, as the tests and the worker processes of the parallel CSV parser do,
+# does not load the dataset.
+dataset_loader = DatasetLoader(
+    build_maritime_data, poll_seconds=app.config["APPEND_POLL_SECONDS"]
+)
+app.config["dataset_loader"] = dataset_loader
 
 # Import views to ensure view functions are registered with the Flask app instance
 from . import views
@@ -0,0 +1,604 @@
+"""
+Module implementing the on-disk columnar cache for parsed maritime datasets.
+
+Parsing the quoted vessel CSV dominates application start-up, so the parsed columns are
+persisted as one NumPy ``.npy`` file per column the first time a CSV is loaded. Later
+starts memory-map those files instead of parsing the CSV again. Cache entries are keyed
+on the size, modification time and SHA-256 content hash of the source CSV and are
+rebuilt automatically whenever the source changes. A directory of partitions is keyed
+on the total size, latest modification time and combined hash of its partition files.
+
+The results of data cleansing (the per-row validation flags, from which the invalid
+data summary is derived, and the outlier statistics) are stored in the same entry,
+versioned by a hash of the filter configuration, so that warm starts can also skip
+re-running the filters. The filtered data are the raw rows without any flag, so they are
+not stored separately: every process serving the same cache attaches one shared,
+read-only copy of the raw columns through the page cache.
+
+The outputs of the individual validation stages (see :mod:`app.pipeline`) are stored in
+the entry as well, addressed by their content hash, so that changed validation rules
+only recompute the stages they affect. Like the filter results, they are removed with
+the columns when the source changes. Readers pass the content hash of the version they
+loaded, so that outputs computed on an older version are never stored with a newer one
+cached meanwhile by another process.
+
+Arrays computed from the raw columns alone, such as the sorted row positions of the
+per-vessel index, are stored in the entry too and memory-mapped on warm starts, so that
+worker processes share them like the columns instead of each computing a private copy.
+"""
+
+from contextlib import contextmanager
+import hashlib
+import json
+import logging
+import os
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .outliers import OutlierStats, RunningStats
+from .partitions import directory_stat, is_partitioned, list_partition_files
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not available on Windows
+    fcntl = None
+
+# Bump when the on-disk layout changes so that stale entries are rebuilt
+CACHE_FORMAT_VERSION = 6
+META_FILE = "meta.json"
+LOCK_FILE = ".lock"
+HASH_BLOCK_SIZE = 1 << 20
+
+
+class FilterResult(NamedTuple):
+    """
+    Result of the data cleansing filters as stored in the cache.
+
+    :ivar flags: Per-row bitmask of the failed checks, 0 for rows that passed all filters.
+    :ivar outlier_stats: Center and scale used by each outlier check.
+    :ivar running_stats: Running statistics of each outlier check, None in the outlier
+        modes without running statistics.
+    """
+
+    flags: np.ndarray
+    outlier_stats: Dict[str, OutlierStats]
+    running_stats: Optional[Dict[str, RunningStats]] = None
+
+
+class StageOutput(NamedTuple):
+    """
+    Output of a validation stage as stored in the cache.
+
+    :ivar array: The array computed by the stage, if any.
+    :ivar summary: The JSON-serializable values computed by the stage, if any.
+    """
+
+    array: Optional[np.ndarray]
+    summary: Optional[Dict[str, Any]]
+
+
+def file_sha256(path: str) -> str:
+    """
+    Computes the SHA-256 hex digest of a file, reading it in fixed-size blocks.
+
+    :param path: Path to the file to hash.
+    :return: The hex digest of the file contents.
+    :rtype: str
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(HASH_BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def source_sha256(path: str) -> str:
+    """
+    Computes the SHA-256 hex digest of a dataset, a CSV file or a directory of partitions.
+
+    The digest of a directory covers the relative path and content of every partition.
+
+    :param path: Path to the CSV file or dataset directory.
+    :return: The hex digest of the dataset contents.
+    :rtype: str
+    """
+    if not is_partitioned(path):
+        return file_sha256(path)
+    digest = hashlib.sha256()
+    for name in list_partition_files(path):
+        digest.update(name.encode("utf-8"))
+        digest.update(file_sha256(os.path.join(path, name)).encode("ascii"))
+    return digest.hexdigest()
+
+
+def source_stat(path: str) -> Tuple[int, int]:
+    """
+    Returns the size and modification time of a dataset, a CSV file or a directory.
+
+    :param path: Path to the CSV file or dataset directory.
+    :return: The size in bytes and mtime in nanoseconds.
+    :rtype: Tuple[int, int]
+    """
+    if is_partitioned(path):
+        return directory_stat(path)
+    stat = os.stat(path)
+    return stat.st_size, stat.st_mtime_ns
+
+
+def config_hash(config: Dict[str, Any]) -> str:
+    """
+    Computes a stable short hash of a JSON-serializable configuration dictionary.
+
+    :param config: The configuration to hash.
+    :return: The first 16 hex characters of the SHA-256 of the canonical JSON encoding.
+    :rtype: str
+    """
+    canonical = json.dumps(config, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:16]
+
+
+def _atomic_write_bytes(path: str, payload: bytes) -> None:
+    """Writes ``payload`` to ``path`` through a temporary file and an atomic rename."""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as file:
+        file.write(payload)
+    os.replace(tmp_path, path)
+
+
+def _atomic_save_array(path: str, array: np.ndarray) -> None:
+    """Saves ``array`` as a ``.npy`` file through a temporary file and an atomic rename."""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as file:
+        np.save(file, array)
+    os.replace(tmp_path, path)
+
+
+def _map_frame(base: str, columns: List[str]) -> pd.DataFrame:
+    """
+    Assembles a DataFrame from memory-mapped ``{base}.{column}.npy`` files without copying.
+
+    Every column keeps referencing its read-only mapping, so processes mapping the same
+    files share the underlying pages.
+
+    :param base: Path prefix of the column files.
+    :param columns: Names of the columns to map, in order.
+    :return: The memory-mapped DataFrame.
+    :rtype: pd.DataFrame
+    """
+    arrays = {name: np.load(f"{base}.{name}.npy", mmap_mode="r") for name in columns}
+    return pd.DataFrame(arrays, columns=columns, copy=False)
+
+
+class DatasetCache:
+    """
+    Stores parsed maritime datasets as memory-mappable NumPy column files.
+
+    Each source CSV gets its own entry directory below ``cache_dir``. An entry holds a
+    ``meta.json`` file describing the source (size, mtime and content hash) and the
+    column layout, plus one ``.npy`` file per column. Column files are prefixed with the
+    content hash so that a reader never mixes columns from two versions of the source.
+
+    :param cache_dir: Directory in which cache entries are stored.
+    :type cache_dir: str
+    :param schema: The schema the CSV is parsed with. Entries written with a different
+        schema are treated as stale.
+    :type schema: Optional[Dict[str, str]]
+    """
+
+    def __init__(self, cache_dir: str, schema: Optional[Dict[str, str]] = None) -> None:
+        """
+        Initializes the cache rooted at ``cache_dir``.
+        """
+        self.cache_dir = cache_dir
+        self.schema_hash = config_hash(schema or {})
+
+    def entry_dir(self, csv_path: str) -> str:
+        """
+        Returns the directory holding the cache entry for a source CSV.
+
+        :param csv_path: Path to the source CSV file.
+        :return: Path of the entry directory.
+        :rtype: str
+        """
+        abs_path = os.path.abspath(csv_path)
+        stem = os.path.splitext(os.path.basename(abs_path))[0]
+        path_hash = hashlib.sha256(abs_path.encode("utf-8")).hexdigest()[:12]
+        return os.path.join(self.cache_dir, f"{stem}-{path_hash}")
+
+    @contextmanager
+    def lock(self, csv_path: str) -> Iterator[None]:
+        """
+        Holds an exclusive inter-process lock on the cache entry of a CSV.
+
+        Loading under this lock ensures that when several worker processes start at
+        once, only the first one parses the CSV and builds the cache while the others
+        wait and then attach to the result. Locking is skipped where ``fcntl`` is not
+        available or the lock file cannot be created.
+
+        :param csv_path: Path to the source CSV file.
+        :return: A context manager holding the lock.
+        :rtype: Iterator[None]
+        """
+        lock_file = None
+        if fcntl is not None:
+            try:
+                entry_dir = self.entry_dir(csv_path)
+                os.makedirs(entry_dir, exist_ok=True)
+                # pylint: disable-next=consider-using-with
+                lock_file = open(
+                    os.path.join(entry_dir, LOCK_FILE), "a", encoding="utf-8"
+                )
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            except OSError as e:
+                logging.warning(f"Loading without the dataset cache lock: {e}")
+        try:
+            yield
+        finally:
+            if lock_file is not None:
+                lock_file.close()
+
+    @staticmethod
+    def source_key(csv_path: str, content_hash: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Builds the key identifying a version of the source CSV.
+
+        :param csv_path: Path to the source CSV file.
+        :param content_hash: Precomputed content hash, computed from the file if omitted.
+        :return: Dictionary with the size, mtime and content hash of the file.
+        :rtype: Dict[str, Any]
+        """
+        size, mtime_ns = source_stat(csv_path)
+        return {
+            "size": size,
+            "mtime_ns": mtime_ns,
+            "sha256": content_hash or source_sha256(csv_path),
+        }
+
+    def _read_meta(self, entry_dir: str) -> Optional[Dict[str, Any]]:
+        """Reads the metadata of a cache entry, returning None if it is absent or corrupt."""
+        try:
+            with open(os.path.join(entry_dir, META_FILE), encoding="utf-8") as file:
+                meta = json.load(file)
+        except (OSError, ValueError):
+            return None
+        if meta.get("format_version") != CACHE_FORMAT_VERSION:
+            return None
+        if meta.get("schema") != self.schema_hash:
+            return None
+        return meta
+
+    def _write_meta(self, entry_dir: str, meta: Dict[str, Any]) -> None:
+        """Atomically writes the metadata of a cache entry."""
+        _atomic_write_bytes(
+            os.path.join(entry_dir, META_FILE),
+            json.dumps(meta, indent=2).encode("utf-8"),
+        )
+
+    def lookup(self, csv_path: str) -> Optional[Dict[str, Any]]:
+        """
+        Returns the metadata of a valid cache entry for the current version of the CSV.
+
+        Size and mtime are checked first; the content hash is only computed when they
+        differ from the stored key. If the content is unchanged (for example after a
+        ``touch`` or a fresh checkout) the stored key is refreshed and the entry reused.
+
+        :param csv_path: Path to the source CSV file.
+        :return: The entry metadata, or None if there is no valid entry.
+        :rtype: Optional[Dict[str, Any]]
+        """
+        entry_dir = self.entry_dir(csv_path)
+        meta = self._read_meta(entry_dir)
+        if meta is None:
+            return None
+
+        size, mtime_ns = source_stat(csv_path)
+        stored = meta["source"]
+        if stored["size"] == size and stored["mtime_ns"] == mtime_ns:
+            return meta
+        if stored["size"] != size:
+            return None
+
+        content_hash = source_sha256(csv_path)
+        if content_hash != stored["sha256"]:
+            return None
+        meta["source"] = self.source_key(csv_path, content_hash)
+        try:
+            self._write_meta(entry_dir, meta)
+        except OSError as e:
+            logging.warning(f"Could not refresh cache metadata in {entry_dir}: {e}")
+        return meta
+
+    def load_frame(self, csv_path: str) -> Optional[pd.DataFrame]:
+        """
+        Loads the cached DataFrame for a CSV if a valid cache entry exists.
+
+        Column files are memory-mapped read-only and assembled without copying into a
+        DataFrame with the same column order and dtypes as the originally parsed frame.
+
+        :param csv_path: Path to the source CSV file.
+        :return: The cached DataFrame, or None on a cache miss.
+        :rtype: Optional[pd.DataFrame]
+        """
+        try:
+            meta = self.lookup(csv_path)
+            if meta is None:
+                return None
+            prefix = meta["source"]["sha256"][:16]
+            df = _map_frame(
+                os.path.join(self.entry_dir(csv_path), prefix), meta["columns"]
+            )
+            logging.info(f"Mapped {len(df)} rows for {csv_path} from the dataset cache")
+            return df
+        except (OSError, ValueError, KeyError) as e:
+            logging.warning(f"Ignoring unreadable dataset cache for {csv_path}: {e}")
+            return None
+
+    def store_frame(self, csv_path: str, df: pd.DataFrame) -> None:
+        """
+        Persists a parsed DataFrame as the cache entry for a CSV.
+
+        Frames with object columns are not cached since they cannot be memory-mapped.
+        Failures are logged and never propagated, as the cache is only an optimization.
+
+        :param csv_path: Path to the source CSV file the frame was parsed from.
+        :param df: The parsed DataFrame.
+        :return: None
+        """
+        object_columns = [c for c in df.columns if df[c].dtype == "object"]
+        if df.empty or object_columns:
+            logging.info(
+                f"Skipping dataset cache for {csv_path}; object columns: {object_columns}"
+            )
+            return
+
+        entry_dir = self.entry_dir(csv_path)
+        try:
+            os.makedirs(entry_dir, exist_ok=True)
+            source = self.source_key(csv_path)
+            prefix = source["sha256"][:16]
+            for name in df.columns:
+                _atomic_save_array(
+                    os.path.join(entry_dir, f"{prefix}.{name}.npy"), df[name].to_numpy()
+                )
+            self._write_meta(
+                entry_dir,
+                {
+                    "format_version": CACHE_FORMAT_VERSION,
+                    "schema": self.schema_hash,
+                    "source": source,
+                    "columns": list(df.columns),
+                },
+            )
+            self._remove_stale_files(entry_dir, prefix)
+            logging.info(f"Stored dataset cache for {csv_path} in {entry_dir}")
+        except OSError as e:
+            logging.warning(f"Failed to store dataset cache for {csv_path}: {e}")
+
+    def _filter_base(
+        self, csv_path: str, meta: Dict[str, Any], filter_config: Dict[str, Any]
+    ) -> str:
+        """Returns the path prefix of the files of a filter result."""
+        prefix = meta["source"]["sha256"][:16]
+        return os.path.join(
+            self.entry_dir(csv_path), f"{prefix}.filters-{config_hash(filter_config)}"
+        )
+
+    def load_filter_result(
+        self, csv_path: str, filter_config: Dict[str, Any]
+    ) -> Optional[FilterResult]:
+        """
+        Loads the stored cleansing result for a CSV and filter configuration.
+
+        :param csv_path: Path to the source CSV file.
+        :param filter_config: The configuration the filters were run with.
+        :return: The stored result, with the flags memory-mapped, or None on a cache
+                miss.
+        :rtype: Optional[FilterResult]
+        """
+        try:
+            meta = self.lookup(csv_path)
+            if meta is None:
+                return None
+            base = self._filter_base(csv_path, meta, filter_config)
+            if not os.path.exists(f"{base}.flags.npy"):
+                return None
+            flags = np.load(f"{base}.flags.npy", mmap_mode="r")
+            with open(f"{base}.summary.json", encoding="utf-8") as file:
+                summary = json.load(file)
+            outlier_stats = {
+                column: OutlierStats.from_dict(values)
+                for column, values in summary["outlier_stats"].items()
+            }
+            running_stats = {
+                column: RunningStats.from_dict(values)
+                for column, values in summary["running_stats"].items()
+            }
+            logging.info(f"Loaded cached filter results for {csv_path}")
+            return FilterResult(flags, outlier_stats, running_stats)
+        except (OSError, ValueError, KeyError) as e:
+            logging.warning(f"Ignoring unreadable filter cache for {csv_path}: {e}")
+            return None
+
+    def store_filter_result(
+        self, csv_path: str, filter_config: Dict[str, Any], result: FilterResult
+    ) -> None:
+        """
+        Persists the cleansing result for a CSV and filter configuration.
+
+        :param csv_path: Path to the source CSV file.
+        :param filter_config: The configuration the filters were run with.
+        :param result: The cleansing result to store.
+        :return: None
+        """
+        try:
+            meta = self.lookup(csv_path)
+            if meta is None:
+                return
+            base = self._filter_base(csv_path, meta, filter_config)
+            summary = {
+                "outlier_stats": {
+                    column: statistics.to_dict()
+                    for column, statistics in result.outlier_stats.items()
+                },
+                "running_stats": {
+                    column: statistics.to_dict()
+                    for column, statistics in (result.running_stats or {}).items()
+                },
+            }
+            _atomic_write_bytes(
+                f"{base}.summary.json", json.dumps(summary).encode("utf-8")
+            )
+            # The flags are written last as their presence marks a complete result
+            _atomic_save_array(f"{base}.flags.npy", np.asarray(result.flags))
+            logging.info(f"Stored filter results for {csv_path}")
+        except OSError as e:
+            logging.warning(f"Failed to store filter results for {csv_path}: {e}")
+
+    def _stage_base(
+        self,
+        csv_path: str,
+        key: str,
+        kind: str = "stage",
+        source_sha: Optional[str] = None,
+    ) -> Optional[str]:
+        """
+        Returns the path prefix of the files of a stage output, None on a miss or if the
+        entry holds another version than ``source_sha``.
+        """
+        meta = self.lookup(csv_path)
+        if meta is None:
+            return None
+        content_hash = meta["source"]["sha256"]
+        if source_sha is not None and content_hash != source_sha:
+            return None
+        return os.path.join(
+            self.entry_dir(csv_path), f"{content_hash[:16]}.{kind}-{key}"
+        )
+
+    def load_stage(
+        self, csv_path: str, key: str, source_sha: Optional[str] = None
+    ) -> Optional[StageOutput]:
+        """
+        Loads the stored output of a validation stage computed on the cached dataset.
+
+        :param csv_path: Path to the source CSV file.
+        :param key: The content address of the stage.
+        :param source_sha: Content hash of the version of the dataset the output is
+            needed for, or None for the version currently cached.
+        :return: The stored output, or None on a cache miss or if the cache holds
+                another version of the dataset.
+        :rtype: Optional[StageOutput]
+        """
+        try:
+            base = self._stage_base(csv_path, key, source_sha=source_sha)
+            if base is None or not os.path.exists(f"{base}.json"):
+                return None
+            with open(f"{base}.json", encoding="utf-8") as file:
+                stored = json.load(file)
+            array = np.load(f"{base}.npy") if stored["array"] else None
+            return StageOutput(array, stored["summary"])
+        except (OSError, ValueError, KeyError) as e:
+            logging.warning(f"Ignoring unreadable stage {key} for {csv_path}: {e}")
+            return None
+
+    def store_stage(
+        self,
+        csv_path: str,
+        key: str,
+        output: StageOutput,
+        source_sha: Optional[str] = None,
+    ) -> None:
+        """
+        Persists the output of a validation stage computed on the cached dataset.
+
+        :param csv_path: Path to the source CSV file.
+        :param key: The content address of the stage.
+        :param output: The array and JSON-serializable values computed by the stage.
+        :param source_sha: Content hash of the version of the dataset the output was
+            computed on, or None for the version currently cached. Nothing is stored if
+            the cache holds another version.
+        :return: None
+        """
+        try:
+            base = self._stage_base(csv_path, key, source_sha=source_sha)
+            if base is None:
+                return
+            if output.array is not None:
+                _atomic_save_array(f"{base}.npy", np.asarray(output.array))
+            # The description is written last as its presence marks a complete output
+            description = {"array": output.array is not None, "summary": output.summary}
+            _atomic_write_bytes(f"{base}.json", json.dumps(description).encode("utf-8"))
+        except OSError as e:
+            logging.warning(f"Failed to store stage {key} for {csv_path}: {e}")
+
+    def load_arrays(
+        self, csv_path: str, name: str, source_sha: Optional[str] = None
+    ) -> Optional[Dict[str, np.ndarray]]:
+        """
+        Loads a set of arrays computed from the cached dataset.
+
+        :param csv_path: Path to the source CSV file.
+        :param name: Name of the set of arrays, e.g. 'vessel_index'.
+        :param source_sha: Content hash of the version of the dataset the arrays are
+            needed for, or None for the version currently cached.
+        :return: The arrays by name, memory-mapped read-only, or None on a cache miss or
+                if the cache holds another version of the dataset.
+        :rtype: Optional[Dict[str, np.ndarray]]
+        """
+        try:
+            base = self._stage_base(csv_path, name, "arrays", source_sha)
+            if base is None or not os.path.exists(f"{base}.json"):
+                return None
+            with open(f"{base}.json", encoding="utf-8") as file:
+                names = json.load(file)["arrays"]
+            arrays = {
+                array: np.load(f"{base}.{array}.npy", mmap_mode="r") for array in names
+            }
+            logging.info(f"Mapped the cached {name} arrays for {csv_path}")
+            return arrays
+        except (OSError, ValueError, KeyError) as e:
+            logging.warning(f"Ignoring unreadable {name} arrays for {csv_path}: {e}")
+            return None
+
+    def store_arrays(
+        self,
+        csv_path: str,
+        name: str,
+        arrays: Dict[str, np.ndarray],
+        source_sha: Optional[str] = None,
+    ) -> None:
+        """
+        Persists a set of arrays computed from the cached dataset.
+
+        :param csv_path: Path to the source CSV file.
+        :param name: Name of the set of arrays, e.g. 'vessel_index'.
+        :param arrays: The arrays by name.
+        :param source_sha: Content hash of the version of the dataset the arrays were
+            computed from, or None for the version currently cached. Nothing is stored
+            if the cache holds another version.
+        :return: None
+        """
+        try:
+            base = self._stage_base(csv_path, name, "arrays", source_sha)
+            if base is None:
+                return
+            for array, values in arrays.items():
+                _atomic_save_array(f"{base}.{array}.npy", np.asarray(values))
+            # The description is written last as its presence marks complete arrays
+            _atomic_write_bytes(
+                f"{base}.json", json.dumps({"arrays": list(arrays)}).encode("utf-8")
+            )
+        except OSError as e:
+            logging.warning(f"Failed to store {name} arrays for {csv_path}: {e}")
+
+    @staticmethod
+    def _remove_stale_files(entry_dir: str, prefix: str) -> None:
+        """Deletes files that belong to previous versions of the source CSV."""
+        for name in os.listdir(entry_dir):
+            if name not in (META_FILE, LOCK_FILE) and not name.startswith(f"{prefix}."):
+                try:
+                    os.remove(os.path.join(entry_dir, name))
+                except OSError:
+                    pass
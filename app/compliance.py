@@ -0,0 +1,217 @@
+"""
+Module implementing the per-vessel summary of speed compliance.
+
+The compliance score of a vessel is 100 minus the mean percentage deviation of its actual
+speed from the proposed speed over its valid rows, leaving out those with a proposed
+speed of zero. The number of valid rows of every vessel and the count and sum of their
+percentage deviations are sufficient to compute it, so they are aggregated for all
+vessels in a single vectorized group-by when the dataset is validated, and merged with
+those of appended rows as they are ingested. The scores are precomputed per vessel so
+that compliance requests are plain lookups.
+
+The fleet leaderboard ranks the scores of all vessels at once, from the same statistics
+or, over a period, from those of the valid rows within it aggregated in one pass. Ranked
+leaderboards are cached per dataset version and period.
+"""
+
+from collections import OrderedDict
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Maximum number of leaderboards kept in memory, least recently used first out
+MAX_LEADERBOARD_ENTRIES = 64
+
+
+class ComplianceSummary:
+    """
+    Sufficient statistics of the compliance score of every vessel.
+
+    :param vessel_codes: The sorted vessel codes with at least one valid row.
+    :type vessel_codes: np.ndarray
+    :param rows: Number of valid rows of each vessel.
+    :type rows: np.ndarray
+    :param counts: Number of valid rows of each vessel with a percentage deviation.
+    :type counts: np.ndarray
+    :param sums: Sum of the percentage deviations of those rows.
+    :type sums: np.ndarray
+    """
+
+    def __init__(
+        self,
+        vessel_codes: np.ndarray,
+        rows: np.ndarray,
+        counts: np.ndarray,
+        sums: np.ndarray,
+    ) -> None:
+        """
+        Initializes the summary and precomputes the score of every vessel.
+        """
+        self.vessel_codes = np.asarray(vessel_codes)
+        self.rows = np.asarray(rows, dtype=np.int64)
+        self.counts = np.asarray(counts, dtype=np.int64)
+        self.sums = np.asarray(sums, dtype=np.float64)
+        self._scores: Dict[Any, float] = dict(
+            zip(self.vessel_codes.tolist(), self.scores().tolist())
+        )
+
+    @classmethod
+    def from_rows(
+        cls, vessel_codes: np.ndarray, deviations: np.ndarray, valid: np.ndarray
+    ) -> "ComplianceSummary":
+        """
+        Aggregates the valid rows of every vessel in one group-by.
+
+        Rows without a vessel code are not aggregated, like in a pandas group-by.
+
+        :param vessel_codes: Vessel code of each row.
+        :param deviations: Percentage deviation of the actual speed of each row from
+                the proposed speed, NaN if the proposed speed is zero.
+        :param valid: Whether each row passed all checks.
+        :return: The summary.
+        :rtype: ComplianceSummary
+        """
+        vessel_index, unique_codes = pd.factorize(vessel_codes[valid], sort=True)
+        deviations = deviations[valid]
+        counted = vessel_index >= 0
+        scored = counted & ~np.isnan(deviations)
+        counts = np.bincount(vessel_index[scored], minlength=len(unique_codes))
+        # Sum the deviations of every vessel as one contiguous block in dataset order,
+        # so that NumPy sums them pairwise like the pandas mean of the vessel's rows;
+        # np.bincount would add them one after the other and round differently
+        order = np.argsort(vessel_index[scored], kind="stable")
+        blocks = np.split(deviations[scored][order], np.cumsum(counts)[:-1])
+        return cls(
+            np.asarray(unique_codes),
+            np.bincount(vessel_index[counted], minlength=len(unique_codes)),
+            counts,
+            np.array([block.sum() for block in blocks[: len(unique_codes)]]),
+        )
+
+    def merge(self, other: "ComplianceSummary") -> "ComplianceSummary":
+        """
+        Adds the statistics of another summary.
+
+        :param other: The summary to add.
+        :return: A new summary with the statistics of both.
+        :rtype: ComplianceSummary
+        """
+        vessel_codes = np.union1d(self.vessel_codes, other.vessel_codes)
+        rows = np.zeros(len(vessel_codes), dtype=np.int64)
+        counts = np.zeros(len(vessel_codes), dtype=np.int64)
+        sums = np.zeros(len(vessel_codes), dtype=np.float64)
+        for summary in (self, other):
+            positions = np.searchsorted(vessel_codes, summary.vessel_codes)
+            rows[positions] += summary.rows
+            counts[positions] += summary.counts
+            sums[positions] += summary.sums
+        return ComplianceSummary(vessel_codes, rows, counts, sums)
+
+    def scores(self) -> np.ndarray:
+        """
+        Computes the compliance score of every vessel of :attr:`vessel_codes`.
+
+        :return: The scores, rounded to two decimal places like a single score, 0 for
+                the vessels without a row to score.
+        :rtype: np.ndarray
+        """
+        scores = np.zeros(len(self.vessel_codes))
+        scored = self.counts > 0
+        scores[scored] = 100 - self.sums[scored] / self.counts[scored]
+        # Python rounding is exact where np.round can round a half-way value down
+        return np.array([round(score, 2) for score in scores.tolist()])
+
+    def __contains__(self, vessel_code: Any) -> bool:
+        """Whether the vessel has at least one valid row."""
+        return vessel_code in self._scores
+
+    def score(self, vessel_code: Any) -> float:
+        """
+        Returns the precomputed compliance score of a vessel.
+
+        :param vessel_code: The unique identifier for the vessel.
+        :return: The score rounded to two decimal places, or 0 if the vessel has no
+                valid row with a proposed speed.
+        :rtype: float
+        """
+        return self._scores.get(vessel_code, 0.0)
+
+
+def rank_vessels(summary: ComplianceSummary) -> pd.DataFrame:
+    """
+    Ranks the vessels of a summary by decreasing compliance score.
+
+    Vessels with the same score share the best rank of the group, and are listed by
+    vessel code. The percentile of a vessel is the percentage of the vessels whose score
+    is lower than or equal to its own.
+
+    :param summary: The compliance statistics of the vessels to rank.
+    :return: One row per vessel with its rank, vessel code, compliance score, percentile
+            and number of rows scored, best first.
+    :rtype: pd.DataFrame
+    """
+    leaderboard = pd.DataFrame(
+        {
+            "vessel_code": summary.vessel_codes,
+            "compliance_score": summary.scores(),
+            "scored_rows": summary.counts,
+        }
+    )
+    scores = leaderboard["compliance_score"]
+    leaderboard.insert(
+        0, "rank", scores.rank(method="min", ascending=False).astype(np.int64)
+    )
+    leaderboard.insert(
+        3, "percentile", (scores.rank(method="max", pct=True) * 100).round(2)
+    )
+    return leaderboard.sort_values(
+        ["rank", "vessel_code"], kind="stable", ignore_index=True
+    )
+
+
+class LeaderboardCache:
+    """
+    Leaderboards computed on the versions of a dataset, up to
+    :data:`MAX_LEADERBOARD_ENTRIES` of them, least recently used first out.
+
+    Entries are keyed by the dataset version and the bounds of the period, so the cache
+    can be shared by the snapshots derived from one another: a snapshot never reads the
+    leaderboards of another version. It is safe to use from several threads.
+    """
+
+    def __init__(self) -> None:
+        """
+        Initializes an empty cache.
+        """
+        self._entries: "OrderedDict[Tuple[Any, ...], pd.DataFrame]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Tuple[Any, ...]) -> Optional[pd.DataFrame]:
+        """
+        Retrieves a leaderboard.
+
+        :param key: The dataset version and the bounds of the period.
+        :return: The leaderboard, or None if it was not computed or was evicted.
+        :rtype: Optional[pd.DataFrame]
+        """
+        with self._lock:
+            if key not in self._entries:
+                return None
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def put(self, key: Tuple[Any, ...], leaderboard: pd.DataFrame) -> None:
+        """
+        Stores a leaderboard, evicting the least recently used ones.
+
+        :param key: The dataset version and the bounds of the period.
+        :param leaderboard: The leaderboard, which must not be mutated afterwards.
+        :return: None
+        """
+        with self._lock:
+            self._entries[key] = leaderboard
+            self._entries.move_to_end(key)
+            while len(self._entries) > MAX_LEADERBOARD_ENTRIES:
+                self._entries.popitem(last=False)
@@ -1,27 +1,33 @@
 """This module contains the analyzing data. This will be used to cover the BONUS section of the assignment"""
 
+from typing import Optional
+
 import pandas as pd
-from scipy import stats
 
 from . import app
+from .outliers import outlier_mask
+from .partitions import read_vessel_data
 
 csv_path = app.config["CSV_PATH"]
 
 
 class DataAnalyzer:
-    """Analyzes data from a CSV file."""
+    """Analyzes data from a CSV file, or from rows of the loaded dataset."""
 
-    def __init__(self):
-        """Initializes the DataAnalyzer with a DataFrame."""
-        self.dataframe = pd.read_csv(csv_path)
+    def __init__(self, dataframe: Optional[pd.DataFrame] = None):
+        """Initializes the DataAnalyzer with a DataFrame, read from the CSV if None."""
+        if dataframe is None:
+            dataframe = read_vessel_data(csv_path, workers=app.config["INGEST_WORKERS"])
+        self.dataframe = dataframe
+        # Outlier masks per column, computed once for all vessels in the configured mode
+        self._outlier_masks = {}
 
     def detect_consecutive_problems(self, column_name, problem_type="missing_values"):
         """Identifies groups of consecutive waypoints with problematic data."""
         if problem_type == "missing_values":
             problem_mask = self.dataframe[column_name].isna()
         elif problem_type == "outliers":
-            z_scores = stats.zscore(self.dataframe[column_name].dropna())
-            problem_mask = abs(z_scores) > 2
+            problem_mask = self.get_outlier_mask(column_name)
         else:
             raise ValueError("Unsupported problem type specified.")
 
@@ -37,6 +43,18 @@ class DataAnalyzer:
         sorted_groups = problematic_groups.sort_values(ascending=False)
         return sorted_groups
 
+    def get_outlier_mask(self, column_name, threshold=2):
+        """Flags the outliers of a column in the configured outlier mode."""
+        key = (column_name, threshold)
+        if key not in self._outlier_masks:
+            self._outlier_masks[key] = outlier_mask(
+                self.dataframe[column_name],
+                self.dataframe["vessel_code"],
+                app.config["OUTLIER_MODE"],
+                threshold,
+            )[0]
+        return self._outlier_masks[key]
+
     def get_problematic_data_summary(self, column_name, problem_type="missing_values"):
         """Returns a summary of problematic data groups for a specific column."""
         sorted_groups = self.detect_consecutive_problems(column_name, problem_type)
@@ -60,3 +78,4 @@ class DataAnalyzer:
     def filter_by_vessel(self, vessel_code):
         """Filters the dataframe for a specific vessel code."""
         self.dataframe = self.dataframe[self.dataframe["vessel_code"] == vessel_code]
+        self._outlier_masks = {}
@@ -0,0 +1,336 @@
+"""
+Module defining the state of a dataset loaded by :class:`~app.models.MaritimeData`.
+
+The state is split into immutable parts: the rows with the arrays computed from them,
+the summaries served by the API and what was ingested from the dataset source. The
+parts are replaced rather than mutated as the data change, so that reloads, appended
+rows and new rules can be applied to a shallow copy of a published instance while the
+original keeps serving requests (see :mod:`app.loader`).
+"""
+
+import os
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .cache import config_hash
+from .compliance import ComplianceSummary, LeaderboardCache
+from .derived import DERIVED_COLUMNS, append_columns, derive_columns
+from .ingest import prefix_digest
+from .invalid_data import InvalidDataSummary
+from .partitions import directory_stat, is_partitioned, source_fingerprint
+from .pipeline import StageStore
+from .vessel_index import VesselIndex
+
+
+class DatasetRows(NamedTuple):
+    """
+    The rows of a dataset and the per-row arrays computed from them.
+
+    :ivar raw_data: The rows as loaded, valid or not.
+    :ivar flags: Per-row validation flags, bit ``i`` set when check ``i`` of the
+        validation rules fails (see :mod:`app.pipeline`).
+    :ivar vessel_index: Row positions of every vessel in chronological order, located
+        without scanning the fleet; None if the data cannot be indexed.
+    :ivar derived_columns: Metrics derived from the base columns of every row, computed
+        once at load and extended as rows are appended (see :mod:`app.derived`).
+    """
+
+    raw_data: pd.DataFrame
+    flags: np.ndarray
+    vessel_index: Optional[VesselIndex]
+    derived_columns: Dict[str, np.ndarray]
+
+    def with_vessel_index(self, stage_store: StageStore) -> "DatasetRows":
+        """
+        Sorts the row positions of every vessel by timestamp into the vessel index.
+
+        The arrays of the index are memory-mapped from the cache when it holds them for
+        the loaded data, so that worker processes share them, and stored there
+        otherwise.
+
+        :param stage_store: The stage outputs of this version of the rows.
+        :return: The rows with their vessel index.
+        :rtype: DatasetRows
+        """
+        cached = (
+            None if self.raw_data.empty else stage_store.load_arrays("vessel_index")
+        )
+        if self.raw_data.empty:
+            vessel_index = None
+        elif cached is not None and len(cached["order"]) == len(self.raw_data):
+            vessel_index = VesselIndex(**cached)
+        else:
+            vessel_index = VesselIndex.build(
+                self.raw_data["vessel_code"].to_numpy(),
+                self.raw_data["datetime"].to_numpy(),
+            )
+            if vessel_index is not None:
+                stage_store.store_arrays(
+                    "vessel_index",
+                    {name: getattr(vessel_index, name) for name in VesselIndex.ARRAYS},
+                )
+        return DatasetRows(
+            self.raw_data, self.flags, vessel_index, self.derived_columns
+        )
+
+    def with_derived_columns(self, stage_store: StageStore) -> "DatasetRows":
+        """
+        Computes the derived columns of every row.
+
+        Like the arrays of the vessel index, the derived columns are memory-mapped from
+        the cache when it holds them for the loaded data, and stored there otherwise.
+
+        :param stage_store: The stage outputs of this version of the rows.
+        :return: The rows with their derived columns.
+        :rtype: DatasetRows
+        """
+        derived_columns = stage_store.load_arrays("derived_columns")
+        if (
+            derived_columns is None
+            or set(derived_columns) != set(DERIVED_COLUMNS)
+            or any(
+                len(values) != len(self.raw_data) for values in derived_columns.values()
+            )
+        ):
+            derived_columns = derive_columns(self.raw_data)
+            stage_store.store_arrays("derived_columns", derived_columns)
+        return DatasetRows(
+            self.raw_data, self.flags, self.vessel_index, derived_columns
+        )
+
+    def append(self, new_rows: pd.DataFrame, flags: np.ndarray) -> "DatasetRows":
+        """
+        Appends validated rows, extending the derived columns and vessel index.
+
+        :param new_rows: The rows to append, indexed after the last row.
+        :param flags: The validation flags of the rows to append.
+        :return: The rows with the new rows appended.
+        :rtype: DatasetRows
+        """
+        rows = DatasetRows(
+            pd.concat([self.raw_data, new_rows]),
+            np.concatenate([self.flags, flags]),
+            self.vessel_index,
+            append_columns(self.derived_columns, new_rows),
+        )
+        if self.vessel_index is None:
+            return rows.with_vessel_index(StageStore())
+        return DatasetRows(
+            rows.raw_data,
+            rows.flags,
+            self.vessel_index.append(
+                new_rows["vessel_code"].to_numpy(),
+                new_rows["datetime"].to_numpy(),
+                len(self.raw_data),
+            ),
+            rows.derived_columns,
+        )
+
+
+class Summaries(NamedTuple):
+    """
+    Aggregates of the rows served by the API.
+
+    :ivar invalid: Counts of invalid rows per vessel and check.
+    :ivar compliance: Sufficient statistics of the compliance score of every vessel
+        (see :mod:`app.compliance`).
+    :ivar leaderboards: Fleet compliance leaderboards keyed by dataset version and
+        period, shared with the snapshots derived from the instance that created them.
+    """
+
+    invalid: InvalidDataSummary
+    compliance: ComplianceSummary
+    leaderboards: LeaderboardCache
+
+    def merge_rows(
+        self,
+        rules: List[Tuple[str, str]],
+        vessel_codes: np.ndarray,
+        failures: np.ndarray,
+        deviations: np.ndarray,
+    ) -> "Summaries":
+        """
+        Adds appended rows to the invalid data and compliance summaries.
+
+        :param rules: The (problem type, column) of every check.
+        :param vessel_codes: The vessel code of every appended row.
+        :param failures: The index of the first failing check of every appended row,
+            -1 for the valid rows.
+        :param deviations: The speed deviation of every appended row.
+        :return: The summaries including the appended rows.
+        :rtype: Summaries
+        """
+        return Summaries(
+            self.invalid.merge(
+                InvalidDataSummary.from_first_failures(rules, vessel_codes, failures)
+            ),
+            self.compliance.merge(
+                ComplianceSummary.from_rows(vessel_codes, deviations, failures < 0)
+            ),
+            self.leaderboards,
+        )
+
+
+def _stat(path: str) -> Optional[os.stat_result]:
+    """Returns the status of a file, or None if it does not exist."""
+    try:
+        return os.stat(path)
+    except OSError:
+        return None
+
+
+def source_size(path: str) -> int:
+    """
+    Returns the current size of a CSV file in bytes, or 0 if it does not exist.
+
+    The size of a dataset directory is the total size of its partition files.
+
+    :param path: Path to the CSV file or dataset directory.
+    :return: The size of the source.
+    :rtype: int
+    """
+    try:
+        if is_partitioned(path):
+            return directory_stat(path)[0]
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+class SourceState(NamedTuple):
+    """
+    What was ingested from the dataset source, and the version of the data held.
+
+    :ivar fingerprint: The partitions of a dataset directory as listed by
+        :func:`~app.partitions.source_fingerprint`, or None for a CSV.
+    :ivar loaded_bytes: Byte offset of the CSV up to which rows have been ingested.
+    :ivar prefix: Digest of the bytes of the CSV just before ``loaded_bytes``.
+    :ivar stat: Status of the CSV when it was last ingested.
+    :ivar version: Identifier of the version of the data held.
+    """
+
+    fingerprint: Optional[List[Tuple[str, int, int]]]
+    loaded_bytes: int = 0
+    prefix: Optional[str] = None
+    stat: Optional[os.stat_result] = None
+    version: str = ""
+
+    @classmethod
+    def of(cls, path: str) -> "SourceState":
+        """
+        Starts tracking a dataset source, listing its partitions if it is a directory.
+
+        :param path: Path to the CSV file or dataset directory.
+        :return: The state of a source nothing was ingested from yet.
+        :rtype: SourceState
+        """
+        return cls(source_fingerprint(path) if is_partitioned(path) else None)
+
+    def _prefix_digest(self, path: str, loaded_bytes: int) -> Optional[str]:
+        """
+        Hashes the bytes of the CSV just before an offset.
+
+        :return: The digest of :func:`~app.ingest.prefix_digest`, or None for a dataset
+                directory or a CSV that cannot be read.
+        """
+        if self.fingerprint is not None:
+            return None
+        try:
+            return prefix_digest(path, loaded_bytes)
+        except OSError:
+            return None
+
+    def advanced(self, path: str, loaded_bytes: int) -> "SourceState":
+        """
+        Records the byte offset of the CSV up to which rows have been ingested.
+
+        :param path: Path to the CSV file.
+        :param loaded_bytes: The new offset.
+        :return: The state with the offset and the digest of the bytes before it.
+        :rtype: SourceState
+        """
+        return SourceState(
+            self.fingerprint,
+            loaded_bytes,
+            self._prefix_digest(path, loaded_bytes),
+            self.stat,
+            self.version,
+        )
+
+    def ingested(self, path: str, loaded_bytes: int) -> "SourceState":
+        """
+        Records the bytes ingested from the source and its current status.
+
+        :param path: Path to the CSV file or dataset directory.
+        :param loaded_bytes: Byte offset of the CSV up to which rows have been ingested.
+        :return: The state of the source as ingested.
+        :rtype: SourceState
+        """
+        return SourceState(
+            self.fingerprint,
+            loaded_bytes,
+            self._prefix_digest(path, loaded_bytes),
+            _stat(path),
+            self.version,
+        )
+
+    def versioned(
+        self, path: str, filters: Dict[str, Any], reclassifications: int
+    ) -> "SourceState":
+        """
+        Computes the identifier of the version of the data held.
+
+        The identifier is derived from the source file, the number of bytes ingested from
+        it and the filter configuration, so processes serving the same data report the
+        same version.
+
+        :param path: Path to the CSV file or dataset directory.
+        :param filters: The configuration of the validation pipeline.
+        :param reclassifications: Number of times outliers were reclassified.
+        :return: The state with its version.
+        :rtype: SourceState
+        """
+        key = {
+            "csv_path": os.path.abspath(path),
+            "loaded_bytes": self.loaded_bytes,
+            "mtime_ns": self.stat.st_mtime_ns if self.stat else 0,
+            "partitions": self.fingerprint,
+            "filters": filters,
+            "reclassifications": reclassifications,
+        }
+        return SourceState(
+            self.fingerprint,
+            self.loaded_bytes,
+            self.prefix,
+            self.stat,
+            config_hash(key)[:12],
+        )
+
+    def replaced(self, path: str) -> bool:
+        """
+        Checks whether the CSV was replaced or rewritten since it was ingested.
+
+        Growth of the same file whose ingested bytes end as they did is treated as
+        appended rows; any other change, such as a copy of a longer CSV over the
+        ingested one, requires a reload. Partitioned datasets are reloaded whenever a
+        partition is added, removed or modified.
+
+        :param path: Path to the CSV file or dataset directory.
+        :return: True if the source must be reloaded in full.
+        :rtype: bool
+        """
+        if self.fingerprint is not None:
+            try:
+                return source_fingerprint(path) != self.fingerprint
+            except OSError:
+                return True
+        stat = _stat(path)
+        if stat is None or self.stat is None:
+            return stat is not self.stat
+        if stat.st_ino != self.stat.st_ino or stat.st_size < self.loaded_bytes:
+            return True
+        if stat.st_size == self.loaded_bytes:
+            return stat.st_mtime_ns != self.stat.st_mtime_ns
+        return self._prefix_digest(path, self.loaded_bytes) != self.prefix
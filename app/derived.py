@@ -0,0 +1,68 @@
+"""
+Module computing the columns derived from the base columns of a maritime dataset.
+
+The speed metrics served by the API are functions of a single row, so they are computed
+once for every row, in vectorized form, when the dataset is loaded or rows are appended
+to it, and kept as arrays aligned with the rows of the raw data. Request handlers then
+only select the rows they need from them, instead of copying the rows of a vessel and
+recomputing the metrics on every request.
+
+The arrays keep the precision of the base columns, so the values served are the same as
+if they were computed on demand. They are stored with the cached dataset and
+memory-mapped on warm starts, so that worker processes share them.
+"""
+
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+
+from .rules import numeric_values
+
+# Absolute difference between the actual and proposed speeds over ground
+SPEED_DIFFERENCE = "speed_difference"
+# Speed difference as a percentage of the proposed speed, NaN if it is zero
+SPEED_DEVIATION = "speed_deviation_pct"
+DERIVED_COLUMNS = (SPEED_DIFFERENCE, SPEED_DEVIATION)
+
+
+def derive_columns(frame: pd.DataFrame) -> Dict[str, np.ndarray]:
+    """
+    Computes the derived columns of the rows of a frame.
+
+    Values that are not numbers, as found in columns loaded through the schema fallback,
+    yield NaN.
+
+    :param frame: Rows with the actual and proposed speeds over ground.
+    :return: The values of every column of :data:`DERIVED_COLUMNS`, aligned with the
+            rows of the frame.
+    :rtype: Dict[str, np.ndarray]
+    """
+    if frame.empty:
+        return {name: np.empty(0) for name in DERIVED_COLUMNS}
+    actual = numeric_values(frame["actual_speed_overground"].to_numpy())
+    proposed = numeric_values(frame["proposed_speed_overground"].to_numpy())
+    difference = np.abs(actual - proposed).astype(np.float64, copy=False)
+    deviation = np.full(len(difference), np.nan)
+    np.divide(difference, proposed, out=deviation, where=proposed != 0)
+    deviation *= 100
+    return {SPEED_DIFFERENCE: difference, SPEED_DEVIATION: deviation}
+
+
+def append_columns(
+    derived: Dict[str, np.ndarray], frame: pd.DataFrame
+) -> Dict[str, np.ndarray]:
+    """
+    Extends derived columns with the rows appended to their dataset.
+
+    :param derived: The derived columns of the rows loaded so far.
+    :param frame: The appended rows.
+    :return: New arrays covering the rows loaded so far followed by the appended rows;
+            the arrays given are left untouched.
+    :rtype: Dict[str, np.ndarray]
+    """
+    appended = derive_columns(frame)
+    return {
+        name: np.concatenate([derived[name], appended[name]])
+        for name in DERIVED_COLUMNS
+    }
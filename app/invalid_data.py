@@ -0,0 +1,144 @@
+"""
+Module implementing the per-vessel summary of invalid data.
+
+The number of invalid rows of every vessel is counted per data cleansing check in a
+single vectorized group-by over the per-row index of the first failing check, into a
+dense table with one row per vessel code and one column per check. The nested summary
+served by the invalid data endpoint, with the columns of every problem type sorted by
+decreasing count, is precomputed per vessel so that requests are plain lookups.
+"""
+
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+class InvalidDataSummary:
+    """
+    Counts of invalid rows per vessel and data cleansing check.
+
+    :param rules: The (problem type, column) checks, in the order they are applied.
+    :type rules: List[Tuple[str, str]]
+    :param vessel_codes: The sorted vessel codes with at least one invalid row.
+    :type vessel_codes: np.ndarray
+    :param counts: Number of invalid rows attributed to each check, with one row per
+        vessel code and one column per check.
+    :type counts: np.ndarray
+    """
+
+    def __init__(
+        self,
+        rules: List[Tuple[str, str]],
+        vessel_codes: np.ndarray,
+        counts: np.ndarray,
+    ) -> None:
+        """
+        Initializes the summary and precomputes the per-vessel views.
+        """
+        self.rules = list(rules)
+        self.vessel_codes = np.asarray(vessel_codes)
+        self.counts = np.asarray(counts, dtype=np.int64).reshape(
+            len(self.vessel_codes), len(self.rules)
+        )
+        self._by_vessel = {
+            vessel_code.item(): self._sorted_view(row)
+            for vessel_code, row in zip(self.vessel_codes, self.counts)
+        }
+
+    @classmethod
+    def from_first_failures(
+        cls,
+        rules: List[Tuple[str, str]],
+        vessel_codes: np.ndarray,
+        first_failures: np.ndarray,
+    ) -> "InvalidDataSummary":
+        """
+        Counts the invalid rows of every vessel per check in one group-by.
+
+        Rows without a vessel code are not counted, like in a pandas group-by.
+
+        :param rules: The checks, in the order they are applied.
+        :param vessel_codes: Vessel code of each row.
+        :param first_failures: Index of the first failing check of each row, -1 for
+                valid rows.
+        :return: The summary.
+        :rtype: InvalidDataSummary
+        """
+        invalid = first_failures >= 0
+        vessel_index, unique_codes = pd.factorize(vessel_codes[invalid], sort=True)
+        checks = first_failures[invalid].astype(np.int64)
+        counted = vessel_index >= 0
+        counts = np.bincount(
+            vessel_index[counted] * len(rules) + checks[counted],
+            minlength=len(unique_codes) * len(rules),
+        )
+        return cls(rules, np.asarray(unique_codes), counts)
+
+    def merge(self, other: "InvalidDataSummary") -> "InvalidDataSummary":
+        """
+        Adds the counts of another summary over the same checks.
+
+        :param other: The summary to add.
+        :return: A new summary with the counts of both.
+        :rtype: InvalidDataSummary
+        """
+        vessel_codes = np.union1d(self.vessel_codes, other.vessel_codes)
+        counts = np.zeros((len(vessel_codes), len(self.rules)), dtype=np.int64)
+        for summary in (self, other):
+            counts[
+                np.searchsorted(vessel_codes, summary.vessel_codes)
+            ] += summary.counts
+        return InvalidDataSummary(self.rules, vessel_codes, counts)
+
+    def _sorted_view(self, row: np.ndarray) -> Dict[str, Dict[str, int]]:
+        """
+        Builds the nested summary of one vessel.
+
+        Problem types appear in the order of their first check, and the columns of each
+        problem type by decreasing count, ties in check order.
+
+        :param row: The counts of the vessel per check.
+        :return: The counts by problem type and column.
+        :rtype: Dict[str, Dict[str, int]]
+        """
+        grouped: Dict[str, List[Tuple[str, int]]] = {}
+        for (problem_type, column), count in zip(self.rules, row.tolist()):
+            if count:
+                grouped.setdefault(problem_type, []).append((column, count))
+        return {
+            problem_type: dict(sorted(columns, key=lambda x: x[1], reverse=True))
+            for problem_type, columns in grouped.items()
+        }
+
+    def for_vessel(self, vessel_code: Any) -> Dict[str, Dict[str, int]]:
+        """
+        Returns the precomputed nested summary of a vessel.
+
+        :param vessel_code: The unique identifier for the vessel.
+        :return: The counts by problem type and column, sorted by decreasing count, or
+                an empty dictionary if the vessel has no invalid rows.
+        :rtype: Dict[str, Dict[str, int]]
+        """
+        return self._by_vessel.get(vessel_code, {})
+
+    def to_nested(self) -> Dict[Any, Dict[str, Dict[str, int]]]:
+        """
+        Converts the summary to nested counters keyed by vessel code, problem type and
+        column.
+
+        Checks are visited in order and vessels in ascending order within each check,
+        which is the order in which applying the checks one after the other fills the
+        counters.
+
+        :return: The nested counters.
+        :rtype: Dict[Any, Dict[str, Dict[str, int]]]
+        """
+        nested: Dict[Any, Dict[str, Dict[str, int]]] = {}
+        for index, (problem_type, column) in enumerate(self.rules):
+            for position in np.flatnonzero(self.counts[:, index]):
+                vessel_code = self.vessel_codes[position].item()
+                nested.setdefault(vessel_code, {}).setdefault(problem_type, {})[
+                    column
+                ] = int(self.counts[position, index])
+        return nested
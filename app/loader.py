@@ -0,0 +1,307 @@
+"""
+Module implementing background loading of the maritime dataset.
+
+Building :class:`~app.models.MaritimeData` can take a while on a cold start, so it runs
+in a background thread while the application already answers health checks. The loader
+tracks the load state, progress and timings that are reported by the readiness endpoint.
+
+Once loaded, the dataset is treated as an immutable snapshot. Reloads and appended rows
+build a new MaritimeData instance which is published by swapping a single reference, so
+requests that captured the previous snapshot finish on it undisturbed and it is freed
+once the last of them completes.
+"""
+
+import copy
+from datetime import datetime, timezone
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+from .models import MaritimeData
+from .rules import ValidationRules
+
+
+class DatasetLoader:
+    """
+    Builds a MaritimeData instance in a background thread and tracks its readiness.
+
+    :param factory: Callable building the MaritimeData instance. It receives a progress
+        callback taking the current load stage and the number of rows processed so far.
+    :type factory: Callable[[Callable[[str, int], None]], MaritimeData]
+    :param poll_seconds: Interval at which the CSV is checked once the dataset is loaded,
+        or 0 to disable polling. Appended rows are ingested incrementally, and a CSV that
+        was replaced or rewritten is reloaded in full.
+    :type poll_seconds: float
+    """
+
+    LOADING = "loading"
+    READY = "ready"
+    FAILED = "failed"
+
+    def __init__(
+        self,
+        factory: Callable[[Callable[[str, int], None]], MaritimeData],
+        poll_seconds: float = 0,
+    ) -> None:
+        """
+        Initializes the loader with the factory building the dataset.
+        """
+        self.factory = factory
+        self.poll_seconds = poll_seconds
+        self.data: Optional[MaritimeData] = None
+        self.state = self.LOADING
+        self.stage = "pending"
+        self.rows = 0
+        self.error: Optional[str] = None
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.reloading = False
+        self.reloaded_at: Optional[float] = None
+        self._thread: Optional[threading.Thread] = None
+        self._ready = threading.Event()
+        self._lock = threading.Lock()
+        self._publish_lock = threading.Lock()
+
+    def start(self) -> None:
+        """
+        Starts loading the dataset in a daemon thread, unless a load already started.
+
+        :return: None
+        """
+        with self._lock:
+            if self._thread is not None:
+                return
+            self.started_at = time.time()
+            self._thread = threading.Thread(
+                target=self._run, name="dataset-loader", daemon=True
+            )
+            self._thread.start()
+
+    def _run(self) -> None:
+        """Builds the dataset and records the outcome."""
+        try:
+            self._publish(self.factory(self._report_progress))
+            self.state = self.READY
+            self.stage = "ready"
+            logging.info(
+                f"Dataset ready after {time.time() - self.started_at:.2f} seconds"
+            )
+        except Exception as e:
+            self.state = self.FAILED
+            self.error = str(e)
+            logging.error(f"Failed to load the maritime dataset: {e}")
+        finally:
+            self.finished_at = time.time()
+            self._ready.set()
+        if self.poll_seconds > 0:
+            self._poll_source()
+
+    def _publish(
+        self, data: MaritimeData, replaces: Optional[MaritimeData] = None
+    ) -> bool:
+        """
+        Atomically makes a dataset snapshot the one served to new requests.
+
+        :param data: The snapshot to publish.
+        :param replaces: If given, the snapshot is only published if this one is still
+            the current snapshot, so that stale updates never overwrite a newer reload.
+        :return: True if the snapshot was published.
+        :rtype: bool
+        """
+        with self._publish_lock:
+            if replaces is not None and self.data is not replaces:
+                return False
+            self.data = data
+        logging.info(f"Serving dataset version {data.version}")
+        return True
+
+    def reload(self, background: bool = True) -> bool:
+        """
+        Rebuilds the dataset from the CSV and publishes it once it is complete.
+
+        The current snapshot keeps serving requests during the rebuild, and remains the
+        current one if the rebuild fails. A successful reload also recovers from a failed
+        initial load.
+
+        :param background: Whether to rebuild in a daemon thread instead of blocking.
+        :return: True if the reload was started, False if one is already in progress.
+        :rtype: bool
+        """
+        with self._lock:
+            if self.reloading:
+                return False
+            self.reloading = True
+        if background:
+            threading.Thread(
+                target=self._reload, name="dataset-reloader", daemon=True
+            ).start()
+        else:
+            self._reload()
+        return True
+
+    def _reload(self) -> None:
+        """Builds a new dataset snapshot and publishes it."""
+        started_at = time.time()
+        try:
+            data = self.factory(lambda stage, rows: None)
+            # MaritimeData loads an empty dataset when the CSV cannot be read
+            current = self.data
+            if (
+                data.raw_data.empty
+                and current is not None
+                and not current.raw_data.empty
+            ):
+                raise ValueError(
+                    "The CSV could not be read; keeping the current version."
+                )
+            self._publish(data)
+            self.state = self.READY
+            self.error = None
+            self.reloaded_at = time.time()
+            logging.info(
+                f"Dataset reloaded after {self.reloaded_at - started_at:.2f} seconds"
+            )
+        except Exception as e:
+            self.error = str(e)
+            logging.error(f"Failed to reload the maritime dataset: {e}")
+        finally:
+            self.reloading = False
+            self._ready.set()
+
+    def _poll_source(self) -> None:
+        """Periodically checks the CSV for changes once the dataset is loaded."""
+        while True:
+            time.sleep(self.poll_seconds)
+            try:
+                self.check_source()
+            except Exception as e:
+                logging.error(f"Failed to check the CSV for changes: {e}")
+
+    def check_source(self) -> None:
+        """
+        Brings the served dataset up to date with the CSV.
+
+        Rows appended to the CSV are ingested into a new snapshot, and a CSV that was
+        replaced or rewritten triggers a full reload. So does a failure to ingest the
+        appended rows, which would otherwise repeat on every poll and leave the served
+        snapshot stale.
+
+        :return: None
+        """
+        current = self.data
+        if current is None:
+            return
+        if current.source_replaced():
+            logging.info("The CSV was replaced; reloading the dataset.")
+            self.reload(background=False)
+            return
+        # Ingest into a shallow copy: ingestion replaces the frames and counters rather
+        # than mutating them, so the current snapshot stays intact
+        updated = copy.copy(current)
+        try:
+            ingested = updated.ingest_appended_rows()
+        except Exception as e:
+            logging.error(f"Failed to ingest appended rows, reloading the dataset: {e}")
+            self.reload(background=False)
+            return
+        if ingested:
+            self._publish(updated, replaces=current)
+
+    def reclassify_outliers(self) -> int:
+        """
+        Rejects the accepted rows that the running outlier statistics flag, publishing the
+        result as a new snapshot.
+
+        The reclassification is applied to a shallow copy of the current snapshot, and
+        retried on the newer snapshot if another update was published meanwhile.
+
+        :return: The number of rows rejected.
+        :rtype: int
+        :raises ValueError: If no dataset is loaded or the outlier mode has no running
+                statistics.
+        """
+        while True:
+            current = self.data
+            if current is None:
+                raise ValueError("No dataset loaded to reclassify outliers in.")
+            updated = copy.copy(current)
+            rows = updated.apply_outlier_reclassification()
+            if self._publish(updated, replaces=current):
+                return rows
+
+    def revalidate(self, validation_rules: ValidationRules) -> int:
+        """
+        Validates the current snapshot again with other data cleansing rules, publishing
+        the result as a new snapshot.
+
+        The validation is applied to a shallow copy of the current snapshot, which shares
+        the outputs of the validation stages computed so far, and retried on the newer
+        snapshot if another update was published meanwhile. Reloads keep applying the
+        rules the factory builds the dataset with.
+
+        :param validation_rules: The new rules.
+        :return: The number of validation stages computed.
+        :rtype: int
+        :raises ValueError: If no dataset is loaded or the rules do not apply to it.
+        """
+        while True:
+            current = self.data
+            if current is None:
+                raise ValueError("No dataset loaded to validate.")
+            updated = copy.copy(current)
+            computed = updated.apply_validation_rules(validation_rules)
+            if self._publish(updated, replaces=current):
+                return computed
+
+    def _report_progress(self, stage: str, rows: int) -> None:
+        """Records the current load stage and number of rows processed."""
+        self.stage = stage
+        self.rows = rows
+
+    @property
+    def is_ready(self) -> bool:
+        """Whether the dataset has been loaded successfully."""
+        return self.state == self.READY
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """
+        Blocks until the load has finished, successfully or not.
+
+        :param timeout: Maximum number of seconds to wait, or None to wait indefinitely.
+        :return: True if the dataset is ready, False otherwise.
+        :rtype: bool
+        """
+        self._ready.wait(timeout)
+        return self.is_ready
+
+    def status(self) -> Dict[str, Any]:
+        """
+        Describes the load state, progress and timings.
+
+        :return: Dictionary with the state, current stage, rows processed, start and
+                finish timestamps (ISO 8601, UTC), elapsed seconds, error, if any, the
+                version of the dataset served and whether a reload is in progress.
+        :rtype: Dict[str, Any]
+        """
+
+        def isoformat(timestamp):
+            if timestamp is None:
+                return None
+            return datetime.fromtimestamp(timestamp, timezone.utc).isoformat()
+
+        end = self.finished_at or time.time()
+        return {
+            "status": self.state,
+            "stage": self.stage,
+            "rows": self.rows,
+            "started_at": isoformat(self.started_at),
+            "finished_at": isoformat(self.finished_at),
+            "elapsed_seconds": (
+                round(end - self.started_at, 3) if self.started_at else None
+            ),
+            "error": self.error,
+            "version": self.data.version if self.data is not None else None,
+            "reloading": self.reloading,
+            "reloaded_at": isoformat(self.reloaded_at),
+        }
@@ -0,0 +1,149 @@
+"""
+Module recording the timings and row flow of the stages of a dataset load.
+
+Building :class:`~app.models.MaritimeData` goes through several stages: reading the CSV
+or the cache, parsing timestamps, evaluating every validation check, summarizing the
+invalid rows and storing the results in the cache. Each stage records its wall time,
+the number of rows it received and kept, and by how much it raised the peak resident
+memory of the process. The stages are logged as JSON lines once the load completes and
+served by the ``/admin/load_metrics`` endpoint, so that slower starts or additional
+rejected rows can be traced to the stage responsible.
+
+The peak resident memory is the high-water mark of the process, read with
+:mod:`resource`. A stage only raises it when it needs more memory than any earlier
+point of the process, so reloads usually report no increase; the memory deltas are
+None on platforms without :mod:`resource`.
+"""
+
+from contextlib import contextmanager
+import json
+import logging
+import sys
+import time
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - Windows
+    resource = None
+
+
+def peak_memory_mb() -> Optional[float]:
+    """
+    Reads the peak resident memory of the process.
+
+    :return: The peak resident memory in megabytes, or None if it cannot be read.
+    :rtype: Optional[float]
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Reported in bytes on macOS and in kilobytes elsewhere
+    return peak / (1 << 20) if sys.platform == "darwin" else peak / (1 << 10)
+
+
+class Stage(NamedTuple):
+    """
+    Timing and row flow of one load stage.
+
+    :ivar name: The stage, e.g. 'read_csv' or 'validate:below_zero:power'.
+    :ivar seconds: Wall time spent in the stage, summed over the threads of the
+        validation checks evaluated in parallel.
+    :ivar rows_in: Number of rows the stage received, or None if not applicable.
+    :ivar rows_out: Number of rows the stage kept, or None if not applicable.
+    :ivar peak_memory_delta_mb: Increase of the peak resident memory of the process
+        during the stage in megabytes, or None if it cannot be read or is not measured
+        separately, as for the validation checks evaluated together.
+    """
+
+    name: str
+    seconds: float
+    rows_in: Optional[int] = None
+    rows_out: Optional[int] = None
+    peak_memory_delta_mb: Optional[float] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Converts the stage into a JSON-serializable dictionary.
+
+        :return: The fields of the stage, with times and memory rounded.
+        :rtype: Dict[str, Any]
+        """
+        memory = self.peak_memory_delta_mb
+        return {
+            "name": self.name,
+            "seconds": round(self.seconds, 6),
+            "rows_in": self.rows_in,
+            "rows_out": self.rows_out,
+            "peak_memory_delta_mb": None if memory is None else round(memory, 3),
+        }
+
+
+class LoadMetrics:
+    """
+    The stages of a dataset load, in the order they completed.
+    """
+
+    def __init__(self) -> None:
+        """
+        Initializes the metrics without any stage.
+        """
+        self.stages: List[Stage] = []
+
+    def record(self, stage: Stage) -> None:
+        """
+        Appends a completed stage.
+
+        :param stage: The stage.
+        :return: None
+        """
+        self.stages.append(stage)
+
+    @contextmanager
+    def stage(
+        self, name: str, rows_in: Optional[int] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Measures the wall time and peak memory increase of the enclosed block.
+
+        The block can set the ``rows_out`` key of the yielded dictionary, which defaults
+        to ``rows_in``. The stage is only recorded if the block completes.
+
+        :param name: The stage.
+        :param rows_in: Number of rows the stage receives.
+        :return: A dictionary receiving the number of rows the stage kept.
+        :rtype: Iterator[Dict[str, Any]]
+        """
+        rows = {"rows_out": rows_in}
+        peak = peak_memory_mb()
+        started_at = time.perf_counter()
+        yield rows
+        seconds = time.perf_counter() - started_at
+        delta = None if peak is None else peak_memory_mb() - peak
+        self.record(Stage(name, seconds, rows_in, rows["rows_out"], delta))
+
+    @property
+    def total_seconds(self) -> float:
+        """The wall time of all stages."""
+        return sum(stage.seconds for stage in self.stages)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Describes the stages for the admin endpoint.
+
+        :return: Dictionary with the total wall time and the stages.
+        :rtype: Dict[str, Any]
+        """
+        return {
+            "total_seconds": round(self.total_seconds, 6),
+            "stages": [stage.to_dict() for stage in self.stages],
+        }
+
+    def log(self) -> None:
+        """
+        Logs every stage as a JSON line.
+
+        :return: None
+        """
+        for stage in self.stages:
+            logging.info(f"Load stage {json.dumps(stage.to_dict())}")
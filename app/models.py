@@ -7,13 +7,53 @@ The primary class, `MaritimeData`, encapsulates the logic for data handling, inc
 loading from CSV, data cleansing, and metrics computation.
 """
 
-from datetime import datetime
+from contextlib import nullcontext
+from datetime import datetime, timezone
 import logging
-from typing import Any, Dict, List
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
+import numpy as np
 import pandas as pd
 from pandas.api.types import is_datetime64_any_dtype as is_datetime
-from scipy import stats
+
+from .cache import DatasetCache
+from .compliance import ComplianceSummary, LeaderboardCache, rank_vessels
+from .dataset import DatasetRows, SourceState, Summaries, source_size
+from .derived import SPEED_DEVIATION, SPEED_DIFFERENCE
+from .invalid_data import InvalidDataSummary
+from .outliers import OutlierState
+from .ingest import (
+    CSV_SCHEMA,
+    read_appended_rows,
+    read_validated_chunks,
+    read_vessel_csv,
+)
+from .partitions import is_partitioned, read_partitioned
+from .pipeline import ValidationPipeline, first_failures, flag_dtype
+from .rules import ValidationRules
+
+PERIOD_FORMAT_MESSAGE = "Dates should be YYYY-MM-DD dates or ISO-8601 timestamps."
+
+
+def parse_timestamp(value: str) -> pd.Timestamp:
+    """
+    Parses a bound of a period, given as a 'YYYY-MM-DD' date or an ISO-8601 timestamp.
+
+    A date stands for midnight. Timestamps with a UTC offset are converted to UTC, in
+    which the naive timestamps of the dataset are assumed to be recorded.
+
+    :param value: The date or timestamp, e.g. '2023-06-01' or '2023-06-01T12:30:00Z'.
+    :return: The naive timestamp.
+    :rtype: pd.Timestamp
+    :raises ValueError: If the value is neither a date nor an ISO-8601 timestamp.
+    """
+    try:
+        parsed = datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise ValueError(PERIOD_FORMAT_MESSAGE) from None
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return pd.Timestamp(parsed)
 
 
 class MaritimeData:
@@ -23,256 +63,557 @@ class MaritimeData:
     The class provides functionality to load vessel data from a CSV file, apply several filters
     to clean the data, and calculate metrics for vessels over specified periods.
 
-    :param csv_path: Path to the CSV file containing maritime data.
+    The state of the loaded dataset is held in the immutable parts of :mod:`app.dataset`
+    and in an :class:`~app.outliers.OutlierState`, next to the validation pipeline.
+
+    :param csv_path: Path to the CSV file containing maritime data, or to a directory of
+        partition files (see :mod:`app.partitions`).
     :type csv_path: str
+    :param cache_dir: Directory of the on-disk columnar cache, or None to disable caching.
+    :type cache_dir: Optional[str]
+    :param chunk_mb: Size in megabytes of the CSV chunks read by the streaming ingestion,
+        or None to load the whole CSV at once.
+    :type chunk_mb: Optional[float]
+    :param workers: Maximum number of processes used to parse the CSV when it is loaded
+        at once.
+    :type workers: int
+    :param progress: Callback receiving the current load stage and the number of rows
+        processed so far.
+    :type progress: Optional[Callable[[str, int], None]]
+    :param outlier_mode: How outliers are detected, one of
+        :data:`~app.outliers.OUTLIER_MODES`, or None for :attr:`OUTLIER_MODE`.
+    :type outlier_mode: Optional[str]
+    :param validation_rules: The data cleansing rules, or None for the default rules of
+        :data:`~app.rules.DEFAULT_RULES_PATH`.
+    :type validation_rules: Optional[ValidationRules]
+    :param validation_workers: Maximum number of threads evaluating the validation rules
+        over blocks of rows.
+    :type validation_workers: int
     """
 
-    def __init__(self, csv_path: str) -> None:
+    # Statistics outliers are scored against: fleet-wide z-scores, per-vessel z-scores
+    # or per-vessel median and MAD (see app.outliers)
+    OUTLIER_MODE = "global"
+
+    def __init__(
+        self,
+        csv_path: str,
+        cache_dir: Optional[str] = None,
+        chunk_mb: Optional[float] = None,
+        workers: int = 1,
+        progress: Optional[Callable[[str, int], None]] = None,
+        outlier_mode: Optional[str] = None,
+        validation_rules: Optional[ValidationRules] = None,
+        validation_workers: int = 1,
+    ) -> None:
         """
         Initializes the MaritimeData class with the path to the data CSV.
         """
+        # Rules, stage outputs and load metrics of the validation (see app.pipeline);
+        # the stage outputs are shared through the cache once the cached version of the
+        # data is pinned (see ValidationPipeline.pin)
+        self.validation = ValidationPipeline(
+            validation_rules or ValidationRules.load(),
+            outlier_mode or self.OUTLIER_MODE,
+            validation_workers,
+        )
         self.csv_path = csv_path
-        # Load raw data from CSV
-        self.raw_data = self._load_csv()
-        # Create a copy of raw data to apply filters and preserve the original data
-        self.filtered_data = self.raw_data.copy()
-        # Store information about invalid data to be used in the API
-        self.invalid_data = {}
-        logging.info(f"Original dataset size: {len(self.raw_data)}")
-        if not self.raw_data.empty:
-            # Apply data cleansing filters
-            self._filter_invalid_data()
-            logging.info(f"Filtered dataset size: {len(self.filtered_data)}")
-
-    def _load_csv(self) -> pd.DataFrame:
+        self.cache = DatasetCache(cache_dir, CSV_SCHEMA) if cache_dir else None
+        self.rows = DatasetRows(pd.DataFrame(), np.zeros(0, dtype=np.uint8), None, {})
+        self.summaries = Summaries(
+            InvalidDataSummary(self.validation.rules.keys(), [], []),
+            ComplianceSummary([], [], [], []),
+            LeaderboardCache(),
+        )
+        self.outliers = OutlierState({}, {})
+        self.source = SourceState.of(csv_path)
+        loaded_bytes = source_size(csv_path)
+        metrics = self.validation.metrics
+        # Only one process at a time builds the cache, the others attach to its result
+        with self.cache.lock(csv_path) if self.cache is not None else nullcontext():
+            # Stream the CSV in chunks to bound peak memory, unless it can be served
+            # from the cache or does not conform to the declared schema
+            if not (chunk_mb and self._load_streaming(chunk_mb, progress)):
+                self._load(workers, progress)
+            stage_store = self.validation.stage_store
+            with metrics.stage("build_vessel_index", len(self.raw_data)):
+                self.rows = self.rows.with_vessel_index(stage_store)
+            with metrics.stage("derive_columns", len(self.raw_data)):
+                self.rows = self.rows.with_derived_columns(stage_store)
+        if source_size(csv_path) != loaded_bytes:
+            logging.warning("The CSV changed while it was being loaded.")
+        with metrics.stage("summarize_compliance", len(self.raw_data)):
+            self._summarize_compliance()
+        metrics.log()
+        self.source = self.source.ingested(csv_path, loaded_bytes)
+        self._update_version()
+
+    @property
+    def raw_data(self) -> pd.DataFrame:
+        """The rows as loaded, valid or not."""
+        return self.rows.raw_data
+
+    @property
+    def flags(self) -> np.ndarray:
+        """The per-row validation flags, zero for the rows that passed all checks."""
+        return self.rows.flags
+
+    @property
+    def version(self) -> str:
+        """The identifier of the version of the data held by this instance."""
+        return self.source.version
+
+    def _update_version(self) -> None:
         """
-        Loads maritime data from a CSV file.
+        Computes the identifier of the version of the data held by this instance.
 
-        Attempts to read the maritime data CSV file into a pandas DataFrame. If the file
-        is not found, or another exception occurs during loading, it handles the exception
-        gracefully by printing an error message and returning an empty DataFrame.
+        :return: None
+        """
+        self.source = self.source.versioned(
+            self.csv_path, self.validation.config(), self.outliers.reclassifications
+        )
 
-        :return: A DataFrame with the loaded maritime data, or an empty DataFrame if
-                the file cannot be loaded.
-        :rtype: pd.DataFrame
+    def source_replaced(self) -> bool:
         """
-        try:
-            df = pd.read_csv(self.csv_path, parse_dates=["datetime"])
-            return df
-        except FileNotFoundError:
-            logging.error("CSV file not found.")
-            return pd.DataFrame()
-        except Exception as e:
-            logging.error(f"An unexpected error occurred while loading CSV: {e}")
-            return pd.DataFrame()
+        Checks whether the CSV was replaced or rewritten since it was loaded.
 
-    def _filter_invalid_data(self) -> None:
+        Growth of the same file whose ingested bytes end as they did is treated as
+        appended rows, which :meth:`ingest_appended_rows` can pick up; any other change
+        requires a reload (see :meth:`~app.dataset.SourceState.replaced`).
+
+        :return: True if the CSV must be reloaded in full.
+        :rtype: bool
         """
-        Applies a series of data cleansing filters to the loaded maritime data.
+        return self.source.replaced(self.csv_path)
 
-        This method sequentially calls other methods to filter out rows based on
-        specific criteria: values below zero, missing values, statistical outliers,
-        and invalid geocoordinates. This process cleans the dataset, preparing it
-        for further analysis and usage within the application.
+    def _load(
+        self, workers: int, progress: Optional[Callable[[str, int], None]]
+    ) -> None:
+        """
+        Loads the whole CSV at once and applies the data cleansing filters.
 
+        :param workers: Maximum number of processes used to parse the CSV.
+        :param progress: Callback receiving the current load stage, if any.
         :return: None
         """
-        self._filter_below_zero()
-        self._filter_missing_values()
-        self._filter_outliers()
-        self._filter_invalid_geocoordinates()
+        # Load raw data from CSV
+        if progress is not None:
+            progress("reading", 0)
+        raw_data = self._load_csv(workers)
+        self.rows = self.rows._replace(
+            raw_data=raw_data,
+            flags=np.zeros(
+                len(raw_data), dtype=flag_dtype(self.validation.rules.keys())
+            ),
+        )
+        logging.info(f"Original dataset size: {len(raw_data)}")
+        if not raw_data.empty:
+            if progress is not None:
+                progress("filtering", len(raw_data))
+            # Reuse the stored cleansing results if available, otherwise apply the
+            # data cleansing filters and store their results for the next start
+            if not self._load_cached_filters():
+                self._filter_invalid_data()
+                self.validation.store_result(self.flags, self.outliers)
+            logging.info(f"Filtered dataset size: {self.valid_rows}")
+
+    def _load_streaming(
+        self, chunk_mb: float, progress: Optional[Callable[[str, int], None]]
+    ) -> bool:
+        """
+        Loads the CSV in fixed-size chunks, validating each chunk as it is read.
+
+        The row-local checks (all but the outlier checks) are evaluated per chunk into
+        the per-row validation flags by :func:`~app.ingest.read_validated_chunks`. The
+        outlier checks need whole-dataset statistics, so they run afterwards over the
+        accumulated columns, with means and standard deviations merged block by block.
+        The flags and invalid data summary are identical to those of a full load.
+
+        Partitioned datasets are always loaded partition by partition instead.
+
+        :param chunk_mb: Size in megabytes of the CSV text read per chunk.
+        :param progress: Callback receiving the current load stage, if any.
+        :return: True if the data was loaded, False if the caller should fall back to
+                loading the whole CSV (cache hit, partitioned dataset, schema mismatch or
+                read error).
+        :rtype: bool
+        """
+        if is_partitioned(self.csv_path):
+            return False
+        check_seconds = np.zeros(len(self.validation.rules.keys()))
+        try:
+            if self.cache is not None and self.cache.lookup(self.csv_path):
+                return False
+            raw_data, flags, chunk_rows = read_validated_chunks(
+                self.csv_path,
+                chunk_mb,
+                lambda chunk: self.validation.row_local_flags(chunk, check_seconds),
+                self.validation.metrics,
+                progress,
+            )
+        except OSError as e:
+            logging.error(f"Failed to stream CSV {self.csv_path}: {e}")
+            return False
+        except (ValueError, TypeError) as e:
+            logging.warning(f"Streaming ingestion not possible, loading at once: {e}")
+            return False
+        self.rows = self.rows._replace(raw_data=raw_data, flags=flags)
+        logging.info(
+            f"Original dataset size: {len(raw_data)} "
+            f"(streamed in chunks of {chunk_rows} rows)"
+        )
 
-    def _filter_below_zero(self) -> None:
+        if progress is not None:
+            progress("filtering", len(raw_data))
+        self.outliers = self.validation.finish(
+            raw_data, flags, chunk_rows, check_seconds
+        )
+        with self.validation.metrics.stage("summarize_invalid_data", len(raw_data)):
+            self._summarize_flags()
+        logging.info(f"Filtered dataset size: {self.valid_rows}")
+        if self.cache is not None:
+            with self.validation.metrics.stage("store_cache", len(raw_data)):
+                self.cache.store_frame(self.csv_path, raw_data)
+            self.validation.pin(self.cache, self.csv_path)
+            self.validation.store_result(flags, self.outliers)
+        return True
+
+    def _summarize_flags(self) -> None:
         """
-        Filters out records with negative values in specified numerical columns.
+        Counts the invalid rows of every vessel under their first failing check.
 
-        Identifies and removes rows from `self.filtered_data` where values in critical
-        numerical columns such as power, fuel consumption, and speed over ground are
-        below zero, as these values are considered invalid for the dataset's context.
+        :return: None
+        """
+        self.summaries = self.summaries._replace(
+            invalid=InvalidDataSummary.from_first_failures(
+                self.validation.rules.keys(),
+                self.raw_data["vessel_code"].to_numpy(),
+                first_failures(self.flags),
+            )
+        )
 
-        The columns checked are: 'power', 'fuel_consumption', 'actual_speed_overground',
-        'proposed_speed_overground', and 'predicted_fuel_consumption'.
+    def _summarize_compliance(self) -> None:
+        """
+        Aggregates the valid rows of every vessel into the compliance summary.
 
         :return: None
         """
-        # Define the condition for filtering out rows where the specified columns are below zero.
-        # We specify these columns to avoid filtering out lat/long values that could be valid.
-        try:
+        if self.raw_data.empty:
+            compliance = ComplianceSummary([], [], [], [])
+        else:
+            compliance = ComplianceSummary.from_rows(
+                self.raw_data["vessel_code"].to_numpy(),
+                self.rows.derived_columns[SPEED_DEVIATION],
+                self.flags == 0,
+            )
+        self.summaries = self.summaries._replace(compliance=compliance)
 
-            def get_below_zero(column):
-                """Get rows with values below zero in the specified column."""
-                return column < 0
-
-            columns = [
-                "power",
-                "fuel_consumption",
-                "actual_speed_overground",
-                "proposed_speed_overground",
-                "predicted_fuel_consumption",
-            ]
-            self._filter_by_condition(get_below_zero, "below_zero", columns=columns)
-        except Exception as e:
-            logging.error(f"Error filtering below zero: {e}")
+    @property
+    def valid_rows(self) -> int:
+        """The number of rows that passed all checks."""
+        return int(np.count_nonzero(self.flags == 0))
 
-    def _filter_missing_values(self) -> None:
+    @property
+    def filtered_data(self) -> pd.DataFrame:
         """
-        Removes records with missing (NA) values in critical columns.
+        The rows that passed all checks, in dataset order.
 
-        Targets specific columns for checking missing values, including vessel identifiers,
-        timestamps, geocoordinates, and various performance metrics. Rows with any missing
-        values in these columns are considered incomplete and are removed from the dataset.
+        The filtered data are not held separately from :attr:`raw_data`: this property
+        copies the rows without any validation flag on every access, so queries select
+        the rows they need with :meth:`get_vessel_records` instead.
 
-        Target columns: 'vessel_code', 'datetime', 'latitude', 'longitude', 'power',
-        'fuel_consumption', 'actual_speed_overground', 'proposed_speed_overground',
-        and 'predicted_fuel_consumption'.
+        :return: A copy of the valid rows.
+        :rtype: pd.DataFrame
+        """
+        return self.raw_data.take(np.flatnonzero(self.flags == 0))
 
-        :return: None
+    def _vessel_positions(
+        self, vessel_code: int, valid_only: bool = True
+    ) -> np.ndarray:
         """
+        Locates the rows of a vessel in :attr:`raw_data`.
 
-        # Define the condition for filtering out rows where the specified columns have
-        # missing values.
-        try:
+        Only the rows of the vessel are touched when the data are indexed; otherwise
+        the vessel codes of the whole fleet are scanned.
 
-            def get_missing_columns(col):
-                return col.isna()
-
-            columns = [
-                "vessel_code",
-                "datetime",
-                "latitude",
-                "longitude",
-                "power",
-                "fuel_consumption",
-                "actual_speed_overground",
-                "proposed_speed_overground",
-                "predicted_fuel_consumption",
-            ]
-
-            self._filter_by_condition(
-                get_missing_columns, "missing_value", columns=columns
-            )
-        except Exception as e:
-            logging.error(f"Failed to filter missing values: {e}")
+        :param vessel_code: Unique identifier for the vessel.
+        :param valid_only: Whether to only locate the rows that passed all checks.
+        :return: The positions of the rows, in chronological order if the data are
+                indexed and in dataset order otherwise.
+        :rtype: np.ndarray
+        """
+        if self.rows.vessel_index is None:
+            mask = self.raw_data["vessel_code"].to_numpy() == vessel_code
+            if valid_only:
+                mask &= self.flags == 0
+            return np.flatnonzero(mask)
+        positions = self.rows.vessel_index.positions(vessel_code)
+        return positions[self.flags[positions] == 0] if valid_only else positions
+
+    def get_vessel_records(
+        self, vessel_code: int, valid_only: bool = True
+    ) -> pd.DataFrame:
+        """
+        Retrieves the records of a vessel.
 
-    def _filter_outliers(self) -> None:
+        :param vessel_code: Unique identifier for the vessel.
+        :param valid_only: Whether to only retrieve the records that passed all checks.
+        :return: A copy of the records, in chronological order if the data are indexed.
+        :rtype: pd.DataFrame
         """
-        Identifies and removes outliers based on Z-scores in specified numerical columns.
+        return self.raw_data.take(self._vessel_positions(vessel_code, valid_only))
 
-        Applies a statistical method to detect and exclude outliers from the dataset. An
-        outlier is defined as a data point that is more than two standard deviations away
-        from the mean. This method ensures the data's consistency by retaining only values
-        within a reasonable range, enhancing the reliability of subsequent analyses.
+    @property
+    def invalid_data(self) -> Dict[Any, Dict[str, Dict[str, int]]]:
+        """
+        Nested counts of invalid rows by vessel code, problem type and column.
 
-        Outlier detection is applied to columns: 'power', 'fuel_consumption',
-        'actual_speed_overground', 'proposed_speed_overground', and 'predicted_fuel_consumption'.
+        :return: The counts as built by :meth:`InvalidDataSummary.to_nested`.
+        :rtype: Dict[Any, Dict[str, Dict[str, int]]]
+        """
+        return self.summaries.invalid.to_nested()
 
-        :return: None
+    def ingest_appended_rows(self) -> int:
         """
-        # Define the condition for filtering out rows where the specified columns have outliers.
-        # z-scores can be adjusted depending on the situation.
-        # We specify these columns to only apply filtering in numerical columns.
-        try:
-            columns = [
-                "power",
-                "fuel_consumption",
-                "actual_speed_overground",
-                "proposed_speed_overground",
-                "predicted_fuel_consumption",
-            ]
-            for column in columns:
-                # Check if the column exists and is numerical (rule out strings and mixed types)
-                if (
-                    column in self.filtered_data.columns
-                    and self.filtered_data[column].dtype != "object"
-                ):
-                    # dropna() ensures no NaN values are included in the z-score calculation
-                    # This can be adjusted depending on how strict we want to be.
-                    # Leave it as 2 for now.
-                    z_scores = stats.zscore(self.filtered_data[column].dropna())
-                    outlier_mask = abs(z_scores) > 2
-
-                    # Create a mask that aligns with the original data with the default value
-                    # set to False
-                    full_mask = pd.Series(False, index=self.filtered_data.index)
-                    # Update the mask with the outlier values
-                    non_na_indices = self.filtered_data[column].dropna().index
-                    # Ensure alignment with the original data
-                    full_mask.loc[non_na_indices] = outlier_mask
-
-                    # Apply the mask using the defined function
-                    self._filter_by_condition(
-                        lambda col: full_mask, "outlier", [column]
-                    )
-        except Exception as e:
-            logging.error(f"Failed to filter outliers: {e}")
+        Ingests the rows appended to the CSV since it was loaded, without a full reload.
+
+        Only the bytes after the ingested offset are parsed. The new rows are validated
+        with the same checks and attribution order as a full load and appended to
+        :attr:`raw_data` with their validation flags; the invalid data counters are
+        updated with their failures.
+
+        Outlier policy: new rows are checked against the outlier statistics frozen when
+        the dataset was loaded, so rows that were already accepted are never
+        reclassified implicitly. The new rows are merged into the running statistics
+        instead; :meth:`preview_outlier_reclassification` shows which accepted rows the
+        updated statistics would reject, and :meth:`apply_outlier_reclassification`
+        rejects them in bulk. A full reload recomputes the statistics over all rows.
+        With per-vessel statistics, rows of vessels that had no statistics yet are not
+        checked for outliers until then.
+
+        Partitioned datasets are never appended to; changed partitions are picked up by
+        a full reload instead.
+
+        :return: The number of rows ingested.
+        :rtype: int
+        :raises ValueError: If the CSV shrank, the new rows do not conform to the declared
+                schema or no dataset was loaded; a full reload is required then.
+        """
+        if self.source.fingerprint is not None:
+            return 0
+        if self.raw_data.empty:
+            raise ValueError("No dataset loaded to append rows to.")
+        new_rows, offset = read_appended_rows(self.csv_path, self.source.loaded_bytes)
+        if new_rows.empty:
+            self.source = self.source.advanced(self.csv_path, offset)
+            return 0
+
+        flags = self.validation.flag_rows(new_rows, self.outliers.outlier_stats)
+        code = first_failures(flags)
+        start = self.raw_data.index[-1] + 1
+        new_rows.index = pd.RangeIndex(start, start + len(new_rows))
+        # The stage outputs cover the previous rows only; the appended dataset is no
+        # longer the one stored in the on-disk cache either
+        self.validation = self.validation.without_stages()
+        self.rows = self.rows.append(new_rows, flags)
+        self.summaries = self.summaries.merge_rows(
+            self.validation.rules.keys(),
+            new_rows["vessel_code"].to_numpy(),
+            code,
+            self.rows.derived_columns[SPEED_DEVIATION][-len(new_rows) :],
+        )
+        self.outliers = self.outliers.merge_rows(
+            new_rows, flags, self.validation.rules.outlier_checks()
+        )
+        self.source = self.source.ingested(self.csv_path, offset)
+        self._update_version()
+        logging.info(
+            f"Ingested {len(new_rows)} appended rows, {int((code < 0).sum())} valid"
+        )
+        return len(new_rows)
 
-    def _filter_invalid_geocoordinates(self) -> None:
+    def _reclassification_flags(
+        self,
+    ) -> Tuple[np.ndarray, np.ndarray, Dict[str, Any]]:
         """
-        Filters out records with geocoordinate values outside valid global ranges.
+        Finds the accepted rows scoring above the threshold under the running statistics.
 
-        Validates latitude and longitude values by ensuring they fall within the
-        acceptable global range: latitudes between -90 and 90, and longitudes
-        between -180 and 180 degrees. Records outside these ranges are considered
-        invalid and are removed, improving the geographic data's accuracy.
+        :return: The row positions of the rows to reject, their outlier flags and the
+                updated statistics, as found by
+                :meth:`~app.outliers.OutlierState.reclassification_flags`.
+        :rtype: Tuple[np.ndarray, np.ndarray, Dict[str, OutlierStats]]
+        :raises ValueError: If the outlier mode has no running statistics.
+        """
+        if self.validation.outlier_mode == "per_vessel_mad":
+            raise ValueError(
+                "Outliers cannot be reclassified in the per_vessel_mad mode, whose "
+                "statistics are only computed by a full reload."
+            )
+        self.outliers = self.outliers.with_sorted_values(self.raw_data, self.flags)
+        return self.outliers.reclassification_flags(
+            self.raw_data, self.flags, self.validation.rules.outlier_checks()
+        )
 
-        :return: None
+    def preview_outlier_reclassification(self) -> pd.DataFrame:
         """
-        try:
+        Lists the accepted rows that the running outlier statistics would reject.
 
-            def get_invalid_latitude(col):
-                """Get rows with invalid latitude values."""
-                return (col < -90) | (col > 90)
+        Rows accepted at load time or on ingestion were validated against the statistics
+        at that time; appended rows shift the statistics, so some accepted rows may now
+        score above the threshold. Rejected rows are never accepted again, and in the
+        ``per_vessel_mad`` mode the statistics only change with a full reload.
 
-            def get_invalid_longitude(col):
-                """Get rows with invalid longitude values."""
-                return (col < -180) | (col > 180)
+        :return: The raw records that would be rejected, in dataset order, with the
+                outlier column each would be attributed to in an ``outlier_column``
+                column.
+        :rtype: pd.DataFrame
+        :raises ValueError: If the outlier mode has no running statistics.
+        """
+        positions, flags, _ = self._reclassification_flags()
+        rules = self.validation.rules.keys()
+        rows = self.raw_data.take(positions)
+        rows["outlier_column"] = [rules[index][1] for index in first_failures(flags)]
+        return rows
 
-            self._filter_by_condition(
-                get_invalid_latitude, "invalid_latitude", ["latitude"]
-            )
-            self._filter_by_condition(
-                get_invalid_longitude, "invalid_longitude", ["longitude"]
+    def apply_outlier_reclassification(self) -> int:
+        """
+        Rejects in bulk the accepted rows that the running outlier statistics flag, and
+        adopts the running statistics for the validation of rows appended later.
+
+        :return: The number of rows rejected.
+        :rtype: int
+        :raises ValueError: If the outlier mode has no running statistics.
+        """
+        positions, flags, updated_stats = self._reclassification_flags()
+        all_flags = np.array(self.flags)
+        all_flags[positions] |= flags
+        self.summaries = self.summaries._replace(
+            invalid=self.summaries.invalid.merge(
+                InvalidDataSummary.from_first_failures(
+                    self.validation.rules.keys(),
+                    self.raw_data["vessel_code"].to_numpy()[positions],
+                    first_failures(flags),
+                )
             )
-        except Exception as e:
-            logging.error(f"Failed to filter invalid geocoordinates: {e}")
+        )
+        self.rows = self.rows._replace(flags=all_flags)
+        self._summarize_compliance()
+        self.outliers = self.outliers._replace(
+            outlier_stats={**self.outliers.outlier_stats, **updated_stats},
+            reclassifications=self.outliers.reclassifications + 1,
+        )
+        self._update_version()
+        logging.info(f"Reclassified {len(positions)} accepted rows as outliers")
+        return len(positions)
 
-    def _filter_by_condition(
-        self, condition_func: Any, problem_type: str, columns: List[str]
-    ) -> None:
+    def apply_validation_rules(self, validation_rules: ValidationRules) -> int:
+        """
+        Validates the raw data again with other data cleansing rules.
+
+        Only the stages of the validation DAG whose parameters or dependencies changed
+        are computed; the others are taken from the stage store, which is shared with
+        the instance this one was copied from. The result is that of a full load with
+        the new rules: rows rejected by an earlier outlier reclassification are only
+        rejected again if the new rules reject them. The validation stages are recorded
+        in new load metrics.
+
+        :param validation_rules: The new rules.
+        :return: The number of validation stages computed.
+        :rtype: int
+        :raises ValueError: If no dataset was loaded, a column checked by the rules is
+                missing from the data or there are more than 64 checks.
+        """
+        if self.raw_data.empty:
+            raise ValueError("No dataset loaded to validate.")
+        self.validation = self.validation.with_rules(validation_rules)
+        self._filter_invalid_data()
+        metrics = self.validation.metrics
+        with metrics.stage("summarize_compliance", len(self.raw_data)):
+            self._summarize_compliance()
+        metrics.log()
+        self._update_version()
+        logging.info(f"Validated the dataset again, {self.valid_rows} valid rows")
+        return self.validation.computed_stages
+
+    def _load_cached_filters(self) -> bool:
         """
-        Applies a filtering condition to specified columns and updates invalid data tracking.
+        Restores the validation flags and invalid data summary from the on-disk cache.
 
-        This generic method applies a given condition to filter data across specified columns,
-        updates the filtered data, and logs details of filtered records by problem type and
-        vessel code.
+        :return: True if cached results matching the current data and filter
+                configuration were found and applied, False otherwise.
+        :rtype: bool
+        """
+        result = self.validation.load_result(len(self.raw_data))
+        if result is None:
+            return False
+        flags, self.outliers = result
+        self.rows = self.rows._replace(flags=flags)
+        self._summarize_flags()
+        return True
+
+    def _load_csv(self, workers: int) -> pd.DataFrame:
+        """
+        Loads maritime data from a CSV file.
 
-        :param condition_func: A function defining the condition to filter the data by.
-        :param problem_type: A description of the problem type for logging.
-        :param columns: A list of column names to apply the filtering condition to.
-        :return: None
+        Attempts to read the maritime data CSV file into a pandas DataFrame. If the file
+        is not found, or another exception occurs during loading, it handles the exception
+        gracefully by printing an error message and returning an empty DataFrame.
+
+        The CSV is parsed with the declared schema of :mod:`app.ingest`. When a cache
+        directory is configured, the parsed columns are read from the on-disk cache if
+        it matches the current CSV, and stored there after parsing otherwise.
+
+        A dataset directory is read partition by partition into one frame.
+
+        :param workers: Maximum number of processes used to parse the CSV.
+        :return: A DataFrame with the loaded maritime data, or an empty DataFrame if
+                the file cannot be loaded.
+        :rtype: pd.DataFrame
         """
+        metrics = self.validation.metrics
         try:
-            for column in columns:
-                mask = condition_func(self.filtered_data[column])
-                valid_rows = self.filtered_data.loc[~mask]
-                filtered_rows = self.filtered_data.loc[mask]
-
-                # Update the main data with rows where the condition is not met.
-                # Add this approach to filter out the invalid rows instead of marking them as
-                # invalid
-                self.filtered_data = valid_rows
-
-                if not filtered_rows.empty:
-                    summary = filtered_rows.groupby("vessel_code").size().to_dict()
-                    for vessel_code, count in summary.items():
-                        self.invalid_data.setdefault(vessel_code, {}).setdefault(
-                            problem_type, {}
-                        ).setdefault(column, 0)
-                        self.invalid_data[vessel_code][problem_type][column] += count
-        except KeyError as e:
-            logging.error(f"Column error in _filter_by_condition: {e}")
+            if self.cache is not None:
+                with metrics.stage("load_cache") as stage:
+                    cached = self.cache.load_frame(self.csv_path)
+                    stage["rows_out"] = None if cached is None else len(cached)
+                if cached is not None:
+                    self.validation.pin(self.cache, self.csv_path)
+                    return cached
+            if is_partitioned(self.csv_path):
+                with metrics.stage("read_partitions") as stage:
+                    df = read_partitioned(self.csv_path, workers=workers)
+                    stage["rows_out"] = len(df)
+                logging.info(f"Read {len(df)} rows of partitions from {self.csv_path}")
+            else:
+                df = read_vessel_csv(self.csv_path, workers=workers, metrics=metrics)
+            if self.cache is not None:
+                with metrics.stage("store_cache", len(df)):
+                    self.cache.store_frame(self.csv_path, df)
+                self.validation.pin(self.cache, self.csv_path)
+            return df
+        except FileNotFoundError:
+            logging.error("CSV file not found.")
+            return pd.DataFrame()
         except Exception as e:
-            logging.error(f"Unexpected error in _filter_by_condition: {e}")
+            logging.error(f"An unexpected error occurred while loading CSV: {e}")
+            return pd.DataFrame()
+
+    def _filter_invalid_data(self) -> None:
+        """
+        Applies the data cleansing rules to the loaded maritime data in a single pass.
+
+        The flags and outlier statistics are computed by the validation pipeline of
+        :mod:`app.pipeline`, which only evaluates the stages not already computed on
+        this version of the raw data; each invalid row is then counted under its first
+        failing check, and the filtered data are the rows without any flag.
+
+        :return: None
+        :raises ValueError: If a column checked by the rules is missing from the data.
+        """
+        flags, self.outliers = self.validation.validate(self.raw_data)
+        self.rows = self.rows._replace(flags=flags)
+        with self.validation.metrics.stage("summarize_invalid_data", len(flags)):
+            self._summarize_flags()
 
     def get_invalid_data_for_vessel(
         self, vessel_code: int
@@ -287,15 +628,42 @@ class MaritimeData:
         :return: A nested dictionary summarizing invalid data by problem type and column.
         :rtype: Dict[str, Dict[str, Dict[str, int]]]
         """
-        sorted_summary = {}
-        if vessel_code in self.invalid_data:
-            vessel_summary = self.invalid_data[vessel_code]
-            for problem_type, columns in vessel_summary.items():
-                sorted_columns = sorted(
-                    columns.items(), key=lambda x: x[1], reverse=True
-                )
-                sorted_summary[problem_type] = dict(sorted_columns)
-        return sorted_summary
+        return self.summaries.invalid.for_vessel(vessel_code)
+
+    def get_invalid_rows_for_vessel(
+        self,
+        vessel_code: int,
+        problem_type: str,
+        column: str,
+        first_only: bool = False,
+        limit: Optional[int] = None,
+    ) -> pd.DataFrame:
+        """
+        Retrieves the raw records of a vessel that fail a specific check.
+
+        :param vessel_code: The unique identifier for the vessel.
+        :param problem_type: The problem type of the check, e.g. 'below_zero'.
+        :param column: The column of the check, e.g. 'power'.
+        :param first_only: Whether to only return the records attributed to the check,
+                i.e. that passed all checks preceding it.
+        :param limit: Maximum number of records to return.
+        :return: The matching raw records, in chronological order if the data are
+                indexed.
+        :rtype: pd.DataFrame
+        :raises ValueError: If there is no such check.
+        """
+        rules = self.validation.rules.keys()
+        if (problem_type, column) not in rules:
+            raise ValueError(f"Unknown check {problem_type} on column {column}.")
+        bit = 1 << rules.index((problem_type, column))
+        positions = self._vessel_positions(vessel_code, valid_only=False)
+        flags = self.flags[positions]
+        if first_only:
+            # No bit of an earlier check set, and the bit of this check set
+            failed = (flags & flags.dtype.type((bit << 1) - 1)) == bit
+        else:
+            failed = (flags & flags.dtype.type(bit)) != 0
+        return self.raw_data.take(positions[failed][: limit or None])
 
     def get_speed_differences_for_vessel(
         self, vessel_code: int, limit=None
@@ -303,28 +671,30 @@ class MaritimeData:
         """
         Calculates the speed differences between actual and proposed speeds for a vessel.
 
-        For each record pertaining to the specified vessel, computes the absolute difference
-        between actual and proposed speeds over ground, adding these as a new metric.
+        For each record pertaining to the specified vessel, selects the absolute difference
+        between actual and proposed speeds over ground, derived once for every row when the
+        data were loaded.
 
         :param vessel_code: The unique identifier for the vessel.
+        :param limit: Maximum number of records to return.
         :return: A list of dictionaries, each containing latitude, longitude, and the calculated
                 speed difference for a record.
         :rtype: List[Dict[str, Any]]
         """
-        vessel_data = self.filtered_data[
-            self.filtered_data["vessel_code"] == vessel_code
-        ].copy()
-        if vessel_data.empty:
+        positions = self._vessel_positions(vessel_code)
+        if not positions.size:
             return {}
 
-        vessel_data["speed_difference"] = abs(
-            vessel_data["actual_speed_overground"]
-            - vessel_data["proposed_speed_overground"]
+        positions = positions[: limit or None]
+        speed_differences = pd.DataFrame(
+            {
+                "latitude": self.raw_data["latitude"].to_numpy()[positions],
+                "longitude": self.raw_data["longitude"].to_numpy()[positions],
+                "speed_difference": self.rows.derived_columns[SPEED_DIFFERENCE][
+                    positions
+                ],
+            }
         )
-
-        speed_differences = vessel_data[["latitude", "longitude", "speed_difference"]]
-        if limit:
-            speed_differences = speed_differences[:limit]
         return speed_differences.to_dict(orient="records")
 
     def calculate_compliance_score(self, vessel_code: int) -> float:
@@ -333,35 +703,14 @@ class MaritimeData:
 
         The score is an average percentage representing how closely the vessel's actual
         speed adheres to proposed speeds, with higher scores indicating closer adherence.
+        It is looked up in :attr:`summaries`, which keeps the count and sum of the
+        percentage deviations of every vessel up to date as the data change.
 
         :param vessel_code: The unique identifier for the vessel.
         :return: The compliance score as a float rounded to two decimal places.
         :rtype: float
         """
-        vessel_data = self.filtered_data[
-            self.filtered_data["vessel_code"] == vessel_code
-        ].copy()
-
-        # Avoid division by zero by filtering out proposed speeds that are exactly zero
-        vessel_data = vessel_data[vessel_data["proposed_speed_overground"] != 0]
-
-        if len(vessel_data) == 0:
-            return 0.0  # Return 0 compliance if there's no data to calculate on
-
-        # Calculate the percentage difference between actual and proposed speeds
-        vessel_data["percentage_difference"] = (
-            abs(
-                vessel_data["actual_speed_overground"]
-                - vessel_data["proposed_speed_overground"]
-            )
-            / vessel_data["proposed_speed_overground"]
-        ) * 100
-
-        # Calculate the average of these percentage differences and subtract from 100
-        compliance_score = 100 - vessel_data["percentage_difference"].mean()
-
-        # Return the score formatted to two decimal places
-        return round(compliance_score, 2)
+        return self.summaries.compliance.score(vessel_code)
 
     def compare_vessel_compliance(self, vessel_code1: int, vessel_code2: int) -> str:
         """
@@ -376,10 +725,10 @@ class MaritimeData:
         :rtype: str
         """
         # Check if the vessel codes exist in the dataset
-        if vessel_code1 not in self.filtered_data["vessel_code"].values:
+        if vessel_code1 not in self.summaries.compliance:
             return f"Vessel code {vessel_code1} does not exist."
 
-        if vessel_code2 not in self.filtered_data["vessel_code"].values:
+        if vessel_code2 not in self.summaries.compliance:
             return f"Vessel code {vessel_code2} does not exist."
 
         score1 = self.calculate_compliance_score(vessel_code1)
@@ -401,56 +750,160 @@ class MaritimeData:
             return message
         return f"Both vessels have the same compliance score of {score1}%."
 
+    def compliance_leaderboard(
+        self, start_date: Optional[str] = None, end_date: Optional[str] = None
+    ) -> pd.DataFrame:
+        """
+        Ranks every vessel of the fleet by compliance score.
+
+        Without a period, the scores are those of :meth:`calculate_compliance_score`,
+        taken from :attr:`summaries`. Over a period, the valid rows within it
+        are aggregated per vessel in one vectorized group-by. Leaderboards are cached in
+        :attr:`summaries` for the version of the dataset.
+
+        :param start_date: Start of the period (inclusive), a 'YYYY-MM-DD' date or an
+            ISO-8601 timestamp, or None for no lower bound.
+        :param end_date: End of the period (inclusive), a 'YYYY-MM-DD' date or an
+            ISO-8601 timestamp, or None for no upper bound.
+        :return: One row per vessel with valid records in the period, with its rank,
+                vessel code, compliance score, percentile and number of rows scored,
+                best first (see :func:`~app.compliance.rank_vessels`).
+        :rtype: pd.DataFrame
+        :raises ValueError: If a bound cannot be parsed or the start is after the end.
+        """
+        start, end = self._parse_period(start_date, end_date)
+        key = (self.version, start, end)
+        leaderboard = self.summaries.leaderboards.get(key)
+        if leaderboard is not None:
+            return leaderboard
+
+        if start is None and end is None:
+            summary = self.summaries.compliance
+        elif self.raw_data.empty or not is_datetime(self.raw_data["datetime"]):
+            logging.error("datetime column in incorrect format")
+            summary = ComplianceSummary([], [], [], [])
+        else:
+            within = self.flags == 0
+            timestamps = self.raw_data["datetime"].to_numpy()
+            if start is not None:
+                within &= timestamps >= start.to_datetime64()
+            if end is not None:
+                within &= timestamps <= end.to_datetime64()
+            summary = ComplianceSummary.from_rows(
+                self.raw_data["vessel_code"].to_numpy(),
+                self.rows.derived_columns[SPEED_DEVIATION],
+                within,
+            )
+        leaderboard = rank_vessels(summary)
+        self.summaries.leaderboards.put(key, leaderboard)
+        return leaderboard
+
+    @staticmethod
+    def _parse_period(start_date: Any, end_date: Any) -> Tuple[Any, Any]:
+        """
+        Parses the bounds of a period with :func:`parse_timestamp`.
+
+        A bound that is None or empty is returned as None, leaving the period open on
+        that side.
+
+        :param start_date: Start of the period.
+        :param end_date: End of the period.
+        :return: The start and end timestamps.
+        :rtype: Tuple[Optional[pd.Timestamp], Optional[pd.Timestamp]]
+        :raises ValueError: If a bound cannot be parsed or the start is after the end.
+        """
+        try:
+            start, end = (
+                parse_timestamp(bound) if bound else None
+                for bound in (start_date, end_date)
+            )
+        except ValueError:
+            logging.error(PERIOD_FORMAT_MESSAGE)
+            raise
+
+        # Check if start date is after end date
+        if start is not None and end is not None and start > end:
+            logging.error("Start date cannot be after end date.")
+            raise ValueError("Start date cannot be after end date.")
+        return start, end
+
+    def _vessel_period_positions(
+        self,
+        vessel_code: int,
+        start: pd.Timestamp,
+        end: pd.Timestamp,
+        valid_only: bool,
+    ) -> np.ndarray:
+        """
+        Locates the rows of a vessel within a period in :attr:`raw_data`.
+
+        When the data are indexed, the period is located by binary search in the
+        timestamps of the vessel, so only the rows returned are touched, for a single
+        CSV as for a partitioned dataset. Otherwise the whole fleet is scanned.
+
+        :param vessel_code: Unique identifier for the vessel.
+        :param start: Start of the period (inclusive).
+        :param end: End of the period (inclusive).
+        :param valid_only: Whether to only locate the rows that passed all checks.
+        :return: The positions of the matching rows, in chronological order if the data
+                are indexed and in dataset order otherwise.
+        :rtype: np.ndarray
+        """
+        if self.rows.vessel_index is not None:
+            positions = self.rows.vessel_index.period(
+                vessel_code, start.to_datetime64(), end.to_datetime64()
+            )
+            if valid_only:
+                positions = positions[self.flags[positions] == 0]
+            return positions
+        timestamps = self.raw_data["datetime"].to_numpy()
+        mask = (
+            (self.raw_data["vessel_code"].to_numpy() == vessel_code)
+            & (timestamps >= start.to_datetime64())
+            & (timestamps <= end.to_datetime64())
+        )
+        if valid_only:
+            mask &= self.flags == 0
+        return np.flatnonzero(mask)
+
     def get_metrics_for_vessel_period(
         self, vessel_code: int, start_date: str, end_date: str, limit=None
     ) -> List[Dict[str, Any]]:
         """
         Retrieves filtered data metrics for a specific vessel over a given period.
 
-        Metrics include calculated speed differences between actual and proposed speeds.
+        Metrics include the speed differences between actual and proposed speeds derived
+        when the data were loaded.
         If no data exists for the given period, an empty list is returned.
 
         :param vessel_code: Unique identifier for the vessel.
-        :param start_date: Start of the period in 'YYYY-MM-DD' format.
-        :param end_date: End of the period in 'YYYY-MM-DD' format.
+        :param start_date: Start of the period (inclusive), a 'YYYY-MM-DD' date or an
+            ISO-8601 timestamp.
+        :param end_date: End of the period (inclusive), a 'YYYY-MM-DD' date or an
+            ISO-8601 timestamp.
         :return: List of dictionaries with data for each record within the period.
         :rtype: List[Dict[str, Any]]
         """
-        # Convert string dates to datetime objects for comparison
-        try:
-            start_date_obj = datetime.strptime(start_date, "%Y-%m-%d")
-            end_date_obj = datetime.strptime(end_date, "%Y-%m-%d")
-        except ValueError:
-            # Incorrect date format
-            logging.error("Date format should be YYYY-MM-DD.")
-            raise ValueError("Date format should be YYYY-MM-DD.")
-
-        # Check if start date is after end date
-        if start_date_obj > end_date_obj:
-            logging.error("Start date cannot be after end date.")
-            raise ValueError("Start date cannot be after end date.")
+        start, end = self._parse_period(start_date, end_date)
 
         # Check if datetime column is in the correct format
-        if not is_datetime(self.filtered_data["datetime"]):
+        if not is_datetime(self.raw_data["datetime"]):
             logging.error("datetime column in incorrect format")
             return []
 
-        filtered_data = self.filtered_data[
-            (self.filtered_data["vessel_code"] == vessel_code)
-            & (self.filtered_data["datetime"] >= start_date)
-            & (self.filtered_data["datetime"] <= end_date)
-        ].copy()
+        positions = self._vessel_period_positions(
+            vessel_code, start, end, valid_only=True
+        )
 
-        if filtered_data.empty:
+        if not positions.size:
             logging.error("No data found for the specified vessel and period.")
             return []
 
-        filtered_data["speed_difference"] = abs(
-            filtered_data["actual_speed_overground"]
-            - filtered_data["proposed_speed_overground"]
-        )
-        if limit:
-            filtered_data = filtered_data[:limit]
+        positions = positions[: limit or None]
+        filtered_data = self.raw_data.take(positions)
+        filtered_data[SPEED_DIFFERENCE] = self.rows.derived_columns[SPEED_DIFFERENCE][
+            positions
+        ]
         return filtered_data
 
     def get_raw_metrics_for_vessel_period(
@@ -463,35 +916,21 @@ class MaritimeData:
         but without applying any data cleansing or additional calculations.
 
         :param vessel_code: Unique identifier for the vessel.
-        :param start_date: Start of the period in 'YYYY-MM-DD' format.
-        :param end_date: End of the period in 'YYYY-MM-DD' format.
+        :param start_date: Start of the period (inclusive), a 'YYYY-MM-DD' date or an
+            ISO-8601 timestamp.
+        :param end_date: End of the period (inclusive), a 'YYYY-MM-DD' date or an
+            ISO-8601 timestamp.
         :return: List of dictionaries with raw data for each record within the period.
         :rtype: List[Dict[str, Any]]
         """
-        # Convert string dates to datetime objects for comparison
-        try:
-            start_date_obj = datetime.strptime(start_date, "%Y-%m-%d")
-            end_date_obj = datetime.strptime(end_date, "%Y-%m-%d")
-        except ValueError:
-            # Incorrect date format
-            logging.error("Date format should be YYYY-MM-DD.")
-            raise ValueError("Date format should be YYYY-MM-DD.")
-
-        # Check if start date is after end date
-        if start_date_obj > end_date_obj:
-            logging.error("Start date cannot be after end date.")
-            raise ValueError("Start date cannot be after end date.")
+        start, end = self._parse_period(start_date, end_date)
 
         # Check if datetime column is in the correct format
-        if not is_datetime(self.filtered_data["datetime"]):
+        if not is_datetime(self.raw_data["datetime"]):
             logging.error("datetime column in incorrect format")
             return []
 
-        raw_data_filtered = self.raw_data[
-            (self.raw_data["vessel_code"] == vessel_code)
-            & (self.raw_data["datetime"] >= start_date)
-            & (self.raw_data["datetime"] <= end_date)
-        ].copy()
-        if limit:
-            raw_data_filtered = raw_data_filtered[:limit]
-        return raw_data_filtered
+        positions = self._vessel_period_positions(
+            vessel_code, start, end, valid_only=False
+        )
+        return self.raw_data.take(positions[: limit or None])
@@ -0,0 +1,643 @@
+"""
+Module implementing the statistics of the outlier checks.
+
+Values are scored by their absolute deviation from a center in units of a scale, in one
+of three modes:
+
+* ``global``: z-score against the mean and standard deviation of the whole fleet.
+* ``per_vessel``: z-score against the mean and standard deviation of the vessel.
+* ``per_vessel_mad``: robust score against the median and the median absolute deviation
+  (MAD) of the vessel, scaled to be comparable with a standard deviation.
+
+Per-vessel statistics are computed for all vessels at once with grouped NumPy kernels:
+bincount reductions for means and standard deviations, and reductions over segments of
+the values sorted by vessel for medians.
+
+Means and standard deviations are derived from :class:`RunningStats`, mergeable
+sufficient statistics that are updated with Chan's parallel algorithm as rows are
+appended, without revisiting the rows already loaded. :class:`SortedValues` keeps the
+values of the accepted rows sorted, so that the rows whose score crosses the threshold
+under updated statistics are found by binary search instead of a full scan. The median
+and MAD have no such mergeable form, so the ``per_vessel_mad`` mode keeps the statistics
+computed at load time.
+
+:class:`OutlierState` holds these statistics for a dataset and reclassifies its accepted
+rows when appended rows shift the running statistics.
+"""
+
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .rules import Check, numeric_values
+
+OUTLIER_MODES = ("global", "per_vessel", "per_vessel_mad")
+# Makes the MAD a consistent estimator of the standard deviation of normal data
+MAD_SCALE = 1.4826
+
+
+class OutlierStats:
+    """
+    Center and scale of the values of an outlier column, fleet-wide or per vessel.
+
+    :param center: The center, one value or one per vessel.
+    :type center: np.ndarray
+    :param scale: The scale, one value or one per vessel.
+    :type scale: np.ndarray
+    :param vessel_codes: The sorted vessel codes the centers and scales belong to, or
+        None for fleet-wide statistics.
+    :type vessel_codes: Optional[np.ndarray]
+    """
+
+    def __init__(
+        self,
+        center: np.ndarray,
+        scale: np.ndarray,
+        vessel_codes: Optional[np.ndarray] = None,
+    ) -> None:
+        """
+        Initializes the statistics.
+        """
+        self.center = np.asarray(center, dtype=np.float64)
+        self.scale = np.asarray(scale, dtype=np.float64)
+        self.vessel_codes = None if vessel_codes is None else np.asarray(vessel_codes)
+
+    def __eq__(self, other: Any) -> bool:
+        """Compares two statistics, considering NaN values equal."""
+        if not isinstance(other, OutlierStats):
+            return NotImplemented
+        if (self.vessel_codes is None) != (other.vessel_codes is None):
+            return False
+        return (
+            np.array_equal(self.center, other.center, equal_nan=True)
+            and np.array_equal(self.scale, other.scale, equal_nan=True)
+            and (
+                self.vessel_codes is None
+                or np.array_equal(self.vessel_codes, other.vessel_codes)
+            )
+        )
+
+    def __repr__(self) -> str:
+        """Represents the statistics with their centers and scales."""
+        return (
+            f"OutlierStats(center={self.center!r}, scale={self.scale!r}, "
+            f"vessel_codes={self.vessel_codes!r})"
+        )
+
+    def scores(self, values: np.ndarray, vessel_codes: np.ndarray) -> np.ndarray:
+        """
+        Scores values by their absolute deviation from the center in units of the scale.
+
+        :param values: The values to score.
+        :param vessel_codes: The vessel code of each value, used by per-vessel statistics.
+        :return: The scores, NaN for missing values, values of vessels without
+                statistics and values whose scale is zero.
+        :rtype: np.ndarray
+        """
+        values = np.asarray(values, dtype=np.float64)
+        if self.vessel_codes is None:
+            center, scale = self.center[0], self.scale[0]
+        else:
+            center, scale = statistics_for(self, vessel_codes)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            scores = np.abs(values - center) / scale
+        return np.where(scale > 0, scores, np.nan)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Converts the statistics to a JSON-serializable dictionary.
+
+        :return: Dictionary with the centers, scales and vessel codes as lists.
+        :rtype: Dict[str, Any]
+        """
+        return {
+            "center": self.center.tolist(),
+            "scale": self.scale.tolist(),
+            "vessel_codes": (
+                None if self.vessel_codes is None else self.vessel_codes.tolist()
+            ),
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "OutlierStats":
+        """
+        Restores statistics converted with :meth:`to_dict`.
+
+        :param data: The dictionary of the statistics.
+        :return: The statistics.
+        :rtype: OutlierStats
+        """
+        return cls(data["center"], data["scale"], data["vessel_codes"])
+
+
+class RunningStats:
+    """
+    Mergeable sufficient statistics of the values of an outlier column, fleet-wide or
+    per vessel: the number of values, their mean and their sum of squared deviations
+    from the mean.
+
+    :param count: The number of values, one or one per vessel.
+    :type count: np.ndarray
+    :param mean: The mean of the values, one or one per vessel.
+    :type mean: np.ndarray
+    :param m2: The sum of squared deviations from the mean, one or one per vessel.
+    :type m2: np.ndarray
+    :param vessel_codes: The sorted vessel codes the statistics belong to, or None for
+        fleet-wide statistics.
+    :type vessel_codes: Optional[np.ndarray]
+    """
+
+    def __init__(
+        self,
+        count: np.ndarray,
+        mean: np.ndarray,
+        m2: np.ndarray,
+        vessel_codes: Optional[np.ndarray] = None,
+    ) -> None:
+        """
+        Initializes the statistics.
+        """
+        self.count = np.asarray(count, dtype=np.int64)
+        self.mean = np.asarray(mean, dtype=np.float64)
+        self.m2 = np.asarray(m2, dtype=np.float64)
+        self.vessel_codes = None if vessel_codes is None else np.asarray(vessel_codes)
+
+    def __eq__(self, other: Any) -> bool:
+        """Compares two statistics."""
+        if not isinstance(other, RunningStats):
+            return NotImplemented
+        return self.to_dict() == other.to_dict()
+
+    @classmethod
+    def from_values(
+        cls, values: np.ndarray, vessel_codes: Optional[np.ndarray] = None
+    ) -> "RunningStats":
+        """
+        Computes the statistics of values in two passes.
+
+        :param values: The values, without missing values.
+        :param vessel_codes: The vessel code of each value for per-vessel statistics, or
+            None for fleet-wide statistics.
+        :return: The statistics.
+        :rtype: RunningStats
+        """
+        values = np.asarray(values, dtype=np.float64)
+        if vessel_codes is None:
+            if len(values) == 0:
+                return cls([0], [0.0], [0.0])
+            mean = values.mean()
+            return cls([len(values)], [mean], [((values - mean) ** 2).sum()])
+        groups, codes = pd.factorize(np.asarray(vessel_codes), sort=True)
+        count = np.bincount(groups, minlength=len(codes))
+        mean = np.bincount(groups, weights=values, minlength=len(codes)) / count
+        m2 = np.bincount(
+            groups, weights=(values - mean[groups]) ** 2, minlength=len(codes)
+        )
+        return cls(count, mean, m2, np.asarray(codes))
+
+    def _expand(self, vessel_codes: np.ndarray) -> "RunningStats":
+        """Lays the statistics out over a superset of their vessel codes."""
+        positions = np.searchsorted(vessel_codes, self.vessel_codes)
+        count = np.zeros(len(vessel_codes), dtype=np.int64)
+        mean = np.zeros(len(vessel_codes))
+        m2 = np.zeros(len(vessel_codes))
+        count[positions], mean[positions], m2[positions] = (
+            self.count,
+            self.mean,
+            self.m2,
+        )
+        return RunningStats(count, mean, m2, vessel_codes)
+
+    def merge(self, other: "RunningStats") -> "RunningStats":
+        """
+        Combines the statistics of two disjoint sets of values with Chan's parallel
+        algorithm.
+
+        :param other: The statistics of the other values, fleet-wide if and only if
+            these are.
+        :return: The statistics of the union of both sets of values.
+        :rtype: RunningStats
+        """
+        vessel_codes = None
+        first, second = self, other
+        if self.vessel_codes is not None:
+            vessel_codes = np.union1d(self.vessel_codes, other.vessel_codes)
+            first, second = self._expand(vessel_codes), other._expand(vessel_codes)
+        total = first.count + second.count
+        delta = second.mean - first.mean
+        with np.errstate(divide="ignore", invalid="ignore"):
+            mean = first.mean + delta * second.count / total
+            m2 = first.m2 + second.m2 + delta**2 * first.count * second.count / total
+        # Copy the statistics of a side without values, so merging into empty
+        # statistics reproduces the merged ones exactly
+        mean = np.where(second.count == 0, first.mean, mean)
+        mean = np.where(first.count == 0, second.mean, mean)
+        m2 = np.where(second.count == 0, first.m2, m2)
+        m2 = np.where(first.count == 0, second.m2, m2)
+        return RunningStats(total, mean, m2, vessel_codes)
+
+    def to_outlier_stats(self) -> OutlierStats:
+        """
+        Derives the mean and population standard deviation the values are scored against.
+
+        :return: The statistics, with a zero scale where there are no values.
+        :rtype: OutlierStats
+        """
+        with np.errstate(divide="ignore", invalid="ignore"):
+            std = np.where(self.count > 0, np.sqrt(self.m2 / self.count), 0.0)
+        return OutlierStats(self.mean, std, self.vessel_codes)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Converts the statistics to a JSON-serializable dictionary.
+
+        :return: Dictionary with the counts, means, sums of squared deviations and vessel
+                codes as lists.
+        :rtype: Dict[str, Any]
+        """
+        return {
+            "count": self.count.tolist(),
+            "mean": self.mean.tolist(),
+            "m2": self.m2.tolist(),
+            "vessel_codes": (
+                None if self.vessel_codes is None else self.vessel_codes.tolist()
+            ),
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "RunningStats":
+        """
+        Restores statistics converted with :meth:`to_dict`.
+
+        :param data: The dictionary of the statistics.
+        :return: The statistics.
+        :rtype: RunningStats
+        """
+        return cls(data["count"], data["mean"], data["m2"], data["vessel_codes"])
+
+
+class SortedValues:
+    """
+    Values of an outlier column sorted by vessel and value, to find the values scoring
+    above a threshold by binary search.
+
+    :param values: The values, without missing values.
+    :type values: np.ndarray
+    :param positions: The row position of each value.
+    :type positions: np.ndarray
+    :param vessel_codes: The vessel code of each value to sort values per vessel, or
+        None to sort them fleet-wide.
+    :type vessel_codes: Optional[np.ndarray]
+    """
+
+    def __init__(
+        self,
+        values: np.ndarray,
+        positions: np.ndarray,
+        vessel_codes: Optional[np.ndarray] = None,
+    ) -> None:
+        """
+        Sorts the values and records the segment of every vessel.
+        """
+        values = np.asarray(values, dtype=np.float64)
+        if vessel_codes is None:
+            order = np.argsort(values, kind="stable")
+            self.vessel_codes = None
+            self.bounds = np.array([0, len(values)])
+        else:
+            groups, codes = pd.factorize(np.asarray(vessel_codes), sort=True)
+            order = np.lexsort((values, groups))
+            self.vessel_codes = np.asarray(codes)
+            self.bounds = np.concatenate(
+                [[0], np.cumsum(np.bincount(groups, minlength=len(codes)))]
+            )
+        self.values = values[order]
+        self.positions = np.asarray(positions)[order]
+
+    def above(
+        self,
+        statistics: OutlierStats,
+        threshold: float,
+        vessel_codes: Optional[np.ndarray] = None,
+    ) -> np.ndarray:
+        """
+        Finds the positions of the values scoring above a threshold.
+
+        Only the values outside the center plus or minus the threshold times the scale
+        are visited, located by binary search within the segment of each vessel.
+
+        :param statistics: The statistics the values are scored against, fleet-wide if
+            and only if the values are sorted fleet-wide.
+        :param threshold: The score above which values are returned.
+        :param vessel_codes: The vessels to check, or None to check all of them.
+        :return: The row positions of the values scoring above the threshold.
+        :rtype: np.ndarray
+        """
+        if self.vessel_codes is None:
+            segments = [(0, statistics.center[0], statistics.scale[0])]
+        else:
+            if vessel_codes is None:
+                vessel_codes = self.vessel_codes
+            vessel_codes = np.intersect1d(vessel_codes, self.vessel_codes)
+            segments = zip(
+                np.searchsorted(self.vessel_codes, vessel_codes),
+                *statistics_for(statistics, vessel_codes),
+            )
+        found = []
+        for segment, center, scale in segments:
+            if not scale > 0:
+                continue
+            start, end = self.bounds[segment], self.bounds[segment + 1]
+            values = self.values[start:end]
+            # Widen the search slightly and confirm with the exact scores, so that
+            # rounding in the bounds never misses a value
+            margin = threshold * scale * (1 - 1e-9)
+            lower = start + np.searchsorted(values, center - margin, side="right")
+            upper = start + np.searchsorted(values, center + margin, side="left")
+            for part in (slice(start, lower), slice(upper, end)):
+                scores = np.abs(self.values[part] - center) / scale
+                found.append(self.positions[part][scores > threshold])
+        if not found:
+            return np.array([], dtype=np.int64)
+        return np.sort(np.concatenate(found))
+
+
+def statistics_for(
+    statistics: OutlierStats, vessel_codes: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Looks up the per-vessel center and scale of vessels.
+
+    :param statistics: Per-vessel statistics.
+    :param vessel_codes: The vessel codes to look up.
+    :return: The center and scale of each vessel, with a zero scale for vessels without
+            statistics.
+    :rtype: Tuple[np.ndarray, np.ndarray]
+    """
+    if len(statistics.vessel_codes) == 0:
+        return np.zeros(len(vessel_codes)), np.zeros(len(vessel_codes))
+    positions = np.searchsorted(statistics.vessel_codes, vessel_codes)
+    positions = np.minimum(positions, len(statistics.vessel_codes) - 1)
+    known = statistics.vessel_codes[positions] == vessel_codes
+    return (
+        np.where(known, statistics.center[positions], 0.0),
+        np.where(known, statistics.scale[positions], 0.0),
+    )
+
+
+def grouped_median(
+    values: np.ndarray, groups: np.ndarray, group_count: int
+) -> np.ndarray:
+    """
+    Computes the median of every group from the values sorted by group and value.
+
+    :param values: The values.
+    :param groups: The group index of each value, from 0 to ``group_count - 1``.
+    :param group_count: The number of groups, each holding at least one value.
+    :return: The median of each group.
+    :rtype: np.ndarray
+    """
+    sorted_values = values[np.lexsort((values, groups))]
+    counts = np.bincount(groups, minlength=group_count)
+    starts = np.cumsum(counts) - counts
+    lower = sorted_values[starts + (counts - 1) // 2]
+    upper = sorted_values[starts + counts // 2]
+    return (lower + upper) / 2
+
+
+def compute_running_stats(
+    values: np.ndarray, vessel_codes: np.ndarray, mode: str
+) -> Optional[RunningStats]:
+    """
+    Computes the running statistics of an outlier column in the given mode.
+
+    :param values: The values the statistics are computed over, without missing values.
+    :param vessel_codes: The vessel code of each value.
+    :param mode: One of :data:`OUTLIER_MODES`.
+    :return: Fleet-wide statistics in the ``global`` mode, per-vessel statistics in the
+            ``per_vessel`` mode, and None in the ``per_vessel_mad`` mode, whose
+            statistics cannot be updated incrementally.
+    :rtype: Optional[RunningStats]
+    """
+    if mode == "global":
+        return RunningStats.from_values(values)
+    if mode == "per_vessel":
+        return RunningStats.from_values(values, vessel_codes)
+    return None
+
+
+def compute_outlier_stats(
+    values: np.ndarray, vessel_codes: np.ndarray, mode: str
+) -> OutlierStats:
+    """
+    Computes the statistics of an outlier column in the given mode.
+
+    :param values: The values the statistics are computed over, without missing values.
+    :param vessel_codes: The vessel code of each value.
+    :param mode: One of :data:`OUTLIER_MODES`.
+    :return: The statistics.
+    :rtype: OutlierStats
+    :raises ValueError: If the mode is unknown.
+    """
+    if mode not in OUTLIER_MODES:
+        raise ValueError(
+            f"Unknown outlier mode {mode}; expected one of {OUTLIER_MODES}."
+        )
+    running = compute_running_stats(values, vessel_codes, mode)
+    if running is not None:
+        return running.to_outlier_stats()
+    values = np.asarray(values, dtype=np.float64)
+    groups, codes = pd.factorize(np.asarray(vessel_codes), sort=True)
+    center = grouped_median(values, groups, len(codes))
+    deviation = np.abs(values - center[groups])
+    scale = grouped_median(deviation, groups, len(codes)) * MAD_SCALE
+    return OutlierStats(center, scale, np.asarray(codes))
+
+
+def outlier_mask(
+    values: pd.Series, vessel_codes: pd.Series, mode: str, threshold: float
+) -> Tuple[pd.Series, OutlierStats]:
+    """
+    Detects the outliers of a column in the given mode.
+
+    :param values: The values of the column; missing values are ignored.
+    :param vessel_codes: The vessel code of each value.
+    :param mode: One of :data:`OUTLIER_MODES`.
+    :param threshold: The score above which a value is an outlier.
+    :return: A boolean Series aligned with the values, True for outliers, and the
+            statistics the values were scored against.
+    :rtype: Tuple[pd.Series, OutlierStats]
+    """
+    present = values.notna().to_numpy()
+    numbers = values.to_numpy(dtype=np.float64, na_value=np.nan)
+    codes = vessel_codes.to_numpy()
+    stats = compute_outlier_stats(numbers[present], codes[present], mode)
+    scores = stats.scores(numbers, codes)
+    return pd.Series(scores > threshold, index=values.index), stats
+
+
+class OutlierState(NamedTuple):
+    """
+    Statistics of the outlier checks of a dataset.
+
+    The state is replaced rather than mutated, so that a snapshot of the dataset copied
+    to ingest rows or reclassify outliers leaves the published one untouched.
+
+    :ivar outlier_stats: Center and scale of each outlier column, fleet-wide or per
+        vessel, frozen when the rows were validated and used to validate rows ingested
+        incrementally.
+    :ivar running_stats: Sufficient statistics of each outlier column, updated as rows
+        are appended; empty in the ``per_vessel_mad`` mode.
+    :ivar reclassifications: Number of times outliers were reclassified with the
+        running statistics.
+    :ivar sorted_values: Accepted values of each outlier column sorted per vessel,
+        covering the first ``sorted_rows`` rows, or None until the first
+        reclassification preview.
+    :ivar sorted_rows: Number of rows covered by ``sorted_values``.
+    """
+
+    outlier_stats: Dict[str, OutlierStats]
+    running_stats: Dict[str, RunningStats]
+    reclassifications: int = 0
+    sorted_values: Optional[Dict[str, SortedValues]] = None
+    sorted_rows: int = 0
+
+    def merge_rows(
+        self, rows: pd.DataFrame, flags: np.ndarray, checks: List[Tuple[int, Check]]
+    ) -> "OutlierState":
+        """
+        Merges the values of appended rows into the running statistics.
+
+        Like at load time, the statistics of each outlier column include the values of
+        the rows that passed all previous checks.
+
+        :param rows: The appended rows.
+        :param flags: The validation flags of the appended rows.
+        :param checks: The outlier checks with their index in the validation rules.
+        :return: The state with the merged running statistics.
+        :rtype: OutlierState
+        """
+        running_stats = dict(self.running_stats)
+        vessel_codes = rows["vessel_code"].to_numpy()
+        for index, check in checks:
+            running = running_stats.get(check.column)
+            if running is None:
+                continue
+            values = numeric_values(rows[check.column].to_numpy())
+            selected = ((flags & flags.dtype.type((1 << index) - 1)) == 0) & ~np.isnan(
+                values
+            )
+            running_stats[check.column] = running.merge(
+                RunningStats.from_values(
+                    values[selected],
+                    None if running.vessel_codes is None else vessel_codes[selected],
+                )
+            )
+        return OutlierState(
+            self.outlier_stats,
+            running_stats,
+            self.reclassifications,
+            self.sorted_values,
+            self.sorted_rows,
+        )
+
+    def with_sorted_values(
+        self, raw_data: pd.DataFrame, flags: np.ndarray
+    ) -> "OutlierState":
+        """
+        Sorts the accepted values of each outlier column with running statistics.
+
+        The sorted values are built once and shared by the snapshots derived from the
+        state. They cover the rows accepted when they were built; they are rebuilt once
+        more rows were appended since then than they cover.
+
+        :param raw_data: The rows of the dataset.
+        :param flags: The validation flags of the rows.
+        :return: The state with values sorted per vessel for per-vessel statistics and
+                fleet-wide otherwise.
+        :rtype: OutlierState
+        """
+        if self.sorted_values is not None and len(raw_data) <= 2 * self.sorted_rows:
+            return self
+        accepted = np.flatnonzero(flags == 0)
+        vessel_codes = raw_data["vessel_code"].to_numpy()[accepted]
+        sorted_values = {}
+        for column, running in self.running_stats.items():
+            values = numeric_values(raw_data[column].to_numpy())[accepted]
+            present = ~np.isnan(values)
+            sorted_values[column] = SortedValues(
+                values[present],
+                accepted[present],
+                None if running.vessel_codes is None else vessel_codes[present],
+            )
+        return OutlierState(
+            self.outlier_stats,
+            self.running_stats,
+            self.reclassifications,
+            sorted_values,
+            len(raw_data),
+        )
+
+    def reclassification_flags(
+        self, raw_data: pd.DataFrame, flags: np.ndarray, checks: List[Tuple[int, Check]]
+    ) -> Tuple[np.ndarray, np.ndarray, Dict[str, OutlierStats]]:
+        """
+        Finds the accepted rows scoring above the threshold under the running statistics.
+
+        Only the vessels whose statistics changed are checked, by binary search in the
+        sorted accepted values of :meth:`with_sorted_values`; the rows appended since the
+        values were sorted are scored directly.
+
+        :param raw_data: The rows of the dataset.
+        :param flags: The validation flags of the rows.
+        :param checks: The outlier checks with their index in the validation rules.
+        :return: The row positions of the rows to reject, their outlier flags and the
+                updated statistics.
+        :rtype: Tuple[np.ndarray, np.ndarray, Dict[str, OutlierStats]]
+        """
+        tail = np.arange(self.sorted_rows, len(raw_data))
+        tail = tail[flags[tail] == 0]
+        updated_stats = {}
+        found = {}
+        sorted_values = self.sorted_values or {}
+        for index, check in checks:
+            if check.column not in self.running_stats:
+                continue
+            updated = self.running_stats[check.column].to_outlier_stats()
+            updated_stats[check.column] = updated
+            positions = self._crossing_rows(check, updated, sorted_values[check.column])
+            if positions is None:
+                continue
+            scores = updated.scores(
+                numeric_values(raw_data[check.column].to_numpy()[tail]),
+                raw_data["vessel_code"].to_numpy()[tail],
+            )
+            found[index] = np.concatenate(
+                [positions, tail[scores > check.params["threshold"]]]
+            )
+        # Rows rejected since the values were sorted are no longer accepted
+        positions = np.unique(np.concatenate([np.zeros(0, np.int64), *found.values()]))
+        positions = positions[flags[positions] == 0]
+        reclassified = np.zeros(len(positions), dtype=flags.dtype)
+        for index, check_positions in found.items():
+            reclassified[np.isin(positions, check_positions)] |= flags.dtype.type(
+                1 << index
+            )
+        return positions, reclassified, updated_stats
+
+    def _crossing_rows(
+        self, check: Check, updated: OutlierStats, sorted_values: SortedValues
+    ) -> Optional[np.ndarray]:
+        """Finds the sorted accepted rows of a check scoring above its threshold."""
+        previous = self.outlier_stats.get(check.column)
+        changed = None
+        if updated.vessel_codes is not None:
+            # Only the vessels with new values can have rows crossing the threshold
+            centers, scales = statistics_for(previous, updated.vessel_codes)
+            changed = updated.vessel_codes[
+                (centers != updated.center) | (scales != updated.scale)
+            ]
+        elif updated == previous:
+            return None
+        return sorted_values.above(updated, check.params["threshold"], changed)
@@ -0,0 +1,148 @@
+"""
+Module implementing partitioned vessel datasets.
+
+Instead of a single CSV file, the dataset can be a directory of partition files, for
+example one file per vessel and month (``data/vessels/3001/2023-06.csv``). Partitions
+are CSV files parsed with the declared schema of :mod:`app.ingest`, or Parquet files
+when pyarrow is installed. Partitions are read in the sorted order of their relative
+paths and concatenated into one frame.
+
+All partitions are read at load time, since the invalid data and compliance summaries
+cover the whole fleet. Vessel and period queries are answered from the per-vessel index
+of :mod:`app.vessel_index` like those on a single CSV, which only touches the rows
+returned, so partitions are not pruned by vessel or period.
+"""
+
+import importlib.util
+import os
+from typing import List, Tuple
+
+import pandas as pd
+
+from .ingest import CSV_SCHEMA, read_vessel_csv
+
+CSV_EXTENSION = ".csv"
+PARQUET_EXTENSION = ".parquet"
+PARTITION_EXTENSIONS = (CSV_EXTENSION, PARQUET_EXTENSION)
+
+
+def is_partitioned(path: str) -> bool:
+    """
+    Checks whether a dataset path refers to a directory of partitions.
+
+    :param path: Path to the dataset.
+    :return: True if the path is a directory.
+    :rtype: bool
+    """
+    return os.path.isdir(path)
+
+
+def list_partition_files(directory: str) -> List[str]:
+    """
+    Lists the partition files of a dataset directory, recursively.
+
+    Hidden files and directories (such as a cache directory inside the dataset
+    directory) are skipped.
+
+    :param directory: Path to the dataset directory.
+    :return: The paths of the partition files relative to the directory, sorted.
+    :rtype: List[str]
+    """
+    paths = []
+    for root, dirs, files in os.walk(directory):
+        dirs[:] = [name for name in dirs if not name.startswith(".")]
+        for name in files:
+            if not name.startswith(".") and name.endswith(PARTITION_EXTENSIONS):
+                paths.append(os.path.relpath(os.path.join(root, name), directory))
+    return sorted(paths)
+
+
+def source_fingerprint(directory: str) -> List[Tuple[str, int, int]]:
+    """
+    Describes the current version of the partitions of a dataset directory.
+
+    :param directory: Path to the dataset directory.
+    :return: The relative path, size and mtime of every partition file.
+    :rtype: List[Tuple[str, int, int]]
+    """
+    fingerprint = []
+    for path in list_partition_files(directory):
+        stat = os.stat(os.path.join(directory, path))
+        fingerprint.append((path, stat.st_size, stat.st_mtime_ns))
+    return fingerprint
+
+
+def directory_stat(directory: str) -> Tuple[int, int]:
+    """
+    Computes the size and modification time of a dataset directory as a whole.
+
+    :param directory: Path to the dataset directory.
+    :return: The total size of the partition files, and the latest mtime of the
+            partition files and directories, which changes when partitions are added,
+            removed, renamed or modified.
+    :rtype: Tuple[int, int]
+    """
+    size = 0
+    mtime_ns = os.stat(directory).st_mtime_ns
+    for root, dirs, _ in os.walk(directory):
+        dirs[:] = [name for name in dirs if not name.startswith(".")]
+        for name in dirs:
+            mtime_ns = max(mtime_ns, os.stat(os.path.join(root, name)).st_mtime_ns)
+    for _, file_size, file_mtime_ns in source_fingerprint(directory):
+        size += file_size
+        mtime_ns = max(mtime_ns, file_mtime_ns)
+    return size, mtime_ns
+
+
+def read_partition(path: str, workers: int = 1) -> pd.DataFrame:
+    """
+    Reads one partition file with the declared schema.
+
+    :param path: Path to the partition file.
+    :param workers: Maximum number of processes used to parse a CSV partition.
+    :return: The parsed DataFrame.
+    :rtype: pd.DataFrame
+    :raises ImportError: If the partition is a Parquet file and pyarrow is not installed.
+    """
+    if not path.endswith(PARQUET_EXTENSION):
+        return read_vessel_csv(path, workers=workers)
+    if importlib.util.find_spec("pyarrow") is None:
+        raise ImportError(f"Reading the Parquet partition {path} requires pyarrow.")
+    df = pd.read_parquet(path)
+    try:
+        return df.astype(CSV_SCHEMA)
+    except (ValueError, TypeError):
+        # Leave columns violating the schema for the data cleansing filters
+        return df
+
+
+def read_partitioned(directory: str, workers: int = 1) -> pd.DataFrame:
+    """
+    Reads all partitions of a dataset directory into one frame.
+
+    :param directory: Path to the dataset directory.
+    :param workers: Maximum number of processes used to parse each CSV partition.
+    :return: The concatenated frame, with a default index.
+    :rtype: pd.DataFrame
+    """
+    frames = [
+        read_partition(os.path.join(directory, path), workers=workers)
+        for path in list_partition_files(directory)
+    ]
+    if not frames:
+        return pd.DataFrame()
+    return pd.concat(frames, ignore_index=True)
+
+
+def read_vessel_data(path: str, workers: int = 1) -> pd.DataFrame:
+    """
+    Reads a vessel dataset, either a single CSV file or a directory of partitions.
+
+    :param path: Path to the CSV file or dataset directory.
+    :param workers: Maximum number of processes used to parse a CSV file.
+    :return: The parsed DataFrame.
+    :rtype: pd.DataFrame
+    """
+    if is_partitioned(path):
+        return read_partitioned(path, workers=workers)
+    return read_vessel_csv(path, workers=workers)
@@ -0,0 +1,769 @@
+"""
+Module modeling data validation as a small DAG of content-addressed stages.
+
+Every check of the validation rules (see :mod:`app.rules`) is a stage whose output is
+the mask of the rows failing it. A row-local check only depends on the raw data and its
+own parameters. An outlier check is split into two stages: the statistics of its column,
+computed over the rows that passed all previous checks, and the mask of the rows scoring
+above its threshold against those statistics. The statistics therefore depend on the
+masks of all previous checks, and the mask on the statistics and the threshold::
+
+    below_zero:power ──┐
+    missing_value:* ───┼─> statistics:power ──> outlier:power ──> statistics:fuel_...
+    ...             ───┘                       (threshold)
+
+Each stage is addressed by a hash of its parameters and of the addresses of the stages
+it depends on, within a given version of the raw data. Stage outputs are kept by a
+:class:`StageStore`, in memory and, when the dataset is served from the on-disk cache,
+next to its columns. Changing the rules then only recomputes the stages whose address
+changed: changing an outlier threshold recomputes the mask of that check and the
+statistics and masks of the outlier checks after it, while the row-local checks are
+reused, renaming a label recomputes nothing, and a restart with edited rules only
+evaluates the stages that were never computed on the cached dataset.
+
+:class:`ValidationPipeline` applies the rules to the raw data stage by stage, into
+per-row validation flags where bit ``i`` is set when check ``i`` fails.
+"""
+
+from collections import OrderedDict
+import copy
+import logging
+import threading
+import time
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .cache import DatasetCache, FilterResult, StageOutput, config_hash
+from .metrics import LoadMetrics, Stage
+from .outliers import (
+    OUTLIER_MODES,
+    OutlierState,
+    OutlierStats,
+    RunningStats,
+    compute_outlier_stats,
+    compute_running_stats,
+)
+from .rules import (
+    Check,
+    ValidationRules,
+    map_blocks,
+    numeric_values,
+    row_blocks,
+)
+
+# Bump when the semantics of a stage change so that stored outputs are recomputed
+STAGE_VERSION = 1
+# Bump when the semantics of the filters change so that cached results are rebuilt
+FILTER_VERSION = 2
+# Maximum number of stage outputs kept in memory, least recently used first out
+MAX_STAGE_ENTRIES = 256
+
+
+def flag_dtype(rules: List[Tuple[str, str]]) -> np.dtype:
+    """
+    Returns the smallest unsigned integer type holding one bit per check.
+
+    :param rules: The checks as returned by :meth:`~app.rules.ValidationRules.keys`.
+    :return: The dtype of the validation flags.
+    :rtype: np.dtype
+    :raises ValueError: If there are more than 64 checks.
+    """
+    if len(rules) > 64:
+        raise ValueError("At most 64 data cleansing checks are supported.")
+    return np.min_scalar_type((1 << max(len(rules), 1)) - 1)
+
+
+def first_failures(flags: np.ndarray) -> np.ndarray:
+    """
+    Converts validation flags into the index of the first failing check of each row.
+
+    A row failing several checks is attributed to the first one in the order of the
+    validation rules, which is its lowest set bit.
+
+    :param flags: Per-row validation flags.
+    :return: An int8 array with the index of the lowest set bit, -1 for valid rows.
+    :rtype: np.ndarray
+    """
+    lowest = flags & (~flags + flags.dtype.type(1))
+    code = np.full(len(flags), -1, dtype=np.int8)
+    failed = np.flatnonzero(lowest)
+    # The exponent of a power of two is the index of its bit
+    code[failed] = np.frexp(lowest[failed].astype(np.float64))[1] - 1
+    return code
+
+
+class StageNode(NamedTuple):
+    """
+    One stage of the validation DAG.
+
+    :ivar name: The stage, e.g. 'validate:below_zero:power' or 'statistics:power'.
+    :ivar key: The content address of the output of the stage.
+    :ivar index: Index of the check the stage belongs to in
+        :meth:`~app.rules.ValidationRules.keys`.
+    :ivar check: The check the stage belongs to.
+    :ivar kind: 'flags' for the stages computing the mask of a check, 'statistics'
+        for those computing the statistics of an outlier check.
+    """
+
+    name: str
+    key: str
+    index: int
+    check: Check
+    kind: str
+
+
+def plan_stages(
+    rules: ValidationRules, outlier_mode: str, filter_version: int = 0
+) -> List[StageNode]:
+    """
+    Builds the stages of the validation DAG, in an order satisfying their dependencies.
+
+    The address of a mask does not depend on the label of its check nor on its position
+    among the row-local checks, and the statistics of an outlier check depend on the set
+    of masks before it, not on their order.
+
+    :param rules: The validation rules.
+    :param outlier_mode: How outliers are detected, one of
+        :data:`~app.outliers.OUTLIER_MODES`.
+    :param filter_version: Version of the semantics of the filters, part of every
+        address.
+    :return: The stages, the statistics of an outlier check preceding its mask.
+    :rtype: List[StageNode]
+    """
+    version = {"stage": STAGE_VERSION, "filters": filter_version}
+    nodes = []
+    earlier = []
+    for index, check in enumerate(rules.checks):
+        name = f"validate:{check.label}:{check.column}"
+        if check.predicate == "outlier":
+            statistics = config_hash(
+                {
+                    **version,
+                    "statistics": check.column,
+                    "outlier_mode": outlier_mode,
+                    "after": sorted(earlier),
+                }
+            )
+            nodes.append(
+                StageNode(
+                    f"statistics:{check.column}",
+                    statistics,
+                    index,
+                    check,
+                    "statistics",
+                )
+            )
+            key = config_hash(
+                {**version, "outliers": statistics, "params": check.params}
+            )
+        else:
+            key = config_hash(
+                {
+                    **version,
+                    "column": check.column,
+                    "predicate": check.predicate,
+                    "params": check.params,
+                }
+            )
+        nodes.append(StageNode(name, key, index, check, "flags"))
+        earlier.append(key)
+    return nodes
+
+
+class StageStore:
+    """
+    Outputs of the validation stages for one version of the raw data.
+
+    Outputs are kept in memory, up to :data:`MAX_STAGE_ENTRIES` of them, and in the
+    entry of the dataset in the on-disk cache if one is given. Masks are stored packed
+    eight rows per byte. The store is shared by the snapshots derived from the instance
+    that created it, and is safe to use from several threads.
+
+    :param cache: The on-disk cache holding the dataset, or None to keep outputs in
+        memory only, as for datasets that were appended to since they were cached.
+    :type cache: Optional[DatasetCache]
+    :param csv_path: Path to the CSV file or dataset directory of the cache entry.
+    :type csv_path: Optional[str]
+    :param source_sha: Content hash of the cached version of the dataset the outputs are
+        computed on, pinned when it was loaded. Outputs are only loaded from and stored
+        in the cache entry while it holds that version.
+    :type source_sha: Optional[str]
+    """
+
+    def __init__(
+        self,
+        cache: Optional[DatasetCache] = None,
+        csv_path: Optional[str] = None,
+        source_sha: Optional[str] = None,
+    ) -> None:
+        """
+        Initializes an empty store.
+        """
+        pinned = csv_path is not None and source_sha is not None
+        self.cache = cache if pinned else None
+        self.csv_path = csv_path
+        self.source_sha = source_sha if pinned else None
+        self._entries: "OrderedDict[str, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get(self, key: str) -> Any:
+        """Returns an output, loading it from the on-disk cache on a memory miss."""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+        if self.cache is None:
+            return None
+        stored = self.cache.load_stage(self.csv_path, key, self.source_sha)
+        if stored is None:
+            return None
+        value = stored.array if stored.array is not None else stored.summary
+        self._remember(key, value)
+        return value
+
+    def _remember(self, key: str, value: Any) -> None:
+        """Keeps an output in memory, evicting the least recently used ones."""
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > MAX_STAGE_ENTRIES:
+                self._entries.popitem(last=False)
+
+    def load_mask(self, key: str, rows: int) -> Optional[np.ndarray]:
+        """
+        Retrieves the mask computed by a stage.
+
+        :param key: The address of the stage.
+        :param rows: The number of rows of the dataset.
+        :return: A boolean array, True for the rows failing the check, or None if the
+                stage was not computed for this dataset.
+        :rtype: Optional[np.ndarray]
+        """
+        packed = self._get(key)
+        if not isinstance(packed, np.ndarray) or len(packed) != -(-rows // 8):
+            return None
+        return np.unpackbits(packed, count=rows).view(bool)
+
+    def store_mask(self, key: str, mask: np.ndarray) -> None:
+        """
+        Stores the mask computed by a stage.
+
+        :param key: The address of the stage.
+        :param mask: A boolean array, True for the rows failing the check.
+        :return: None
+        """
+        packed = np.packbits(mask)
+        self._remember(key, packed)
+        if self.cache is not None:
+            self.cache.store_stage(
+                self.csv_path, key, StageOutput(packed, None), self.source_sha
+            )
+
+    def load_statistics(
+        self, key: str
+    ) -> Optional[Tuple[OutlierStats, Optional[RunningStats]]]:
+        """
+        Retrieves the statistics computed by the statistics stage of an outlier check.
+
+        :param key: The address of the stage.
+        :return: The center and scale of the column and its running statistics, None in
+                the outlier modes without running statistics, or None if the stage was
+                not computed for this dataset.
+        :rtype: Optional[Tuple[OutlierStats, Optional[RunningStats]]]
+        """
+        summary = self._get(key)
+        if not isinstance(summary, dict):
+            return None
+        running = summary.get("running_stats")
+        return (
+            OutlierStats.from_dict(summary["outlier_stats"]),
+            None if running is None else RunningStats.from_dict(running),
+        )
+
+    def store_statistics(
+        self,
+        key: str,
+        outlier_stats: OutlierStats,
+        running_stats: Optional[RunningStats] = None,
+    ) -> None:
+        """
+        Stores the statistics computed by the statistics stage of an outlier check.
+
+        :param key: The address of the stage.
+        :param outlier_stats: The center and scale of the column.
+        :param running_stats: The running statistics of the column, if any.
+        :return: None
+        """
+        summary: Dict[str, Any] = {
+            "outlier_stats": outlier_stats.to_dict(),
+            "running_stats": (
+                None if running_stats is None else running_stats.to_dict()
+            ),
+        }
+        self._remember(key, summary)
+        if self.cache is not None:
+            self.cache.store_stage(
+                self.csv_path, key, StageOutput(None, summary), self.source_sha
+            )
+
+    def load_arrays(self, name: str) -> Optional[Dict[str, np.ndarray]]:
+        """
+        Retrieves a set of arrays computed from this version of the raw data.
+
+        :param name: Name of the set of arrays, e.g. 'vessel_index'.
+        :return: The arrays by name, memory-mapped from the on-disk cache, or None if
+                they are not stored there.
+        :rtype: Optional[Dict[str, np.ndarray]]
+        """
+        if self.cache is None:
+            return None
+        return self.cache.load_arrays(self.csv_path, name, self.source_sha)
+
+    def store_arrays(self, name: str, arrays: Dict[str, np.ndarray]) -> None:
+        """
+        Stores a set of arrays computed from this version of the raw data in the on-disk
+        cache, so that worker processes map them instead of computing them again.
+
+        :param name: Name of the set of arrays, e.g. 'vessel_index'.
+        :param arrays: The arrays by name.
+        :return: None
+        """
+        if self.cache is not None:
+            self.cache.store_arrays(self.csv_path, name, arrays, self.source_sha)
+
+
+class ValidationPipeline:
+    """
+    Applies the data cleansing rules to raw data, one stage of the validation DAG after
+    the other.
+
+    Every check is evaluated once over the column arrays of the data. The masks and
+    statistics already computed on this version of the raw data, with the same
+    parameters and dependencies, are taken from the stage store, and only the other
+    stages are computed.
+
+    :param rules: The data cleansing rules.
+    :type rules: ValidationRules
+    :param outlier_mode: How outliers are detected, one of
+        :data:`~app.outliers.OUTLIER_MODES`.
+    :type outlier_mode: str
+    :param workers: Maximum number of threads evaluating the rules over blocks of rows.
+    :type workers: int
+    :param stage_store: Outputs of the stages computed on this version of the raw data,
+        or None to start with an empty in-memory store.
+    :type stage_store: Optional[StageStore]
+    :raises ValueError: If the outlier mode is unknown.
+    """
+
+    def __init__(
+        self,
+        rules: ValidationRules,
+        outlier_mode: str,
+        workers: int = 1,
+        stage_store: Optional[StageStore] = None,
+    ) -> None:
+        """
+        Initializes the pipeline.
+        """
+        if outlier_mode not in OUTLIER_MODES:
+            raise ValueError(
+                f"Unknown outlier mode {outlier_mode}; expected one of {OUTLIER_MODES}."
+            )
+        self.rules = rules
+        self.outlier_mode = outlier_mode
+        self.workers = workers
+        self.stage_store = stage_store or StageStore()
+        # Time and row flow of the load stages and of every check
+        self.metrics = LoadMetrics()
+        # Number of validation stages computed rather than reused by the last validation
+        self.computed_stages = 0
+
+    def with_rules(self, rules: ValidationRules) -> "ValidationPipeline":
+        """
+        Returns a pipeline applying other rules to the same version of the raw data.
+
+        :param rules: The new rules.
+        :return: A pipeline sharing the stage store, with new load metrics.
+        :rtype: ValidationPipeline
+        """
+        return ValidationPipeline(
+            rules, self.outlier_mode, self.workers, self.stage_store
+        )
+
+    def without_stages(self) -> "ValidationPipeline":
+        """
+        Returns a pipeline for another version of the raw data, e.g. with rows appended.
+
+        :return: A pipeline with an empty in-memory stage store, sharing the load
+                metrics.
+        :rtype: ValidationPipeline
+        """
+        pipeline = copy.copy(self)
+        pipeline.stage_store = StageStore()
+        return pipeline
+
+    def pin(self, cache: DatasetCache, csv_path: str) -> None:
+        """
+        Shares the stage outputs through the cache entry of the loaded data.
+
+        The content hash of the entry is pinned once the data are loaded from or stored
+        in it, under the cache lock, so that outputs computed later on this version of
+        the data, e.g. with new rules on a long-lived snapshot, are never stored with or
+        taken from a newer version cached by another process.
+
+        :param cache: The on-disk cache holding the data.
+        :param csv_path: Path to the CSV file or dataset directory of the cache entry.
+        :return: None
+        """
+        meta = cache.lookup(csv_path)
+        if meta is not None:
+            self.stage_store = StageStore(cache, csv_path, meta["source"]["sha256"])
+
+    def load_result(self, rows: int) -> Optional[Tuple[np.ndarray, OutlierState]]:
+        """
+        Restores the result of the whole validation from the pinned cache entry.
+
+        The flags are memory-mapped from the cache, so that worker processes share them
+        instead of each holding a private copy.
+
+        :param rows: The number of rows of the data.
+        :return: The per-row validation flags and the statistics of the outlier checks,
+                or None if no result matching the data and configuration is stored.
+        :rtype: Optional[Tuple[np.ndarray, OutlierState]]
+        """
+        store = self.stage_store
+        if store.cache is None:
+            return None
+        with self.metrics.stage("load_cached_filters", rows) as stage:
+            result = store.cache.load_filter_result(store.csv_path, self.config())
+            if result is not None and len(result.flags) != rows:
+                logging.warning(
+                    "Cached validation flags do not match the dataset size."
+                )
+                result = None
+            stage["rows_out"] = (
+                None if result is None else int(np.count_nonzero(result.flags == 0))
+            )
+        if result is None:
+            return None
+        return result.flags, OutlierState(
+            result.outlier_stats, result.running_stats or {}
+        )
+
+    def store_result(self, flags: np.ndarray, outliers: OutlierState) -> None:
+        """
+        Stores the result of the whole validation in the pinned cache entry.
+
+        :param flags: The per-row validation flags.
+        :param outliers: The statistics of the outlier checks.
+        :return: None
+        """
+        store = self.stage_store
+        if store.cache is None:
+            return
+        with self.metrics.stage(
+            "store_cached_filters", int(np.count_nonzero(flags == 0))
+        ):
+            store.cache.store_filter_result(
+                store.csv_path,
+                self.config(),
+                FilterResult(flags, outliers.outlier_stats, outliers.running_stats),
+            )
+
+    def config(self) -> Dict[str, Any]:
+        """
+        Describes the data cleansing configuration used to version cached filter results.
+
+        :return: Dictionary of the filter version, validation rules and outlier mode.
+        :rtype: Dict[str, Any]
+        """
+        return {
+            "version": FILTER_VERSION,
+            "rules": self.rules.config(),
+            "outlier_mode": self.outlier_mode,
+        }
+
+    def plan(self) -> Dict[Tuple[int, str], StageNode]:
+        """
+        Builds the stages of the validation DAG for the rules and outlier mode.
+
+        :return: The stages by index of their check and kind.
+        :rtype: Dict[Tuple[int, str], StageNode]
+        """
+        return {
+            (node.index, node.kind): node
+            for node in plan_stages(self.rules, self.outlier_mode, FILTER_VERSION)
+        }
+
+    def row_local_flags(
+        self, chunk: pd.DataFrame, check_seconds: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        """
+        Evaluates the row-local checks of a chunk into validation flags.
+
+        :param chunk: The parsed CSV chunk.
+        :param check_seconds: If given, the seconds spent on each check are added to it.
+        :return: Per-row flags with the bit of every failing check set, except for the
+                outlier checks, which depend on other rows.
+        :rtype: np.ndarray
+        :raises ValueError: If a checked column is missing from the chunk.
+        """
+        flags = np.zeros(len(chunk), dtype=flag_dtype(self.rules.keys()))
+        seconds = self.rules.evaluate(chunk, flags, self.workers)
+        if check_seconds is not None:
+            check_seconds += seconds
+        return flags
+
+    def validate(self, raw_data: pd.DataFrame) -> Tuple[np.ndarray, OutlierState]:
+        """
+        Applies the rules to raw data in a single pass.
+
+        :param raw_data: The rows to validate.
+        :return: The per-row validation flags and the statistics of the outlier checks.
+        :rtype: Tuple[np.ndarray, OutlierState]
+        :raises ValueError: If a column checked by the rules is missing from the data or
+                there are more than 64 checks.
+        """
+        rules = self.rules.keys()
+        check_seconds = np.zeros(len(rules))
+        plan = self.plan()
+        rows = len(raw_data)
+        self.computed_stages = 0
+        flags = np.zeros(rows, dtype=flag_dtype(rules))
+        missing = []
+        for index, check in enumerate(self.rules.checks):
+            if check.predicate == "outlier":
+                continue
+            started_at = time.perf_counter()
+            mask = self.stage_store.load_mask(plan[index, "flags"].key, rows)
+            if mask is None:
+                missing.append(index)
+            else:
+                flags[mask] |= flags.dtype.type(1 << index)
+            check_seconds[index] += time.perf_counter() - started_at
+        check_seconds += self.rules.evaluate(
+            raw_data, flags, self.workers, checks=missing
+        )
+        self._store_masks(flags, missing)
+        outliers = self._apply_outliers(raw_data, flags, max(rows, 1), check_seconds)
+        self._record_check_stages(flags, check_seconds)
+        logging.info(
+            f"Computed {self.computed_stages} of {len(plan)} validation stages, "
+            "reused the others"
+        )
+        return flags, outliers
+
+    def finish(
+        self,
+        raw_data: pd.DataFrame,
+        flags: np.ndarray,
+        block_rows: int,
+        check_seconds: np.ndarray,
+    ) -> OutlierState:
+        """
+        Completes the flags of the row-local checks, as computed chunk by chunk with
+        :meth:`row_local_flags`, with the outlier checks.
+
+        :param raw_data: The validated rows.
+        :param flags: Their row-local validation flags, updated in place.
+        :param block_rows: Number of rows processed per block by the outlier checks.
+        :param check_seconds: The seconds spent on each row-local check, to which those
+            of the outlier checks are added before all of them are recorded.
+        :return: The statistics of the outlier checks.
+        :rtype: OutlierState
+        """
+        self._store_masks(
+            flags,
+            [
+                index
+                for index, check in enumerate(self.rules.checks)
+                if check.predicate != "outlier"
+            ],
+        )
+        outliers = self._apply_outliers(raw_data, flags, block_rows, check_seconds)
+        self._record_check_stages(flags, check_seconds)
+        return outliers
+
+    def flag_rows(
+        self, rows: pd.DataFrame, outlier_stats: Dict[str, OutlierStats]
+    ) -> np.ndarray:
+        """
+        Validates rows against outlier statistics computed on other rows.
+
+        :param rows: The rows to validate, e.g. rows appended to the dataset.
+        :param outlier_stats: The statistics of each outlier column; rows are not
+            checked for outliers in the columns without statistics.
+        :return: The per-row validation flags.
+        :rtype: np.ndarray
+        :raises ValueError: If a checked column is missing from the rows.
+        """
+        flags = self.row_local_flags(rows)
+        for index, check in self.rules.outlier_checks():
+            statistics = outlier_stats.get(check.column)
+            if statistics is not None:
+                mask = self._outlier_mask(rows, check, statistics, len(rows))
+                flags[mask] |= flags.dtype.type(1 << index)
+        return flags
+
+    def _apply_outliers(
+        self,
+        raw_data: pd.DataFrame,
+        flags: np.ndarray,
+        block_rows: int,
+        check_seconds: np.ndarray,
+    ) -> OutlierState:
+        """
+        Flags outliers, one outlier check after the other.
+
+        The statistics and the outlier mask of a check are two stages of the validation
+        DAG; those already computed with the same parameters and the same previous masks
+        are taken from :attr:`stage_store` instead.
+
+        :param raw_data: The validated rows.
+        :param flags: Per-row validation flags, updated in place.
+        :param block_rows: Number of rows processed per block.
+        :param check_seconds: The seconds spent on each check, to which the time of the
+            outlier checks is added.
+        :return: The statistics of the outlier checks.
+        :rtype: OutlierState
+        """
+        plan = self.plan()
+        outliers = OutlierState({}, {})
+        for index, check in self.rules.outlier_checks():
+            started_at = time.perf_counter()
+            statistics_key = plan[index, "statistics"].key
+            stored = self.stage_store.load_statistics(statistics_key)
+            if stored is None:
+                stored = self._outlier_statistics(
+                    raw_data,
+                    check.column,
+                    (flags & flags.dtype.type((1 << index) - 1)) == 0,
+                    block_rows,
+                )
+                self.stage_store.store_statistics(statistics_key, *stored)
+                self.computed_stages += 1
+            outliers.outlier_stats[check.column], running = stored
+            if running is not None:
+                outliers.running_stats[check.column] = running
+            flags_key = plan[index, "flags"].key
+            mask = self.stage_store.load_mask(flags_key, len(flags))
+            if mask is None:
+                mask = self._outlier_mask(raw_data, check, stored[0], block_rows)
+                self.stage_store.store_mask(flags_key, mask)
+                self.computed_stages += 1
+            flags[mask] |= flags.dtype.type(1 << index)
+            check_seconds[index] += time.perf_counter() - started_at
+        return outliers
+
+    def _outlier_statistics(
+        self,
+        raw_data: pd.DataFrame,
+        column: str,
+        selected: np.ndarray,
+        block_rows: int,
+    ) -> Tuple[OutlierStats, Optional[RunningStats]]:
+        """
+        Computes the statistics of the non-missing values of the selected rows.
+
+        Means and standard deviations are accumulated block by block into
+        :class:`~app.outliers.RunningStats` with Chan's parallel merge, fleet-wide or
+        for all vessels at once; medians and MADs are computed over the whole column
+        with the grouped kernels of :mod:`app.outliers`. The blocks are summarized
+        concurrently by up to :attr:`workers` threads and merged in row order, so the
+        statistics only depend on ``block_rows``, not on the number of threads.
+
+        :param raw_data: The validated rows.
+        :param column: The outlier column.
+        :param selected: True for the rows that passed all previous checks.
+        :param block_rows: Number of rows processed per block.
+        :return: The center and scale of the column and its running statistics, None in
+                the outlier modes without running statistics.
+        :rtype: Tuple[OutlierStats, Optional[RunningStats]]
+        """
+        values = numeric_values(raw_data[column].to_numpy())
+        vessel_codes = raw_data["vessel_code"].to_numpy()
+        selected = selected & ~np.isnan(values)
+        if self.outlier_mode == "per_vessel_mad":
+            return (
+                compute_outlier_stats(
+                    values[selected], vessel_codes[selected], self.outlier_mode
+                ),
+                None,
+            )
+
+        def summarize(block: slice) -> RunningStats:
+            return compute_running_stats(
+                values[block][selected[block]],
+                vessel_codes[block][selected[block]],
+                self.outlier_mode,
+            )
+
+        running = compute_running_stats([], [], self.outlier_mode)
+        for block_stats in map_blocks(
+            summarize,
+            [
+                slice(start, start + block_rows)
+                for start in range(0, len(values), block_rows)
+            ],
+            self.workers,
+        ):
+            running = running.merge(block_stats)
+        return running.to_outlier_stats(), running
+
+    def _outlier_mask(
+        self,
+        rows: pd.DataFrame,
+        check: Check,
+        statistics: OutlierStats,
+        block_rows: int,
+    ) -> np.ndarray:
+        """Finds the values of a check scoring above its threshold, block by block."""
+        values = numeric_values(rows[check.column].to_numpy())
+        vessel_codes = rows["vessel_code"].to_numpy()
+        mask = np.zeros(len(values), dtype=bool)
+
+        def flag_block(block: slice) -> None:
+            scores = statistics.scores(values[block], vessel_codes[block])
+            mask[block] = scores > check.params["threshold"]
+
+        map_blocks(
+            flag_block,
+            row_blocks(len(values), self.workers, block_rows),
+            self.workers,
+        )
+        return mask
+
+    def _store_masks(self, flags: np.ndarray, indices: List[int]) -> None:
+        """Stores the masks of checks, read from the validation flags, as stage outputs."""
+        plan = self.plan()
+        for index in indices:
+            bit = flags.dtype.type(1 << index)
+            self.stage_store.store_mask(plan[index, "flags"].key, (flags & bit) != 0)
+        self.computed_stages += len(indices)
+
+    def _record_check_stages(
+        self, flags: np.ndarray, check_seconds: np.ndarray
+    ) -> None:
+        """
+        Records one load stage per check with its time and row flow.
+
+        The rows a check receives are those that passed all previous checks, and the
+        rows it keeps are those it did not reject, as when applying the checks one after
+        the other. The row-local checks are evaluated together, so their memory is not
+        measured separately.
+
+        :param flags: The validation flags.
+        :param check_seconds: The seconds spent on each check.
+        :return: None
+        """
+        code = first_failures(flags)
+        rules = self.rules.keys()
+        rejected = np.bincount(code[code >= 0], minlength=len(rules))
+        rows = len(flags)
+        for (label, column), seconds, count in zip(rules, check_seconds, rejected):
+            self.metrics.record(
+                Stage(f"validate:{label}:{column}", seconds, rows, rows - int(count))
+            )
+            rows -= int(count)
@@ -0,0 +1,352 @@
+"""
+Module implementing the declarative data cleansing rules.
+
+The checks applied to every row are defined in a JSON file (by default
+``app/validation_rules.json``) as an ordered list of rules. Each rule has a label, which
+is the problem type reported by the API, a predicate with its parameters, and the
+columns it applies to::
+
+    {"label": "above_max_speed", "predicate": "above", "value": 40,
+     "columns": ["actual_speed_overground"]}
+
+Every rule yields one check per column, and checks are applied in file order: a row
+failing several checks is attributed to the first of them. The supported predicates are:
+
+* ``below``: the value is below ``value``.
+* ``above``: the value is above ``value``.
+* ``outside``: the value is below ``min`` or above ``max``.
+* ``missing``: the value is missing.
+* ``outlier``: the score of the value against the statistics of its column, computed
+  over the rows that passed all previous checks, is above ``threshold`` (see
+  :mod:`app.outliers`). A column can be checked for outliers by one rule only.
+
+Rules are validated and compiled once into vectorized evaluators over NumPy arrays.
+:class:`~app.models.MaritimeData` evaluates all of them in one pass over the column
+arrays, setting one bit per check in the per-row validation flags, so that adding a rule
+requires neither code changes nor extra copies of the frame.
+
+The checks only depend on the values of their own row, so the rows can be split into
+contiguous blocks evaluated concurrently by a thread pool: NumPy releases the GIL in
+comparisons and reductions, and every block sets the flags of its own rows only, so the
+flags do not depend on the number of threads or the order in which blocks complete.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import json
+import math
+import os
+import time
+from typing import (
+    Any,
+    Callable,
+    Collection,
+    Dict,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+    TypeVar,
+)
+
+import numpy as np
+import pandas as pd
+
+from .ingest import CSV_SCHEMA
+
+DEFAULT_RULES_PATH = os.path.join(os.path.dirname(__file__), "validation_rules.json")
+# Parameters required by each predicate
+PREDICATES = {
+    "below": ("value",),
+    "above": ("value",),
+    "outside": ("min", "max"),
+    "missing": (),
+    "outlier": ("threshold",),
+}
+# Minimum number of rows per block evaluated by a thread, below which the overhead of
+# dispatching the block outweighs the gain
+MIN_BLOCK_ROWS = 1 << 16
+
+T = TypeVar("T")
+
+
+class Check(NamedTuple):
+    """
+    One check of a rule, applied to one column.
+
+    :ivar label: The problem type of the rule, e.g. 'below_zero'.
+    :ivar column: The checked column.
+    :ivar predicate: The predicate of the rule, one of :data:`PREDICATES`.
+    :ivar params: The parameters of the predicate.
+    """
+
+    label: str
+    column: str
+    predicate: str
+    params: Dict[str, float]
+
+
+def numeric_values(values: np.ndarray) -> np.ndarray:
+    """
+    Converts column values to floats for the comparison predicates.
+
+    Values that are not numbers, as found in columns loaded through the schema
+    fallback, become NaN, which no comparison flags.
+
+    :param values: The column values.
+    :return: The values as a float or integer array.
+    :rtype: np.ndarray
+    """
+    if values.dtype.kind in "biuf":
+        return values
+    return pd.to_numeric(pd.Series(values), errors="coerce").to_numpy(
+        dtype=np.float64, na_value=np.nan
+    )
+
+
+def row_blocks(
+    rows: int, workers: int, block_rows: Optional[int] = None
+) -> List[slice]:
+    """
+    Splits rows into contiguous blocks to be processed by a pool of threads.
+
+    :param rows: The number of rows.
+    :param workers: The number of threads, one block being made per thread unless the
+        blocks would be smaller than :data:`MIN_BLOCK_ROWS`.
+    :param block_rows: Maximum number of rows per block, or None for no maximum.
+    :return: The slices of the blocks, in row order.
+    :rtype: List[slice]
+    """
+    size = max(-(-rows // max(workers, 1)), MIN_BLOCK_ROWS)
+    if block_rows:
+        size = min(size, block_rows)
+    return [slice(start, min(start + size, rows)) for start in range(0, rows, size)]
+
+
+def map_blocks(
+    function: Callable[[slice], T], blocks: List[slice], workers: int
+) -> List[T]:
+    """
+    Applies a function to blocks of rows, concurrently if several threads are allowed.
+
+    :param function: The function applied to the slice of every block.
+    :param blocks: The blocks, as returned by :func:`row_blocks`.
+    :param workers: Maximum number of threads.
+    :return: The results, in the order of the blocks.
+    :rtype: List[T]
+    """
+    if workers <= 1 or len(blocks) <= 1:
+        return [function(block) for block in blocks]
+    with ThreadPoolExecutor(
+        max_workers=min(workers, len(blocks)), thread_name_prefix="validation"
+    ) as executor:
+        return list(executor.map(function, blocks))
+
+
+def compile_check(check: Check) -> Optional[Callable[[np.ndarray], np.ndarray]]:
+    """
+    Compiles a row-local check into a vectorized evaluator.
+
+    :param check: The check to compile.
+    :return: A function mapping the column values to a boolean array, True where the
+            check fails, or None for outlier checks, which depend on other rows.
+    :rtype: Optional[Callable[[np.ndarray], np.ndarray]]
+    """
+    params = check.params
+    if check.predicate == "missing":
+        return pd.isna
+    if check.predicate == "below":
+        value = params["value"]
+        return lambda values: numeric_values(values) < value
+    if check.predicate == "above":
+        value = params["value"]
+        return lambda values: numeric_values(values) > value
+    if check.predicate == "outside":
+        low, high = params["min"], params["max"]
+
+        def outside(values: np.ndarray) -> np.ndarray:
+            values = numeric_values(values)
+            return (values < low) | (values > high)
+
+        return outside
+    return None
+
+
+class ValidationRules:
+    """
+    The ordered data cleansing rules, compiled into vectorized evaluators.
+
+    :param rules: The rules, each a dictionary with a ``label``, a ``predicate``, the
+        parameters of the predicate and the ``columns`` it applies to.
+    :type rules: List[Dict[str, Any]]
+    :raises ValueError: If a rule is malformed.
+    """
+
+    def __init__(self, rules: List[Dict[str, Any]]) -> None:
+        """
+        Validates the rules and compiles their checks.
+        """
+        self.rules = [self._validate(rule) for rule in rules]
+        self.checks = [
+            Check(
+                rule["label"],
+                column,
+                rule["predicate"],
+                {name: float(rule[name]) for name in PREDICATES[rule["predicate"]]},
+            )
+            for rule in self.rules
+            for column in rule["columns"]
+        ]
+        keys = self.keys()
+        if len(set(keys)) != len(keys):
+            raise ValueError("Validation rules must not repeat a check on a column.")
+        outlier_columns = [c.column for c in self.checks if c.predicate == "outlier"]
+        if len(set(outlier_columns)) != len(outlier_columns):
+            raise ValueError("A column can be checked for outliers by one rule only.")
+        self._evaluators = [compile_check(check) for check in self.checks]
+
+    @staticmethod
+    def _validate(rule: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Checks that a rule has a label, a known predicate, finite numeric parameters and
+        a list of columns of the vessel data CSV.
+
+        :param rule: The rule as read from the configuration.
+        :return: The rule.
+        :rtype: Dict[str, Any]
+        :raises ValueError: If the rule is malformed.
+        """
+        if not isinstance(rule, dict) or not isinstance(rule.get("label"), str):
+            raise ValueError(f"Validation rule without a label: {rule}")
+        predicate = rule.get("predicate")
+        if predicate not in PREDICATES:
+            raise ValueError(
+                f"Unknown predicate {predicate} in validation rule {rule['label']}; "
+                f"expected one of {list(PREDICATES)}."
+            )
+        columns = rule.get("columns")
+        if not isinstance(columns, list) or not columns:
+            raise ValueError(
+                f"Validation rule {rule['label']} requires a list of columns."
+            )
+        unknown = [column for column in columns if column not in CSV_SCHEMA]
+        if unknown:
+            raise ValueError(
+                f"Unknown columns {unknown} in validation rule {rule['label']}; "
+                f"expected columns of {list(CSV_SCHEMA)}."
+            )
+        for name in PREDICATES[predicate]:
+            value = rule.get(name)
+            if (
+                isinstance(value, bool)
+                or not isinstance(value, (int, float))
+                or not math.isfinite(value)
+            ):
+                raise ValueError(
+                    f"Validation rule {rule['label']} requires a finite numeric {name}."
+                )
+        return rule
+
+    @classmethod
+    def load(cls, path: str = DEFAULT_RULES_PATH) -> "ValidationRules":
+        """
+        Reads and compiles the rules of a JSON configuration file.
+
+        :param path: Path to a JSON file holding an object with a ``rules`` list.
+        :return: The compiled rules.
+        :rtype: ValidationRules
+        :raises OSError: If the file cannot be read.
+        :raises ValueError: If the file is not valid JSON or a rule is malformed.
+        """
+        with open(path, encoding="utf-8") as file:
+            config = json.load(file)
+        if not isinstance(config, dict) or not isinstance(config.get("rules"), list):
+            raise ValueError(f"{path} must hold an object with a list of rules.")
+        return cls(config["rules"])
+
+    def keys(self) -> List[Tuple[str, str]]:
+        """
+        Lists the (problem type, column) of every check, in the order they are applied.
+
+        :return: List of (problem type, column) tuples.
+        :rtype: List[Tuple[str, str]]
+        """
+        return [(check.label, check.column) for check in self.checks]
+
+    @property
+    def columns(self) -> List[str]:
+        """The columns checked by the rules, in order of their first check."""
+        return list(dict.fromkeys(check.column for check in self.checks))
+
+    def outlier_checks(self) -> List[Tuple[int, Check]]:
+        """
+        Lists the outlier checks with their index in :meth:`keys`.
+
+        :return: List of (index, check) tuples, in the order they are applied.
+        :rtype: List[Tuple[int, Check]]
+        """
+        return [
+            (index, check)
+            for index, check in enumerate(self.checks)
+            if check.predicate == "outlier"
+        ]
+
+    def evaluate(
+        self,
+        frame: pd.DataFrame,
+        flags: np.ndarray,
+        workers: int = 1,
+        checks: Optional[Collection[int]] = None,
+    ) -> np.ndarray:
+        """
+        Evaluates the row-local checks over the column arrays of a frame.
+
+        :param frame: The rows to check, holding every checked column.
+        :param flags: Per-row validation flags, where the bit of every failing check is
+            set in place.
+        :param workers: Maximum number of threads evaluating blocks of rows.
+        :param checks: Indices of the checks to evaluate, or None for all of them.
+        :return: The seconds spent evaluating each check, summed over the threads; 0
+                for the outlier checks.
+        :rtype: np.ndarray
+        :raises ValueError: If a checked column is missing from the frame.
+        """
+        missing = [column for column in self.columns if column not in frame.columns]
+        if missing:
+            raise ValueError(
+                f"Columns checked by the validation rules are missing: {missing}"
+            )
+        columns = {column: frame[column].to_numpy() for column in self.columns}
+        selected = [
+            (index, flags.dtype.type(1 << index), check.column, evaluate)
+            for index, (check, evaluate) in enumerate(
+                zip(self.checks, self._evaluators)
+            )
+            if evaluate is not None and (checks is None or index in checks)
+        ]
+        if not selected:
+            return np.zeros(len(self.checks))
+
+        def evaluate_block(block: slice) -> np.ndarray:
+            seconds = np.zeros(len(self.checks))
+            block_flags = flags[block]
+            for index, bit, column, evaluate in selected:
+                started_at = time.perf_counter()
+                with np.errstate(invalid="ignore"):
+                    failed = evaluate(columns[column][block])
+                block_flags[failed] |= bit
+                seconds[index] = time.perf_counter() - started_at
+            return seconds
+
+        return sum(
+            map_blocks(evaluate_block, row_blocks(len(flags), workers), workers),
+            np.zeros(len(self.checks)),
+        )
+
+    def config(self) -> List[Dict[str, Any]]:
+        """
+        Describes the rules to version cached filter results.
+
+        :return: The validated rules.
+        :rtype: List[Dict[str, Any]]
+        """
+        return self.rules
@@ -0,0 +1,206 @@
+"""
+Module implementing the per-vessel index of a maritime dataset.
+
+The rows of a dataset are kept in the order they were read, which interleaves vessels,
+so that the columns can be shared as they are memory-mapped from the cache and appended
+to. Queries about one vessel would then have to scan the whole fleet. The index sorts the
+row positions by vessel code and timestamp once, so that the rows of every vessel form a
+contiguous block of one permutation, located by its offsets. A vessel query only touches
+the rows of that vessel, whatever the size of the fleet, and gets them in chronological
+order.
+
+The timestamps are kept in the same order as 64-bit integers, so that the rows of a
+vessel within a period are located by two binary searches in its block: a period query
+costs O(log n + k) for k rows returned instead of comparing every timestamp.
+
+Rows appended to the dataset are sorted on their own and merged into the blocks of their
+vessels, so ingesting them never sorts the whole fleet again.
+"""
+
+from typing import Optional, Tuple
+
+import numpy as np
+
+
+class VesselIndex:
+    """
+    Positions of the rows of every vessel, in chronological order.
+
+    The arrays of the index are named by :data:`ARRAYS`, so that it can be stored in and
+    mapped from the dataset cache (see :meth:`~app.cache.DatasetCache.store_arrays`).
+
+    :param order: Row positions sorted by vessel code, then timestamp; rows without a
+        vessel code are left out.
+    :type order: np.ndarray
+    :param vessel_codes: The distinct vessel codes, in ascending order.
+    :type vessel_codes: np.ndarray
+    :param offsets: Offsets of the block of every vessel in ``order``, followed by the
+        length of ``order``.
+    :type offsets: np.ndarray
+    :param timestamps: The timestamps of the rows of ``order`` in nanoseconds since the
+        epoch, NaT being the smallest integer.
+    :type timestamps: np.ndarray
+    """
+
+    ARRAYS = ("order", "vessel_codes", "offsets", "timestamps")
+
+    def __init__(
+        self,
+        order: np.ndarray,
+        vessel_codes: np.ndarray,
+        offsets: np.ndarray,
+        timestamps: np.ndarray,
+    ) -> None:
+        """
+        Initializes the index from its arrays, see :meth:`build`.
+        """
+        self.order = order
+        self.vessel_codes = vessel_codes
+        self.offsets = offsets
+        self.timestamps = timestamps
+
+    @classmethod
+    def build(
+        cls, vessel_codes: np.ndarray, timestamps: np.ndarray
+    ) -> Optional["VesselIndex"]:
+        """
+        Sorts the rows of a dataset by vessel code and timestamp.
+
+        The sort is stable, so rows of a vessel with the same timestamp keep the order
+        they were read in, and rows without a timestamp come first in their block.
+
+        :param vessel_codes: The vessel code of every row.
+        :param timestamps: The timestamp of every row.
+        :return: The index, or None if the columns cannot be sorted, as for columns
+                loaded through the schema fallback that are not numeric.
+        :rtype: Optional[VesselIndex]
+        """
+        if vessel_codes.dtype.kind not in "iuf" or timestamps.dtype.kind != "M":
+            return None
+        # Sort on the integers searched by period(): NumPy sorts NaT last among
+        # datetimes, but it is the smallest integer
+        nanoseconds = timestamps.astype("datetime64[ns]").view(np.int64)
+        order = np.lexsort((nanoseconds, vessel_codes))
+        sorted_codes = vessel_codes[order]
+        if sorted_codes.dtype.kind == "f":
+            # Missing vessel codes are sorted last and cannot be queried
+            known = np.count_nonzero(~np.isnan(sorted_codes))
+            order, sorted_codes = order[:known], sorted_codes[:known]
+        if len(order) < 1 << 31:
+            order = order.astype(np.int32)
+        first = np.ones(len(sorted_codes), dtype=bool)
+        first[1:] = sorted_codes[1:] != sorted_codes[:-1]
+        starts = np.flatnonzero(first)
+        return cls(
+            order,
+            sorted_codes[starts],
+            np.append(starts, len(order)).astype(np.int64),
+            nanoseconds[order],
+        )
+
+    def append(
+        self, vessel_codes: np.ndarray, timestamps: np.ndarray, first_position: int
+    ) -> Optional["VesselIndex"]:
+        """
+        Merges rows appended to the dataset into the blocks of their vessels.
+
+        Only the appended rows are sorted; their positions are then inserted into the
+        blocks by binary search, after the rows of the same vessel and timestamp, so the
+        result is that of :meth:`build` over all rows at the cost of one copy of the
+        arrays instead of a sort of the whole fleet.
+
+        :param vessel_codes: The vessel code of every appended row.
+        :param timestamps: The timestamp of every appended row.
+        :param first_position: Row position of the first appended row in the dataset.
+        :return: A new index covering the rows of this one and the appended rows, this
+                one being left untouched, or None if the appended columns cannot be
+                sorted.
+        :rtype: Optional[VesselIndex]
+        """
+        appended = VesselIndex.build(vessel_codes, timestamps)
+        if appended is None:
+            return None
+        if not len(appended.order):
+            return self
+        # Sorted vessel code of every appended row, and offset at which it is inserted
+        # into the arrays of this index
+        codes = np.repeat(appended.vessel_codes, np.diff(appended.offsets))
+        inserted_at = np.empty(len(codes), dtype=np.int64)
+        blocks = np.searchsorted(self.vessel_codes, appended.vessel_codes)
+        for index, block in enumerate(blocks):
+            block_rows = slice(appended.offsets[index], appended.offsets[index + 1])
+            start = self.offsets[block]
+            if (
+                block < len(self.vessel_codes)
+                and self.vessel_codes[block] == appended.vessel_codes[index]
+            ):
+                inserted_at[block_rows] = start + np.searchsorted(
+                    self.timestamps[start : self.offsets[block + 1]],
+                    appended.timestamps[block_rows],
+                    side="right",
+                )
+            else:
+                inserted_at[block_rows] = start
+
+        order = self.order
+        rows = len(order) + len(appended.order)
+        if order.dtype == np.int32 and rows >= 1 << 31:
+            order = order.astype(np.int64)
+        all_codes = np.union1d(self.vessel_codes, appended.vessel_codes)
+        # Rows of lower vessel codes, in this index and among the appended rows
+        starts = self.offsets[np.searchsorted(self.vessel_codes, all_codes)]
+        starts = starts + np.searchsorted(codes, all_codes)
+        return VesselIndex(
+            np.insert(
+                order, inserted_at, appended.order.astype(order.dtype) + first_position
+            ),
+            all_codes,
+            np.append(starts, rows).astype(np.int64),
+            np.insert(self.timestamps, inserted_at, appended.timestamps),
+        )
+
+    def bounds(self, vessel_code: int) -> Tuple[int, int]:
+        """
+        Locates the block of a vessel in :attr:`order` by binary search.
+
+        :param vessel_code: Unique identifier for the vessel.
+        :return: The start and stop offsets of the block, equal if the vessel has no
+                rows.
+        :rtype: Tuple[int, int]
+        """
+        index = int(np.searchsorted(self.vessel_codes, vessel_code))
+        if index == len(self.vessel_codes) or self.vessel_codes[index] != vessel_code:
+            return 0, 0
+        return int(self.offsets[index]), int(self.offsets[index + 1])
+
+    def positions(self, vessel_code: int) -> np.ndarray:
+        """
+        Returns the row positions of a vessel.
+
+        :param vessel_code: Unique identifier for the vessel.
+        :return: A view of the positions of the rows of the vessel, in chronological
+                order.
+        :rtype: np.ndarray
+        """
+        start, stop = self.bounds(vessel_code)
+        return self.order[start:stop]
+
+    def period(
+        self, vessel_code: int, start: np.datetime64, end: np.datetime64
+    ) -> np.ndarray:
+        """
+        Returns the row positions of a vessel within a period by binary search.
+
+        :param vessel_code: Unique identifier for the vessel.
+        :param start: Start of the period (inclusive).
+        :param end: End of the period (inclusive).
+        :return: A view of the positions of the rows of the vessel within the period, in
+                chronological order.
+        :rtype: np.ndarray
+        """
+        first, stop = self.bounds(vessel_code)
+        block = self.timestamps[first:stop]
+        bounds = np.array([start, end], dtype="datetime64[ns]").view(np.int64)
+        low = int(np.searchsorted(block, bounds[0], side="left"))
+        high = int(np.searchsorted(block, bounds[1], side="right"))
+        return self.order[first + low : first + max(low, high)]
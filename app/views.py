@@ -3,22 +3,359 @@ Module containing Flask route definitions for the web application.
 
 This module defines the API endpoints of the web application, handling
 the requests to various functionalities such as retrieving invalid data for vessels,
-comparing vessel compliance scores, and fetching vessel speed differences. Each route
-is associated with a specific function that processes the request and returns a response
-to the client.
+comparing vessel compliance scores, ranking the fleet by compliance, and fetching vessel
+speed differences. Each route is associated with a specific function that processes the
+request and returns a response to the client.
 """
 
-from datetime import datetime
+import hmac
 import json
 import logging
+from typing import Optional
 
-from flask import jsonify, Response, request
+from flask import g, jsonify, Response, request
 from flasgger import swag_from
 
 from .data_analysis import DataAnalyzer
+from .rules import ValidationRules
 from . import app
 
-maritime_data = app.config["maritime_data"]
+dataset_loader = app.config["dataset_loader"]
+
+
+def _not_ready_response() -> Response:
+    """
+    Builds the 503 response returned while the dataset is not available.
+
+    :return: A JSON response with the load status and a Retry-After header.
+    :rtype: Response
+    """
+    if dataset_loader.state == dataset_loader.FAILED:
+        message = "The dataset failed to load."
+    else:
+        message = "The dataset is not loaded yet."
+    response = jsonify({"message": message, **dataset_loader.status()})
+    response.status_code = 503
+    response.headers["Retry-After"] = str(app.config["RETRY_AFTER_SECONDS"])
+    return response
+
+
+def _admin_denied_response() -> Optional[Response]:
+    """
+    Checks that a request may call an admin endpoint.
+
+    Admin endpoints are disabled unless the ``ADMIN_TOKEN`` setting is set, and then
+    require it as a bearer token in the ``Authorization`` header.
+
+    :return: A JSON response with status code 403 if the endpoints are disabled or 401
+            if the token is missing or wrong, None if the request is allowed.
+    :rtype: Optional[Response]
+    """
+    token = app.config["ADMIN_TOKEN"]
+    if not token:
+        response = jsonify(
+            {"message": "Admin endpoints are disabled; set ADMIN_TOKEN to enable them."}
+        )
+        response.status_code = 403
+        return response
+    supplied = request.headers.get("Authorization", "")
+    if not hmac.compare_digest(supplied.encode("utf-8"), f"Bearer {token}".encode()):
+        logging.warning(f"Rejected unauthenticated admin request to {request.path}")
+        response = jsonify({"message": "A valid admin token is required."})
+        response.status_code = 401
+        response.headers["WWW-Authenticate"] = "Bearer"
+        return response
+    return None
+
+
+@app.before_request
+def require_admin_token():
+    """
+    Rejects requests to the admin endpoints that do not present the admin token, since
+    they report raw records and change the served dataset.
+    """
+    if not request.path.startswith("/admin/"):
+        return None
+    return _admin_denied_response()
+
+
+@app.before_request
+def require_dataset():
+    """
+    Makes the loaded dataset available to the data endpoints through ``g.maritime_data``.
+
+    The snapshot is captured once per request, so a request is answered from a single
+    dataset version even if a reload is published while it is being processed. Data
+    endpoints answer 503 with a Retry-After header until the dataset is loaded.
+    """
+    if not request.path.startswith("/api/"):
+        return None
+    if not dataset_loader.is_ready:
+        return _not_ready_response()
+    g.maritime_data = dataset_loader.data
+    return None
+
+
+@app.after_request
+def add_dataset_version(response: Response) -> Response:
+    """
+    Reports the version of the dataset a data endpoint answered from in the
+    ``X-Dataset-Version`` response header.
+    """
+    maritime_data = g.get("maritime_data")
+    if maritime_data is not None:
+        response.headers["X-Dataset-Version"] = maritime_data.version
+    return response
+
+
+@app.route("/healthz", methods=["GET"])
+@swag_from("docs/healthz.yml")
+def healthz() -> Response:
+    """
+    Liveness check, answering as long as the process is able to serve requests.
+
+    :return: A JSON response with the status "ok".
+    :rtype: Response
+    """
+    return jsonify({"status": "ok"})
+
+
+@app.route("/readyz", methods=["GET"])
+@swag_from("docs/readyz.yml")
+def readyz() -> Response:
+    """
+    Readiness check, answering 200 once the dataset is loaded and 503 before that.
+
+    :return: A JSON response with the load status, progress and timings.
+    :rtype: Response
+
+    Example response::
+
+            {
+                "status": "ready",
+                "stage": "ready",
+                "rows": 394632,
+                "started_at": "2024-03-23T19:09:41.123456+00:00",
+                "finished_at": "2024-03-23T19:09:42.456789+00:00",
+                "elapsed_seconds": 1.333,
+                "error": null,
+                "version": "3f2a9c41d0b7",
+                "reloading": false,
+                "reloaded_at": null
+            }
+    """
+    if not dataset_loader.is_ready:
+        return _not_ready_response()
+    return jsonify(dataset_loader.status())
+
+
+@app.route("/admin/reload", methods=["POST"])
+@swag_from("docs/admin_reload.yml")
+def admin_reload() -> Response:
+    """
+    Starts rebuilding the dataset from the CSV in the background.
+
+    The current dataset keeps serving requests until the new version is published;
+    progress can be followed through the ``version`` and ``reloading`` fields of
+    ``/readyz``.
+
+    :return: A JSON response with the load status, with status code 202 if the reload
+            was started or 409 if a reload is already in progress.
+    :rtype: Response
+    """
+    started = dataset_loader.reload()
+    response = jsonify(dataset_loader.status())
+    response.status_code = 202 if started else 409
+    return response
+
+
+@app.route("/admin/load_metrics", methods=["GET"])
+@swag_from("docs/admin_load_metrics.yml")
+def admin_load_metrics() -> Response:
+    """
+    Reports the wall time, row flow and peak memory increase of every stage of the
+    load of the served dataset, to trace slower starts or rejected rows to a stage.
+
+    :return: A JSON response with the dataset version, the total wall time and the
+            stages in the order they completed.
+    :rtype: Response
+
+    Example response::
+
+            {
+                "version": "3f2a9c41d0b7",
+                "total_seconds": 0.993054,
+                "stages": [
+                    {
+                        "name": "read_csv",
+                        "seconds": 0.767161,
+                        "rows_in": null,
+                        "rows_out": 394632,
+                        "peak_memory_delta_mb": 180.754
+                    },
+                    ...
+                ]
+            }
+    """
+    if not dataset_loader.is_ready:
+        return _not_ready_response()
+    maritime_data = dataset_loader.data
+    return jsonify(
+        {"version": maritime_data.version, **maritime_data.validation.metrics.to_dict()}
+    )
+
+
+@app.route("/admin/outlier_reclassification", methods=["GET"])
+@swag_from("docs/admin_outlier_reclassification_preview.yml")
+def preview_outlier_reclassification() -> Response:
+    """
+    Lists the accepted records that the running outlier statistics, updated with the
+    rows appended since the dataset was loaded, would reject.
+
+    :return: A JSON response with the number of records per outlier column and up to
+            ``limit`` records (default 100), or 400 if the outlier mode does not support
+            reclassification.
+    :rtype: Response
+
+    Example response::
+
+            {
+                "version": "3f2a9c41d0b7",
+                "rows": 2,
+                "by_column": {"power": 2},
+                "records": [...]
+            }
+    """
+    if not dataset_loader.is_ready:
+        return _not_ready_response()
+    maritime_data = dataset_loader.data
+    try:
+        limit = request.args.get("limit", 100, type=int)
+        rows = maritime_data.preview_outlier_reclassification()
+    except ValueError as e:
+        logging.warning(f"Invalid outlier reclassification request: {e}")
+        return jsonify({"message": str(e)}), 400
+    return jsonify(
+        {
+            "version": maritime_data.version,
+            "rows": len(rows),
+            "by_column": {
+                column: int(count)
+                for column, count in rows["outlier_column"].value_counts().items()
+            },
+            "records": json.loads(rows[:limit].to_json(orient="records")),
+        }
+    )
+
+
+@app.route("/admin/outlier_reclassification", methods=["POST"])
+@swag_from("docs/admin_outlier_reclassification.yml")
+def apply_outlier_reclassification() -> Response:
+    """
+    Rejects in bulk the accepted records that the running outlier statistics flag, and
+    publishes the result as a new dataset version.
+
+    :return: A JSON response with the number of records rejected and the new version,
+            or 400 if the outlier mode does not support reclassification.
+    :rtype: Response
+
+    Example response::
+
+            {
+                "reclassified_rows": 2,
+                "version": "81c0e5d2a9f4"
+            }
+    """
+    if not dataset_loader.is_ready:
+        return _not_ready_response()
+    try:
+        rows = dataset_loader.reclassify_outliers()
+    except ValueError as e:
+        logging.warning(f"Invalid outlier reclassification request: {e}")
+        return jsonify({"message": str(e)}), 400
+    return jsonify({"reclassified_rows": rows, "version": dataset_loader.data.version})
+
+
+@app.route("/admin/validation_rules", methods=["GET"])
+@swag_from("docs/admin_validation_rules.yml")
+def get_validation_rules() -> Response:
+    """
+    Reports the data cleansing rules the served dataset was validated with.
+
+    :return: A JSON response with the dataset version, the outlier mode and the rules.
+    :rtype: Response
+
+    Example response::
+
+            {
+                "version": "3f2a9c41d0b7",
+                "outlier_mode": "global",
+                "rules": [
+                    {
+                        "label": "below_zero",
+                        "predicate": "below",
+                        "value": 0,
+                        "columns": ["power", ...]
+                    },
+                    ...
+                ]
+            }
+    """
+    if not dataset_loader.is_ready:
+        return _not_ready_response()
+    maritime_data = dataset_loader.data
+    return jsonify(
+        {
+            "version": maritime_data.version,
+            "outlier_mode": maritime_data.validation.outlier_mode,
+            "rules": maritime_data.validation.rules.config(),
+        }
+    )
+
+
+@app.route("/admin/validation_rules", methods=["POST"])
+@swag_from("docs/admin_validation_rules_apply.yml")
+def apply_validation_rules() -> Response:
+    """
+    Validates the served dataset again with the data cleansing rules of the request
+    body, and publishes the result as a new dataset version.
+
+    Only the validation stages affected by the change are computed, so that cleaning
+    policies can be tried without a restart. Reloads apply the configured rules again.
+
+    :return: A JSON response with the number of validation stages computed, the number
+            of valid records and the new version, or 400 if the rules are malformed or
+            do not apply to the dataset.
+    :rtype: Response
+
+    Example response::
+
+            {
+                "computed_stages": 9,
+                "valid_rows": 313735,
+                "version": "81c0e5d2a9f4"
+            }
+    """
+    if not dataset_loader.is_ready:
+        return _not_ready_response()
+    body = request.get_json(silent=True)
+    try:
+        if not isinstance(body, dict) or not isinstance(body.get("rules"), list):
+            raise ValueError(
+                "The request body must hold an object with a list of rules."
+            )
+        computed = dataset_loader.revalidate(ValidationRules(body["rules"]))
+    except ValueError as e:
+        logging.warning(f"Invalid validation rules request: {e}")
+        return jsonify({"message": str(e)}), 400
+    maritime_data = dataset_loader.data
+    return jsonify(
+        {
+            "computed_stages": computed,
+            "valid_rows": maritime_data.valid_rows,
+            "version": maritime_data.version,
+        }
+    )
 
 
 @app.route("/api/vessel_invalid_data/<vessel_code>", methods=["GET"])
@@ -51,7 +388,7 @@ def get_vessel_invalid_data(vessel_code: str) -> Response:
             logging.warning("Vessel code cannot be empty.")
             return jsonify({"message": "Vessel code cannot be empty."}), 400
         vessel_code_int = int(vessel_code)
-        invalid_data = maritime_data.get_invalid_data_for_vessel(vessel_code_int)
+        invalid_data = g.maritime_data.get_invalid_data_for_vessel(vessel_code_int)
         if not invalid_data:
             return (
                 jsonify(
@@ -86,6 +423,65 @@ def get_vessel_invalid_data(vessel_code: str) -> Response:
         return jsonify({"message": "An error occurred processing your request."}), 500
 
 
+@app.route(
+    "/api/vessel_invalid_rows/<vessel_code>/<problem_type>/<column>", methods=["GET"]
+)
+@swag_from("docs/vessel_invalid_rows.yml")
+def get_vessel_invalid_rows(
+    vessel_code: str, problem_type: str, column: str
+) -> Response:
+    """
+    Retrieves the raw records of a vessel that fail a specific data cleansing check.
+
+    :param vessel_code: The unique code identifying the vessel.
+    :param problem_type: The problem type of the check, e.g. 'below_zero'.
+    :param column: The column of the check, e.g. 'power'.
+    :return: A JSON response containing the failing raw records.
+    :rtype: Response
+
+    Example response::
+
+            [
+                {
+                    "vessel_code": 3001,
+                    "datetime": "2023-06-01 00:00:00",
+                    "latitude": 10.2894458771,
+                    "longitude": -14.7888755798,
+                    "power": -0.0122365965,
+                    "fuel_consumption": 0.0,
+                    "actual_speed_overground": 0.039996,
+                    "proposed_speed_overground": 0.1899042625,
+                    "predicted_fuel_consumption": 0.0
+                }
+                ...
+            ]
+    """
+    try:
+        vessel_code_int = int(vessel_code)
+        limit = request.args.get("limit", type=int)
+        first_only = request.args.get("first_only", "false").lower() == "true"
+        rows = g.maritime_data.get_invalid_rows_for_vessel(
+            vessel_code_int, problem_type, column, first_only, limit
+        )
+        if rows.empty:
+            return (
+                jsonify(
+                    {
+                        "message": "No records of this vessel fail this check.",
+                        "vessel_code": vessel_code_int,
+                    }
+                ),
+                404,
+            )
+        return Response(rows.to_json(orient="records"), mimetype="application/json")
+    except ValueError as e:
+        logging.warning(f"Invalid input received: {e}")
+        return jsonify({"message": str(e)}), 400
+    except Exception as e:
+        logging.error(f"Error retrieving invalid rows for vessel {vessel_code}: {e}")
+        return jsonify({"message": "An error occurred processing your request."}), 500
+
+
 @app.route("/api/vessel_speed_difference/<vessel_code>", methods=["GET"])
 @swag_from("docs/vessel_speed_difference.yml")
 def get_vessel_speed_difference(vessel_code: str) -> Response:
@@ -119,7 +515,7 @@ def get_vessel_speed_difference(vessel_code: str) -> Response:
             "limit", type=int
         )  # Get 'limit' parameter, defaults to None if not provided
         vessel_code_int = int(vessel_code)
-        speed_differences = maritime_data.get_speed_differences_for_vessel(
+        speed_differences = g.maritime_data.get_speed_differences_for_vessel(
             vessel_code_int, limit=limit
         )
         if not speed_differences:
@@ -183,7 +579,7 @@ def vessel_compliance_comparison(vessel_code1: str, vessel_code2: str) -> Respon
             logging.warning("Vessel code cannot be empty.")
             return jsonify({"message": "Vessel code cannot be empty."}), 400
         vessel_code1_int, vessel_code2_int = map(int, [vessel_code1, vessel_code2])
-        comparison_result = maritime_data.compare_vessel_compliance(
+        comparison_result = g.maritime_data.compare_vessel_compliance(
             vessel_code1_int, vessel_code2_int
         )
 
@@ -208,6 +604,71 @@ def vessel_compliance_comparison(vessel_code1: str, vessel_code2: str) -> Respon
         return jsonify({"message": "An error occurred processing your request."}), 500
 
 
+@app.route("/api/compliance/leaderboard", methods=["GET"])
+@swag_from("docs/compliance_leaderboard.yml")
+def compliance_leaderboard() -> Response:
+    """
+    Ranks every vessel of the fleet by compliance score, optionally over a period.
+
+    The optional ``start_date`` and ``end_date`` query parameters bound the period, and
+    the ``offset`` and ``limit`` query parameters select a page of the ranking.
+
+    :return: A JSON response with the total number of vessels ranked and the requested
+            page of the ranking, or 400 if a parameter is invalid.
+    :rtype: Response
+
+    Example response::
+
+            {
+                "start_date": null,
+                "end_date": null,
+                "total_vessels": 2,
+                "offset": 0,
+                "limit": 50,
+                "vessels": [
+                    {
+                        "rank": 1,
+                        "vessel_code": 19310,
+                        "compliance_score": 83.54,
+                        "percentile": 100.0,
+                        "scored_rows": 30644
+                    },
+                    ...
+                ]
+            }
+    """
+    start_date = request.args.get("start_date")
+    end_date = request.args.get("end_date")
+    try:
+        offset = int(request.args.get("offset", 0))
+        limit = int(request.args.get("limit", app.config["LEADERBOARD_PAGE_SIZE"]))
+        if offset < 0 or limit < 1:
+            raise ValueError("offset must not be negative and limit must be positive.")
+    except ValueError as e:
+        logging.warning(f"Invalid leaderboard page requested: {e}")
+        return jsonify({"message": "Invalid offset or limit."}), 400
+    try:
+        leaderboard = g.maritime_data.compliance_leaderboard(start_date, end_date)
+    except ValueError as e:
+        logging.warning(f"Invalid input received: {e}")
+        return jsonify({"message": str(e)}), 400
+    except Exception as e:
+        logging.error(f"Error ranking vessel compliance: {e}")
+        return jsonify({"message": "An error occurred processing your request."}), 500
+    return jsonify(
+        {
+            "start_date": start_date,
+            "end_date": end_date,
+            "total_vessels": len(leaderboard),
+            "offset": offset,
+            "limit": limit,
+            "vessels": leaderboard.iloc[offset : offset + limit].to_dict(
+                orient="records"
+            ),
+        }
+    )
+
+
 @app.route("/api/vessel_metrics/<vessel_code>/<start_date>/<end_date>", methods=["GET"])
 @swag_from("docs/vessel_metrics.yml")
 def get_vessel_metrics(vessel_code: str, start_date: str, end_date: str) -> Response:
@@ -215,8 +676,10 @@ def get_vessel_metrics(vessel_code: str, start_date: str, end_date: str) -> Resp
     Retrieves metrics for a specific vessel within a given time period.
 
     :param vessel_code: The unique code identifying the vessel.
-    :param start_date: The start date of the period (inclusive).
-    :param end_date: The end date of the period (inclusive).
+    :param start_date: The start of the period (inclusive), a YYYY-MM-DD date or an
+        ISO-8601 timestamp.
+    :param end_date: The end of the period (inclusive), a YYYY-MM-DD date or an
+        ISO-8601 timestamp.
     :return: A JSON response containing the metrics for the specified vessel and period.
     :rtype: Response
 
@@ -246,11 +709,7 @@ def get_vessel_metrics(vessel_code: str, start_date: str, end_date: str) -> Resp
         limit = request.args.get(
             "limit", type=int
         )  # Get 'limit' parameter, defaults to None if not provided
-        if not all(
-            map(lambda x: datetime.strptime(x, "%Y-%m-%d"), [start_date, end_date])
-        ):
-            raise ValueError("Invalid date format. Use YYYY-MM-DD.")
-        metrics_data = maritime_data.get_metrics_for_vessel_period(
+        metrics_data = g.maritime_data.get_metrics_for_vessel_period(
             vessel_code_int, start_date, end_date, limit
         )
         if metrics_data.empty:
@@ -286,8 +745,10 @@ def get_vessel_raw_metrics(
     Retrieves raw data metrics for a specific vessel over a specified period.
 
     :param vessel_code: The unique code identifying the vessel.
-    :param start_date: The start date of the period (inclusive).
-    :param end_date: The end date of the period (inclusive).
+    :param start_date: The start of the period (inclusive), a YYYY-MM-DD date or an
+        ISO-8601 timestamp.
+    :param end_date: The end of the period (inclusive), a YYYY-MM-DD date or an
+        ISO-8601 timestamp.
     :return: A JSON response containing the raw data for the vessel within the specified period.
     :rtype: Response
 
@@ -317,12 +778,7 @@ def get_vessel_raw_metrics(
         limit = request.args.get(
             "limit", type=int
         )  # Get 'limit' parameter, defaults to None if not provided
-        # Date validation as performed in get_vessel_metrics
-        if not all(
-            map(lambda x: datetime.strptime(x, "%Y-%m-%d"), [start_date, end_date])
-        ):
-            raise ValueError("Invalid date format. Use YYYY-MM-DD.")
-        raw_data = maritime_data.get_raw_metrics_for_vessel_period(
+        raw_data = g.maritime_data.get_raw_metrics_for_vessel_period(
             vessel_code_int, start_date, end_date, limit
         )
         if raw_data.empty:
@@ -366,10 +822,10 @@ def get_vessel_problems(vessel_code: str):
 
     try:
         vessel_code_int = int(vessel_code)
-        data_analyzer = DataAnalyzer()
-        data_analyzer.filter_by_vessel(
-            vessel_code_int
-        )  # Filter the data for the specified vessel
+        # Analyze the raw rows of the vessel from the loaded dataset
+        data_analyzer = DataAnalyzer(
+            g.maritime_data.get_vessel_records(vessel_code_int, valid_only=False)
+        )
 
         # Get a summary of problematic data based on the specified problem_type and column_name
         summary = data_analyzer.get_problematic_data_summary(column_name, problem_type)
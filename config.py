@@ -16,9 +16,42 @@ class Config:
     Includes paths and operational flags like debug mode.
 
     Attributes:
-        CSV_PATH (str): Path to the CSV file with vessel data.
+        CSV_PATH (str): Path to the CSV file with vessel data, or to a directory of
+            partition files (CSV, or Parquet with pyarrow installed), for example one
+            per vessel and month.
         DEBUG (bool): Enables debug mode based on the "DEBUG" environment variable.
+        CACHE_DIR (str): Directory of the on-disk columnar dataset cache. Set the
+            "CACHE_DIR" environment variable to an empty string to disable caching,
+            which gunicorn.conf.py overrides when several workers share the dataset.
+        INGEST_CHUNK_MB (float): Size in megabytes of the CSV chunks read by the streaming
+            ingestion, bounding peak memory while loading. 0 loads the CSV at once.
+        INGEST_WORKERS (int): Maximum number of processes used to parse large CSV files.
+        VALIDATION_WORKERS (int): Maximum number of threads evaluating the validation
+            rules over blocks of rows.
+        APPEND_POLL_SECONDS (float): Interval at which rows appended to the CSV are
+            ingested without a full reload. 0 disables incremental ingestion.
+        RETRY_AFTER_SECONDS (int): Value of the Retry-After header of the 503 responses
+            returned while the dataset is loading.
+        OUTLIER_MODE (str): Statistics outliers are scored against: "global" for
+            fleet-wide z-scores, "per_vessel" for per-vessel z-scores, or
+            "per_vessel_mad" for the per-vessel median and median absolute deviation.
+        VALIDATION_RULES (str): Path to the JSON file defining the data cleansing rules,
+            see :mod:`app.rules`.
+        LEADERBOARD_PAGE_SIZE (int): Number of vessels returned per page of the
+            compliance leaderboard when the request sets no limit.
+        ADMIN_TOKEN (str): Bearer token required by the admin endpoints. Empty, the
+            default, disables those endpoints.
     """
 
-    CSV_PATH = "data/vessel_data.csv"
+    CSV_PATH = os.getenv("CSV_PATH", "data/vessel_data.csv")
+    CACHE_DIR = os.getenv("CACHE_DIR", "data/.cache")
+    INGEST_CHUNK_MB = float(os.getenv("INGEST_CHUNK_MB", "0"))
+    INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "1"))
+    VALIDATION_WORKERS = int(os.getenv("VALIDATION_WORKERS", "1"))
+    APPEND_POLL_SECONDS = float(os.getenv("APPEND_POLL_SECONDS", "0"))
+    RETRY_AFTER_SECONDS = int(os.getenv("RETRY_AFTER_SECONDS", "5"))
+    OUTLIER_MODE = os.getenv("OUTLIER_MODE", "global")
+    VALIDATION_RULES = os.getenv("VALIDATION_RULES", "app/validation_rules.json")
+    LEADERBOARD_PAGE_SIZE = int(os.getenv("LEADERBOARD_PAGE_SIZE", "50"))
+    ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
     DEBUG = os.getenv("DEBUG", "False")
@@ -0,0 +1,31 @@
+"""
+Gunicorn configuration for the MaritimeMetrics API.
+
+Each worker loads the dataset in a background thread, so the application is not
+preloaded in the master (threads do not survive the fork). Workers only share the
+dataset through the on-disk cache: on a cold start the first worker to take the dataset
+cache lock builds the cache while the others wait, then every worker attaches the same
+read-only, memory-mapped dataset pages, so adding workers does not multiply the
+dataset's memory. The cache therefore cannot be disabled when several workers run; an
+empty ``CACHE_DIR`` falls back to the default directory.
+"""
+
+import logging
+import os
+
+from dotenv import load_dotenv
+
+# Default of Config.CACHE_DIR; config is not imported here so that workers read it after
+# the environment below is settled
+DEFAULT_CACHE_DIR = "data/.cache"
+
+load_dotenv()
+
+workers = int(os.getenv("WEB_CONCURRENCY", "2"))
+
+if workers > 1 and not os.getenv("CACHE_DIR", DEFAULT_CACHE_DIR):
+    logging.warning(
+        f"CACHE_DIR is empty with {workers} workers, using {DEFAULT_CACHE_DIR} so "
+        "that they share one copy of the dataset"
+    )
+    os.environ["CACHE_DIR"] = DEFAULT_CACHE_DIR
@@ -1,4 +1,11 @@
-from app import app
+import multiprocessing
+
+from app import app, dataset_loader
+
+# Worker processes of the parallel CSV parser may import the main module as well, so
+# only the main process loads the dataset
+if multiprocessing.parent_process() is None:
+    dataset_loader.start()
 
 if __name__ == "__main__":
     app.run()
@@ -4,7 +4,9 @@ Module to test the Flask API endpoints.
 
 import json
 import unittest
+from unittest import mock
 
+from app.loader import DatasetLoader
 from app.views import app
 
 
@@ -17,12 +19,25 @@ class APITest(unittest.TestCase):
     edge cases.
     """
 
+    ADMIN_HEADERS = {"Authorization": "Bearer test-token"}
+
+    @classmethod
+    def setUpClass(cls):
+        """
+        Load the dataset in the background, as the entry point does, and wait for it.
+        """
+        app.config["dataset_loader"].start()
+        app.config["dataset_loader"].wait(timeout=120)
+
     def setUp(self):
         """
         Set up the test client for Flask application.
         """
         self.app = app.test_client()
         self.app.testing = True
+        admin_token = mock.patch.dict(app.config, {"ADMIN_TOKEN": "test-token"})
+        admin_token.start()
+        self.addCleanup(admin_token.stop)
 
     def test_get_vessel_invalid_data(self):
         """
@@ -45,6 +60,18 @@ class APITest(unittest.TestCase):
         response = self.app.get("/api/vessel_invalid_data/notanumber")  # Invalid format
         self.assertEqual(response.status_code, 400)
 
+    def test_vessel_invalid_rows(self):
+        """
+        Test retrieving the records of a vessel failing a check, and an unknown check.
+        """
+        response = self.app.get(
+            "/api/vessel_invalid_rows/3001/below_zero/power?limit=5"
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(all(row["power"] < 0 for row in response.get_json()))
+        response = self.app.get("/api/vessel_invalid_rows/3001/below_zero/latitude")
+        self.assertEqual(response.status_code, 400)
+
     def test_vessel_speed_difference(self):
         """
         Test retrieving speed differences for a vessel with a valid code.
@@ -79,6 +106,40 @@ class APITest(unittest.TestCase):
         )  # Invalid format
         self.assertEqual(response.status_code, 400)
 
+    def test_compliance_leaderboard(self):
+        """
+        Test that the leaderboard ranks the fleet with the scores of the comparison and
+        pages through the ranking.
+        """
+        response = self.app.get("/api/compliance/leaderboard")
+        self.assertEqual(response.status_code, 200)
+        body = response.get_json()
+        self.assertEqual(body["total_vessels"], 2)
+        self.assertEqual(
+            [
+                (vessel["rank"], vessel["vessel_code"], vessel["compliance_score"])
+                for vessel in body["vessels"]
+            ],
+            [(1, 19310, 83.54), (2, 3001, 72.11)],
+        )
+        self.assertEqual(body["vessels"][0]["percentile"], 100.0)
+
+        response = self.app.get(
+            "/api/compliance/leaderboard?start_date=2023-06-01&offset=1&limit=1"
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [vessel["rank"] for vessel in response.get_json()["vessels"]], [2]
+        )
+        for query in (
+            "limit=0",
+            "offset=-1",
+            "offset=first",
+            "start_date=2024-01-01&end_date=2023-01-01",
+        ):
+            response = self.app.get(f"/api/compliance/leaderboard?{query}")
+            self.assertEqual(response.status_code, 400, query)
+
     def test_vessel_metrics_with_start_date_after_end_date(self):
         """
         Test that the API handles cases where start date is after the end date.
@@ -89,6 +150,26 @@ class APITest(unittest.TestCase):
             "Start date cannot be after end date", response.get_json()["message"]
         )
 
+    def test_vessel_metrics_with_iso_timestamps(self):
+        """
+        Test that periods can be given as ISO-8601 timestamps as well as dates.
+        """
+        response = self.app.get(
+            "/api/vessel_raw_metrics/3001/2023-06-01T00:00:00/2023-06-01T02:00:00+02:00"
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [record["datetime"] for record in response.get_json()],
+            [
+                self.app.get(
+                    "/api/vessel_raw_metrics/3001/2023-06-01/2023-06-01"
+                ).get_json()[0]["datetime"]
+            ],
+        )
+        response = self.app.get("/api/vessel_metrics/3001/2023-06-01/01-06-2023")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("ISO-8601", response.get_json()["message"])
+
     def test_get_vessel_data_with_empty_string(self):
         """
         Test that the API handles requests with an empty string as vessel code.
@@ -96,6 +177,159 @@ class APITest(unittest.TestCase):
         response = self.app.get("/api/vessel_invalid_data/")
         self.assertEqual(response.status_code, 404)
 
+    def test_healthz(self):
+        """
+        Test that the liveness endpoint answers with status ok.
+        """
+        response = self.app.get("/healthz")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()["status"], "ok")
+
+    def test_readyz(self):
+        """
+        Test that the readiness endpoint reports the loaded dataset.
+        """
+        response = self.app.get("/readyz")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()["status"], "ready")
+        self.assertIsNotNone(response.get_json()["elapsed_seconds"])
+
+    def test_dataset_version_header(self):
+        """
+        Test that data responses report the version of the dataset they were computed from.
+        """
+        response = self.app.get("/api/vessel_invalid_data/3001")
+        self.assertEqual(
+            response.headers["X-Dataset-Version"],
+            self.app.get("/readyz").get_json()["version"],
+        )
+
+    def test_admin_reload(self):
+        """
+        Test that the reload endpoint starts a reload, or answers 409 if one is running.
+        """
+        with mock.patch("app.views.dataset_loader.reload", return_value=True):
+            response = self.app.post("/admin/reload", headers=self.ADMIN_HEADERS)
+            self.assertEqual(response.status_code, 202)
+        with mock.patch("app.views.dataset_loader.reload", return_value=False):
+            response = self.app.post("/admin/reload", headers=self.ADMIN_HEADERS)
+            self.assertEqual(response.status_code, 409)
+
+    def test_admin_endpoints_require_token(self):
+        """
+        Test that the admin endpoints changing the served dataset are rejected when no
+        admin token is configured, or the request does not present it.
+        """
+        with mock.patch("app.views.dataset_loader") as loader:
+            for path in (
+                "/admin/reload",
+                "/admin/outlier_reclassification",
+                "/admin/validation_rules",
+            ):
+                for headers in ({}, {"Authorization": "Bearer wrong"}):
+                    response = self.app.post(path, headers=headers)
+                    self.assertEqual(response.status_code, 401, path)
+                    self.assertEqual(response.headers["WWW-Authenticate"], "Bearer")
+                with mock.patch.dict(app.config, {"ADMIN_TOKEN": ""}):
+                    response = self.app.post(path, headers=self.ADMIN_HEADERS)
+                    self.assertEqual(response.status_code, 403, path)
+            loader.reload.assert_not_called()
+            loader.reclassify_outliers.assert_not_called()
+            loader.revalidate.assert_not_called()
+
+    def test_admin_reports_require_token(self):
+        """
+        Test that the admin endpoints reporting the served dataset are rejected when the
+        request does not present the admin token.
+        """
+        for path in (
+            "/admin/load_metrics",
+            "/admin/outlier_reclassification",
+            "/admin/validation_rules",
+        ):
+            for headers in ({}, {"Authorization": "Bearer wrong"}):
+                response = self.app.get(path, headers=headers)
+                self.assertEqual(response.status_code, 401, path)
+                self.assertNotIn("records", response.get_json())
+            with mock.patch.dict(app.config, {"ADMIN_TOKEN": ""}):
+                response = self.app.get(path, headers=self.ADMIN_HEADERS)
+                self.assertEqual(response.status_code, 403, path)
+
+    def test_load_metrics(self):
+        """
+        Test that the load stages of the served dataset are reported.
+        """
+        response = self.app.get("/admin/load_metrics", headers=self.ADMIN_HEADERS)
+        self.assertEqual(response.status_code, 200)
+        metrics = json.loads(response.data)
+        self.assertEqual(metrics["version"], app.config["dataset_loader"].data.version)
+        self.assertTrue(metrics["stages"])
+        self.assertEqual(
+            set(metrics["stages"][0]),
+            {"name", "seconds", "rows_in", "rows_out", "peak_memory_delta_mb"},
+        )
+
+    def test_outlier_reclassification(self):
+        """
+        Test previewing and applying the outlier reclassification of the served dataset.
+        """
+        response = self.app.get(
+            "/admin/outlier_reclassification?limit=5", headers=self.ADMIN_HEADERS
+        )
+        self.assertEqual(response.status_code, 200)
+        preview = json.loads(response.data)
+        self.assertLessEqual(len(preview["records"]), 5)
+        self.assertEqual(preview["rows"], sum(preview["by_column"].values()))
+        with mock.patch(
+            "app.views.dataset_loader.reclassify_outliers",
+            side_effect=ValueError("Outliers cannot be reclassified."),
+        ):
+            response = self.app.post(
+                "/admin/outlier_reclassification", headers=self.ADMIN_HEADERS
+            )
+            self.assertEqual(response.status_code, 400)
+
+    def test_validation_rules(self):
+        """
+        Test reporting the validation rules of the served dataset and applying others.
+        """
+        response = self.app.get("/admin/validation_rules", headers=self.ADMIN_HEADERS)
+        self.assertEqual(response.status_code, 200)
+        rules = json.loads(response.data)["rules"]
+        self.assertEqual(
+            rules, app.config["dataset_loader"].data.validation.rules.config()
+        )
+        with mock.patch(
+            "app.views.dataset_loader.revalidate", return_value=3
+        ) as revalidate:
+            response = self.app.post(
+                "/admin/validation_rules",
+                json={"rules": rules},
+                headers=self.ADMIN_HEADERS,
+            )
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(json.loads(response.data)["computed_stages"], 3)
+            self.assertEqual(revalidate.call_args[0][0].config(), rules)
+            for body in ({"rules": [{"label": "speed"}]}, {"checks": []}):
+                response = self.app.post(
+                    "/admin/validation_rules", json=body, headers=self.ADMIN_HEADERS
+                )
+                self.assertEqual(response.status_code, 400)
+            self.assertEqual(revalidate.call_count, 1)
+
+    def test_data_endpoints_unavailable_while_loading(self):
+        """
+        Test that data endpoints answer 503 with Retry-After until the dataset is loaded.
+        """
+        with mock.patch(
+            "app.views.dataset_loader", DatasetLoader(lambda progress: None)
+        ):
+            response = self.app.get("/api/vessel_invalid_data/3001")
+            self.assertEqual(response.status_code, 503)
+            self.assertIn("Retry-After", response.headers)
+            self.assertEqual(self.app.get("/readyz").status_code, 503)
+            self.assertEqual(self.app.get("/healthz").status_code, 200)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,122 @@
+"""
+Module to test the background loading and hot reload of the dataset.
+"""
+
+import copy
+import os
+import shutil
+import tempfile
+import unittest
+
+from app.loader import DatasetLoader
+from app.models import MaritimeData
+from tests.test_models import CSV_ROWS, power_row, write_csv
+
+
+class DatasetLoaderTest(unittest.TestCase):
+    """
+    Test suite for DatasetLoader publishing dataset snapshots.
+    """
+
+    def setUp(self):
+        """
+        Create a temporary CSV and a loader building MaritimeData from it.
+        """
+        self.tmp_dir = tempfile.mkdtemp()
+        self.csv_path = os.path.join(self.tmp_dir, "vessels.csv")
+        write_csv(self.csv_path)
+        self.loader = DatasetLoader(
+            lambda progress: MaritimeData(
+                self.csv_path, cache_dir=os.path.join(self.tmp_dir, "cache")
+            )
+        )
+        self.loader.start()
+        self.assertTrue(self.loader.wait(timeout=30))
+
+    def tearDown(self):
+        """
+        Remove the temporary directory.
+        """
+        shutil.rmtree(self.tmp_dir)
+
+    def test_reload_publishes_new_snapshot(self):
+        """
+        Test that a reload swaps in a new version and leaves the old snapshot intact.
+        """
+        snapshot = self.loader.data
+        write_csv(self.csv_path, CSV_ROWS[:3])
+        self.assertTrue(self.loader.reload(background=False))
+        self.assertIsNot(self.loader.data, snapshot)
+        self.assertNotEqual(self.loader.data.version, snapshot.version)
+        self.assertEqual(len(self.loader.data.raw_data), 3)
+        self.assertEqual(len(snapshot.raw_data), len(CSV_ROWS))
+        self.assertEqual(self.loader.status()["version"], self.loader.data.version)
+
+    def test_failed_reload_keeps_current_snapshot(self):
+        """
+        Test that the current snapshot keeps being served if a reload fails.
+        """
+        snapshot = self.loader.data
+        os.remove(self.csv_path)
+        self.loader.reload(background=False)
+        self.assertIs(self.loader.data, snapshot)
+        self.assertTrue(self.loader.is_ready)
+        self.assertIsNotNone(self.loader.status()["error"])
+
+    def test_reclassified_outliers_published_as_new_snapshot(self):
+        """
+        Test that outliers are reclassified into a new snapshot, leaving the flags of
+        the previous one untouched.
+        """
+        rows = [power_row(3001, minute, 100 + 2 * (minute % 2)) for minute in range(10)]
+        rows += [power_row(19310, minute, 500) for minute in range(10)]
+        write_csv(self.csv_path, rows)
+        self.loader.reload(background=False)
+        with open(self.csv_path, "a", encoding="utf-8") as file:
+            for minute in range(10, 50):
+                file.write(power_row(3001, minute, 101) + "\n")
+        self.loader.check_source()
+        snapshot = self.loader.data
+        self.assertEqual(self.loader.reclassify_outliers(), 10)
+        self.assertIsNot(self.loader.data, snapshot)
+        self.assertEqual(int((snapshot.flags != 0).sum()), 0)
+        self.assertEqual(int((self.loader.data.flags != 0).sum()), 10)
+        self.assertNotEqual(self.loader.data.version, snapshot.version)
+
+    def test_appended_rows_published_as_new_snapshot(self):
+        """
+        Test that appended rows are ingested into a new snapshot, and a rewritten CSV
+        is reloaded in full.
+        """
+        snapshot = self.loader.data
+        with open(self.csv_path, "a", encoding="utf-8") as file:
+            file.write(
+                '"3001","2023-06-03 00:00:00","10.31","-14.83","100","5","10","10.5","5"\n'
+            )
+        self.loader.check_source()
+        self.assertEqual(len(self.loader.data.raw_data), len(CSV_ROWS) + 1)
+        self.assertEqual(len(snapshot.raw_data), len(CSV_ROWS))
+        self.assertNotEqual(self.loader.data.version, snapshot.version)
+
+        write_csv(self.csv_path, CSV_ROWS[:2])
+        self.loader.check_source()
+        self.assertEqual(len(self.loader.data.raw_data), 2)
+
+    def test_failed_ingestion_falls_back_to_reload(self):
+        """
+        Test that appended rows that cannot be ingested trigger a full reload instead of
+        leaving the served snapshot stale.
+        """
+        snapshot = self.loader.data
+        with open(self.csv_path, "a", encoding="utf-8") as file:
+            file.write('"3001","June 3","10.31","-14.83","100","5","10","10.5","5"\n')
+        with self.assertRaises(ValueError):
+            copy.copy(snapshot).ingest_appended_rows()
+        self.loader.check_source()
+        self.assertIsNotNone(self.loader.reloaded_at)
+        self.assertIsNot(self.loader.data, snapshot)
+        self.assertEqual(len(self.loader.data.raw_data), len(CSV_ROWS) + 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
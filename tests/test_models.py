@@ -0,0 +1,1184 @@
+"""
+Module to test the data loading and processing logic of MaritimeData.
+"""
+
+import copy
+import glob
+import json
+import os
+import shutil
+import tempfile
+import tracemalloc
+import unittest
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+from app.compliance import ComplianceSummary
+from app.ingest import read_vessel_csv, read_vessel_csv_parallel, split_byte_ranges
+from app.invalid_data import InvalidDataSummary
+from app.models import MaritimeData
+from app.outliers import (
+    MAD_SCALE,
+    RunningStats,
+    SortedValues,
+    compute_outlier_stats,
+    outlier_mask,
+)
+from app.partitions import list_partition_files
+from app.pipeline import first_failures
+from app.rules import DEFAULT_RULES_PATH, ValidationRules, row_blocks
+from app.vessel_index import VesselIndex
+
+CSV_HEADER = (
+    '"vessel_code","datetime","latitude","longitude","power","fuel_consumption",'
+    '"actual_speed_overground","proposed_speed_overground","predicted_fuel_consumption"'
+)
+
+CSV_ROWS = [
+    '"3001","2023-06-01 00:00:00","10.28","-14.78","100","5","10","10.5","5"',
+    '"3001","2023-06-01 00:01:00","10.29","-14.79","110","5.5","11","10.5","5.5"',
+    '"3001","2023-06-01 00:02:00","10.30","-14.80","-1","5","10","10.5","5"',
+    '"3001","2023-06-01 00:03:00","","-14.81","105","5","10","10.5","5"',
+    '"3001","2023-06-02 00:00:00","95.0","-14.82","105","5","10","10.5","5"',
+    '"19310","2023-06-01 00:00:00","49.28","-123.17","200","9","12","12","9"',
+    '"19310","2023-06-01 00:01:00","49.29","-123.18","210","9.5","12.5","12","9.5"',
+    '"19310","2023-06-03 00:00:00","49.30","-190.0","205","9","12","12","9"',
+]
+
+
+def power_row(vessel_code, minute, power):
+    """Builds a valid CSV row whose only varying measurement is the power."""
+    return (
+        f'"{vessel_code}","2023-06-01 00:{minute:02d}:00","10.3","-14.8",'
+        f'"{power}","5","10","10.5","5"'
+    )
+
+
+def filter_step_by_step(data):
+    """
+    Applies the validation rules of a dataset one check after the other with pandas,
+    returning the remaining rows, the nested invalid counts and the outlier statistics.
+    """
+    remaining = data.raw_data
+    invalid = {}
+    statistics = {}
+    for check in data.validation.rules.checks:
+        values = remaining[check.column]
+        if check.predicate == "outlier":
+            failed, statistics[check.column] = outlier_mask(
+                values,
+                remaining["vessel_code"],
+                data.validation.outlier_mode,
+                check.params["threshold"],
+            )
+        elif check.predicate == "missing":
+            failed = values.isna()
+        else:
+            values = pd.to_numeric(values, errors="coerce")
+            failed = {
+                "below": lambda: values < check.params.get("value"),
+                "above": lambda: values > check.params.get("value"),
+                "outside": lambda: (values < check.params.get("min"))
+                | (values > check.params.get("max")),
+            }[check.predicate]()
+        failed = np.asarray(failed, dtype=bool)
+        counts = remaining.loc[failed, "vessel_code"].value_counts(sort=False)
+        for vessel_code, count in sorted(counts.items()):
+            invalid.setdefault(vessel_code, {}).setdefault(check.label, {})[
+                check.column
+            ] = int(count)
+        remaining = remaining.loc[~failed]
+    return remaining, invalid, statistics
+
+
+def compliance_by_vessel(data):
+    """
+    Computes the compliance score of every vessel with a pandas group-by over the
+    filtered data.
+    """
+    filtered = data.filtered_data
+    actual = filtered["actual_speed_overground"]
+    proposed = filtered["proposed_speed_overground"]
+    deviation = ((actual - proposed).abs() / proposed * 100)[proposed != 0]
+    means = deviation.groupby(filtered["vessel_code"]).mean()
+    return {
+        vessel_code: round(100 - means.get(vessel_code, 100.0), 2)
+        for vessel_code in filtered["vessel_code"].unique().tolist()
+    }
+
+
+def write_csv(path, rows=None):
+    """Writes a small vessel CSV in the same format as the bundled dataset."""
+    with open(path, "w", encoding="utf-8") as file:
+        file.write("\n".join([CSV_HEADER] + (CSV_ROWS if rows is None else rows)))
+        file.write("\n")
+
+
+class MaritimeDataTest(unittest.TestCase):
+    """
+    Test suite for MaritimeData loading, caching and filtering on a small dataset.
+    """
+
+    def setUp(self):
+        """
+        Create a temporary directory holding a small CSV and a cache directory.
+        """
+        self.tmp_dir = tempfile.mkdtemp()
+        self.csv_path = os.path.join(self.tmp_dir, "vessels.csv")
+        self.cache_dir = os.path.join(self.tmp_dir, "cache")
+        write_csv(self.csv_path)
+
+    def tearDown(self):
+        """
+        Remove the temporary directory.
+        """
+        shutil.rmtree(self.tmp_dir)
+
+    def test_cache_round_trip(self):
+        """
+        Test that a cached load returns the same data as parsing the CSV.
+        """
+        uncached = MaritimeData(self.csv_path)
+        first = MaritimeData(self.csv_path, cache_dir=self.cache_dir)
+        second = MaritimeData(self.csv_path, cache_dir=self.cache_dir)
+        self.assertIsNotNone(second.cache.lookup(self.csv_path))
+        self.assertTrue(uncached.raw_data.equals(first.raw_data))
+        self.assertTrue(uncached.raw_data.equals(second.raw_data))
+        self.assertEqual(uncached.invalid_data, second.invalid_data)
+
+    def test_cache_rebuilt_when_source_changes(self):
+        """
+        Test that modifying the CSV invalidates the cache entry.
+        """
+        MaritimeData(self.csv_path, cache_dir=self.cache_dir)
+        write_csv(self.csv_path, CSV_ROWS[:3])
+        reloaded = MaritimeData(self.csv_path, cache_dir=self.cache_dir)
+        self.assertEqual(len(reloaded.raw_data), 3)
+
+    def test_cache_reused_when_only_mtime_changes(self):
+        """
+        Test that touching the CSV without changing its content keeps the cache valid.
+        """
+        MaritimeData(self.csv_path, cache_dir=self.cache_dir)
+        stat = os.stat(self.csv_path)
+        os.utime(self.csv_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        cache = MaritimeData(self.csv_path, cache_dir=self.cache_dir).cache
+        self.assertEqual(
+            cache.lookup(self.csv_path)["source"]["mtime_ns"],
+            stat.st_mtime_ns + 10**9,
+        )
+
+    def test_filter_results_restored_from_cache(self):
+        """
+        Test that warm starts restore the filtered data and invalid data from the cache.
+        """
+        first = MaritimeData(self.csv_path, cache_dir=self.cache_dir)
+        second = MaritimeData(self.csv_path, cache_dir=self.cache_dir)
+        self.assertIsNotNone(
+            second.cache.load_filter_result(self.csv_path, second.validation.config())
+        )
+        self.assertTrue(first.filtered_data.equals(second.filtered_data))
+        self.assertEqual(first.invalid_data, second.invalid_data)
+        self.assertIn("below_zero", second.get_invalid_data_for_vessel(3001))
+
+    def test_fused_filters_match_step_by_step_filters(self):
+        """
+        Test that the single-pass filters attribute rows exactly like applying the
+        checks one after the other.
+        """
+        data = MaritimeData(self.csv_path)
+        filtered, invalid, statistics = filter_step_by_step(data)
+        self.assertTrue(filtered.equals(data.filtered_data))
+        self.assertEqual(invalid, data.invalid_data)
+        self.assertEqual(
+            [list(problems) for problems in invalid.values()],
+            [list(problems) for problems in data.invalid_data.values()],
+        )
+        self.assertEqual(statistics, data.outliers.outlier_stats)
+
+    def test_parallel_validation_matches_serial(self):
+        """
+        Test that validating blocks of rows in several threads flags the same rows and
+        computes the same statistics as a single thread.
+        """
+        with mock.patch("app.rules.MIN_BLOCK_ROWS", 2):
+            self.assertEqual(row_blocks(7, 3), [slice(0, 3), slice(3, 6), slice(6, 7)])
+            self.assertEqual(row_blocks(7, 3, 2)[-1], slice(6, 7))
+            for mode in ("global", "per_vessel", "per_vessel_mad"):
+                serial = MaritimeData(self.csv_path, outlier_mode=mode)
+                parallel = MaritimeData(
+                    self.csv_path, outlier_mode=mode, validation_workers=3
+                )
+                np.testing.assert_array_equal(serial.flags, parallel.flags)
+                self.assertTrue(serial.filtered_data.equals(parallel.filtered_data))
+                self.assertEqual(serial.invalid_data, parallel.invalid_data)
+                self.assertEqual(
+                    serial.outliers.outlier_stats, parallel.outliers.outlier_stats
+                )
+                self.assertEqual(
+                    serial.outliers.running_stats, parallel.outliers.running_stats
+                )
+
+    def test_custom_validation_rules(self):
+        """
+        Test that a rule added to the configuration file is applied and reported without
+        code changes, and that malformed rules are rejected.
+        """
+        with open(DEFAULT_RULES_PATH, encoding="utf-8") as file:
+            config = json.load(file)
+        config["rules"].insert(
+            2,
+            {
+                "label": "above_max_speed",
+                "predicate": "above",
+                "value": 40,
+                "columns": ["actual_speed_overground"],
+            },
+        )
+        rules_path = os.path.join(self.tmp_dir, "rules.json")
+        with open(rules_path, "w", encoding="utf-8") as file:
+            json.dump(config, file)
+        rows = CSV_ROWS + [
+            '"3001","2023-06-04 00:00:00","10.28","-14.78","100","5","45","10.5","5"'
+        ]
+        write_csv(self.csv_path, rows)
+        data = MaritimeData(
+            self.csv_path,
+            cache_dir=self.cache_dir,
+            validation_rules=ValidationRules.load(rules_path),
+        )
+        self.assertEqual(
+            data.validation.rules.keys()[14],
+            ("above_max_speed", "actual_speed_overground"),
+        )
+        self.assertEqual(
+            data.get_invalid_data_for_vessel(3001)["above_max_speed"],
+            {"actual_speed_overground": 1},
+        )
+        self.assertNotIn(45, data.filtered_data["actual_speed_overground"].tolist())
+        filtered, invalid, _ = filter_step_by_step(data)
+        self.assertTrue(filtered.equals(data.filtered_data))
+        self.assertEqual(invalid, data.invalid_data)
+
+        # The rules are part of the cache key of the filter results
+        default = MaritimeData(self.csv_path, cache_dir=self.cache_dir)
+        self.assertNotIn("above_max_speed", default.get_invalid_data_for_vessel(3001))
+
+        for rule in (
+            {"label": "speed", "predicate": "faster", "columns": ["power"]},
+            {"label": "speed", "predicate": "above", "columns": ["power"]},
+            {"label": "speed", "predicate": "above", "value": 1, "columns": []},
+            {"label": "speed", "predicate": "above", "value": 1, "columns": "power"},
+            {"label": "speed", "predicate": "above", "value": 1, "columns": ["knots"]},
+            {"label": "speed", "predicate": "above", "value": 1, "columns": [1]},
+            *(
+                {
+                    "label": "speed",
+                    "predicate": "above",
+                    "value": value,
+                    "columns": ["power"],
+                }
+                for value in ("1", True, np.nan, np.inf, -np.inf)
+            ),
+            {
+                "label": "spike",
+                "predicate": "outlier",
+                "threshold": True,
+                "columns": ["power"],
+            },
+            {
+                "label": "range",
+                "predicate": "outside",
+                "min": 0,
+                "max": np.nan,
+                "columns": ["power"],
+            },
+            {"predicate": "missing", "columns": ["power"]},
+        ):
+            with self.assertRaises(ValueError):
+                ValidationRules([rule])
+        with self.assertRaises(ValueError):
+            ValidationRules(
+                [
+                    {
+                        "label": "outlier",
+                        "predicate": "outlier",
+                        "threshold": 2,
+                        "columns": ["power"],
+                    },
+                    {
+                        "label": "spike",
+                        "predicate": "outlier",
+                        "threshold": 3,
+                        "columns": ["power"],
+                    },
+                ]
+            )
+
+    def test_validation_stages_reused(self):
+        """
+        Test that changed rules only recompute the validation stages they affect, in
+        memory and across restarts, with the same result as a full load.
+        """
+        rows = [power_row(3001, minute, 100 + minute % 5) for minute in range(40)]
+        write_csv(self.csv_path, rows + [power_row(3001, 40, 106)])
+        data = MaritimeData(self.csv_path, cache_dir=self.cache_dir)
+        stages = len(data.validation.rules.keys()) + len(
+            data.validation.rules.outlier_checks()
+        )
+        self.assertEqual(data.validation.computed_stages, stages)
+        flags = np.array(data.flags)
+
+        config = copy.deepcopy(data.validation.rules.config())
+        config[2]["threshold"] = 3
+        rules = ValidationRules(config)
+        updated = copy.copy(data)
+        # The masks of the outlier checks and the statistics of all but the first one
+        self.assertEqual(updated.apply_validation_rules(rules), 9)
+        full = MaritimeData(self.csv_path, validation_rules=rules)
+        np.testing.assert_array_equal(updated.flags, full.flags)
+        self.assertEqual(updated.invalid_data, full.invalid_data)
+        self.assertEqual(updated.outliers.outlier_stats, full.outliers.outlier_stats)
+        self.assertEqual(updated.valid_rows, data.valid_rows + 1)
+        self.assertNotEqual(updated.version, data.version)
+        np.testing.assert_array_equal(data.flags, flags)
+
+        # Renaming a check or going back to the previous rules recomputes nothing
+        config[0]["label"] = "negative"
+        self.assertEqual(updated.apply_validation_rules(ValidationRules(config)), 0)
+        self.assertEqual(updated.apply_validation_rules(data.validation.rules), 0)
+        np.testing.assert_array_equal(updated.flags, flags)
+
+        # The stage outputs are stored with the cached dataset
+        restarted = MaritimeData(
+            self.csv_path, cache_dir=self.cache_dir, validation_rules=rules
+        )
+        self.assertEqual(restarted.validation.computed_stages, 0)
+        np.testing.assert_array_equal(restarted.flags, full.flags)
+
+    def test_stage_outputs_pinned_to_loaded_version(self):
+        """
+        Test that stage outputs computed on a snapshot are not stored with, nor taken
+        from, a newer version of the dataset cached meanwhile by another process.
+        """
+        rows = [power_row(3001, minute, 100 + minute % 5) for minute in range(40)]
+        write_csv(self.csv_path, rows)
+        data = MaritimeData(self.csv_path, cache_dir=self.cache_dir)
+        with open(self.csv_path, "a", encoding="utf-8") as file:
+            file.write(power_row(3001, 40, 106) + "\n")
+        # Another process caches the appended CSV
+        MaritimeData(self.csv_path, cache_dir=self.cache_dir)
+        stage_files = set(glob.glob(os.path.join(self.cache_dir, "*", "*.stage-*")))
+
+        config = copy.deepcopy(data.validation.rules.config())
+        config[2]["threshold"] = 3
+        rules = ValidationRules(config)
+        updated = copy.copy(data)
+        updated.apply_validation_rules(rules)
+        self.assertEqual(
+            set(glob.glob(os.path.join(self.cache_dir, "*", "*.stage-*"))),
+            stage_files,
+        )
+        self.assertEqual(len(updated.flags), len(rows))
+
+        restarted = MaritimeData(
+            self.csv_path, cache_dir=self.cache_dir, validation_rules=rules
+        )
+        full = MaritimeData(self.csv_path, validation_rules=rules)
+        np.testing.assert_array_equal(restarted.flags, full.flags)
+        self.assertEqual(restarted.outliers.outlier_stats, full.outliers.outlier_stats)
+
+    def test_load_metrics(self):
+        """
+        Test that every load stage is recorded, and that the rows flow through the
+        checks as when applying them one after the other.
+        """
+        for chunk_mb in (None, 0.0005):
+            shutil.rmtree(self.cache_dir, ignore_errors=True)
+            data = MaritimeData(
+                self.csv_path, cache_dir=self.cache_dir, chunk_mb=chunk_mb
+            )
+            stages = {stage.name: stage for stage in data.validation.metrics.stages}
+            self.assertEqual(stages["read_csv"].rows_out, len(CSV_ROWS))
+            checks = [
+                stages[f"validate:{label}:{column}"]
+                for label, column in data.validation.rules.keys()
+            ]
+            self.assertEqual(checks[0].rows_in, len(CSV_ROWS))
+            for check, next_check in zip(checks, checks[1:]):
+                self.assertEqual(check.rows_out, next_check.rows_in)
+            self.assertEqual(checks[-1].rows_out, len(data.filtered_data))
+            self.assertEqual(
+                stages["summarize_invalid_data"].rows_in, len(data.raw_data)
+            )
+            self.assertIn("store_cached_filters", stages)
+            self.assertEqual("concatenate_chunks" in stages, chunk_mb is not None)
+            self.assertTrue(all(stage.seconds >= 0 for stage in stages.values()))
+
+        cached = MaritimeData(self.csv_path, cache_dir=self.cache_dir)
+        stages = {stage.name: stage for stage in cached.validation.metrics.stages}
+        self.assertEqual(
+            set(stages),
+            {
+                "load_cache",
+                "load_cached_filters",
+                "build_vessel_index",
+                "derive_columns",
+                "summarize_compliance",
+            },
+        )
+        self.assertEqual(
+            stages["load_cached_filters"].rows_out, len(cached.filtered_data)
+        )
+        self.assertEqual(
+            cached.validation.metrics.to_dict()["stages"][0]["name"], "load_cache"
+        )
+
+    def test_grouped_outlier_statistics(self):
+        """
+        Test that the grouped kernels match a pandas group-by and score values per vessel.
+        """
+        rng = np.random.default_rng(0)
+        vessel_codes = rng.choice([3001, 19310, 7], size=200)
+        values = rng.normal(100, 10, size=200) + (vessel_codes == 19310) * 1000
+        grouped = pd.Series(values).groupby(vessel_codes)
+        per_vessel = compute_outlier_stats(values, vessel_codes, "per_vessel")
+        self.assertEqual(list(per_vessel.vessel_codes), [7, 3001, 19310])
+        np.testing.assert_allclose(per_vessel.center, grouped.mean())
+        np.testing.assert_allclose(per_vessel.scale, grouped.std(ddof=0))
+        robust = compute_outlier_stats(values, vessel_codes, "per_vessel_mad")
+        medians = grouped.median()
+        np.testing.assert_allclose(robust.center, medians)
+        np.testing.assert_allclose(
+            robust.scale,
+            (pd.Series(values) - medians[vessel_codes].to_numpy())
+            .abs()
+            .groupby(vessel_codes)
+            .median()
+            * MAD_SCALE,
+        )
+
+        # A spike that is unremarkable fleet-wide stands out within its vessel
+        frame = pd.DataFrame(
+            {
+                "vessel_code": [1] * 8 + [2] * 5,
+                "power": [100, 101, 99, 100, 100, 101, 99, 130]
+                + [1000, 1010, 990, 1000, np.nan],
+            }
+        )
+        for mode, outliers in (
+            ("global", []),
+            ("per_vessel", [7]),
+            ("per_vessel_mad", [7]),
+        ):
+            mask, _ = outlier_mask(frame["power"], frame["vessel_code"], mode, 2)
+            self.assertEqual(list(np.flatnonzero(mask)), outliers, mode)
+        with self.assertRaises(ValueError):
+            MaritimeData(self.csv_path, outlier_mode="median")
+
+    def test_per_vessel_outlier_modes(self):
+        """
+        Test that per-vessel outlier modes give the same results on every load path.
+        """
+        for mode in ("per_vessel", "per_vessel_mad"):
+            data = MaritimeData(
+                self.csv_path, cache_dir=self.cache_dir, outlier_mode=mode
+            )
+            self.assertEqual(data.validation.config()["outlier_mode"], mode)
+            self.assertEqual(
+                list(data.outliers.outlier_stats["power"].vessel_codes), [3001, 19310]
+            )
+            fused = (data.filtered_data, data.invalid_data, data.outliers.outlier_stats)
+            filtered, invalid, statistics = filter_step_by_step(data)
+            self.assertTrue(filtered.equals(fused[0]))
+            self.assertEqual(invalid, fused[1])
+            self.assertEqual(statistics, fused[2])
+
+            cached = MaritimeData(
+                self.csv_path, cache_dir=self.cache_dir, outlier_mode=mode
+            )
+            self.assertEqual(cached.outliers.outlier_stats, fused[2])
+            self.assertEqual(cached.invalid_data, fused[1])
+
+    def test_running_statistics(self):
+        """
+        Test that merged running statistics match those of all values, and that sorted
+        values find the values above a threshold like a full scan.
+        """
+        rng = np.random.default_rng(1)
+        vessel_codes = rng.choice([3001, 19310, 7], size=300)
+        values = rng.normal(100, 10, size=300)
+        for codes in (None, vessel_codes):
+            first = RunningStats.from_values(
+                values[:120], None if codes is None else codes[:120]
+            )
+            second = RunningStats.from_values(
+                values[120:], None if codes is None else codes[120:]
+            )
+            merged = first.merge(second).to_outlier_stats()
+            expected = RunningStats.from_values(values, codes).to_outlier_stats()
+            np.testing.assert_allclose(merged.center, expected.center)
+            np.testing.assert_allclose(merged.scale, expected.scale)
+            self.assertEqual(
+                RunningStats.from_values([], None if codes is None else []).merge(
+                    first
+                ),
+                first,
+            )
+
+            sorted_values = SortedValues(values, np.arange(300), codes)
+            scores = expected.scores(values, vessel_codes)
+            self.assertEqual(
+                list(sorted_values.above(expected, 1.5)),
+                list(np.flatnonzero(scores > 1.5)),
+            )
+        self.assertEqual(
+            list(sorted_values.above(expected, 1.5, [7])),
+            list(np.flatnonzero((scores > 1.5) & (vessel_codes == 7))),
+        )
+
+    def test_outlier_reclassification(self):
+        """
+        Test that appended rows update the running statistics, and that the accepted
+        rows they turn into outliers are previewed and rejected in bulk.
+        """
+        for mode in ("global", "per_vessel"):
+            rows = [
+                power_row(3001, minute, 100 + 2 * (minute % 2)) for minute in range(10)
+            ]
+            rows += [
+                power_row(19310, minute, 500 + (minute % 2)) for minute in range(10)
+            ]
+            write_csv(self.csv_path, rows)
+            data = MaritimeData(self.csv_path, outlier_mode=mode)
+            self.assertEqual(len(data.filtered_data), 20)
+            self.assertTrue(data.preview_outlier_reclassification().empty)
+
+            # Rows at the mean of vessel 3001 shrink its standard deviation
+            with open(self.csv_path, "a", encoding="utf-8") as file:
+                for minute in range(10, 50):
+                    file.write(power_row(3001, minute, 101) + "\n")
+            self.assertEqual(data.ingest_appended_rows(), 40)
+            self.assertEqual(data.outliers.running_stats["power"].count.sum(), 60)
+            preview = data.preview_outlier_reclassification()
+            # Fleet-wide, vessel 19310 now stands out; per vessel, only the statistics
+            # of vessel 3001 changed
+            expected = 3001 if mode == "per_vessel" else 19310
+            self.assertEqual(set(preview["vessel_code"]), {expected}, mode)
+            self.assertEqual(len(preview), 10)
+            self.assertEqual(set(preview["outlier_column"]), {"power"})
+
+            version = data.version
+            self.assertEqual(data.apply_outlier_reclassification(), 10)
+            self.assertNotEqual(data.version, version)
+            self.assertEqual(len(data.filtered_data), 50)
+            self.assertEqual(data.invalid_data[expected]["outlier"]["power"], 10)
+            self.assertEqual(
+                list(
+                    data.get_invalid_rows_for_vessel(expected, "outlier", "power").index
+                ),
+                list(preview.index),
+            )
+            self.assertTrue(data.preview_outlier_reclassification().empty)
+
+        data = MaritimeData(self.csv_path, outlier_mode="per_vessel_mad")
+        with self.assertRaises(ValueError):
+            data.preview_outlier_reclassification()
+
+    def test_compliance_summary(self):
+        """
+        Test that the per-vessel compliance statistics give the scores of a group-by over
+        the filtered data as rows are appended, reclassified and validated again.
+        """
+        write_csv(
+            self.csv_path,
+            [power_row(3001, minute, 100 + minute % 3) for minute in range(10)]
+            + [power_row(19310, minute, 500 + minute % 2) for minute in range(10)],
+        )
+        data = MaritimeData(self.csv_path)
+        scores = compliance_by_vessel(data)
+        self.assertEqual(scores, {3001: 95.24, 19310: 95.24})
+        self.assertEqual(
+            {code: data.calculate_compliance_score(code) for code in scores}, scores
+        )
+
+        with open(self.csv_path, "a", encoding="utf-8") as file:
+            for minute in range(10, 50):
+                file.write(power_row(3001, minute, 101) + "\n")
+            file.write(
+                '"7","2023-06-02 00:00:00","10.3","-14.8","100","5","9","0","5"\n'
+            )
+            file.write(
+                '"3001","2023-06-02 00:00:00","10.3","-14.8","100","5","11.5","10",'
+                '"5"\n'
+            )
+        self.assertEqual(data.ingest_appended_rows(), 42)
+        self.assertEqual(
+            data.summaries.compliance.score(3001), compliance_by_vessel(data)[3001]
+        )
+        # A vessel whose only row has a proposed speed of zero exists but scores 0
+        self.assertIn(7, data.summaries.compliance)
+        self.assertEqual(data.calculate_compliance_score(7), 0.0)
+
+        # The rows of vessel 19310 stand out in power, the last two rows in speed
+        self.assertEqual(data.apply_outlier_reclassification(), 12)
+        self.assertNotIn(19310, data.summaries.compliance)
+        self.assertEqual(
+            data.summaries.compliance.score(3001), compliance_by_vessel(data)[3001]
+        )
+        self.assertEqual(
+            data.compare_vessel_compliance(3001, 19310),
+            "Vessel code 19310 does not exist.",
+        )
+
+        data.apply_validation_rules(ValidationRules.load())
+        self.assertEqual(
+            dict(
+                zip(
+                    data.summaries.compliance.vessel_codes.tolist(),
+                    data.summaries.compliance.scores().tolist(),
+                )
+            ),
+            compliance_by_vessel(data),
+        )
+
+    def test_compliance_summary_matches_pandas_mean(self):
+        """
+        Test that the compliance statistics give exactly the means of the baseline
+        formula, a pandas mean over the rows of each vessel, on random data.
+        """
+        rng = np.random.default_rng(1)
+        rows = 100000
+        vessel_codes = rng.choice([7, 3001, 19310], rows)
+        actual = rng.uniform(0, 20, rows)
+        proposed = rng.uniform(0, 20, rows)
+        proposed[rng.choice(rows, 100)] = 0
+        valid = rng.random(rows) > 0.2
+        deviations = np.full(rows, np.nan)
+        np.divide(
+            np.abs(actual - proposed), proposed, out=deviations, where=proposed != 0
+        )
+        summary = ComplianceSummary.from_rows(vessel_codes, deviations * 100, valid)
+        for position, vessel_code in enumerate(summary.vessel_codes):
+            vessel = pd.DataFrame({"actual": actual, "proposed": proposed})[
+                valid & (vessel_codes == vessel_code)
+            ]
+            vessel = vessel[vessel["proposed"] != 0]
+            mean = (
+                abs(vessel["actual"] - vessel["proposed"]) / vessel["proposed"] * 100
+            ).mean()
+            self.assertEqual(summary.sums[position] / summary.counts[position], mean)
+            self.assertEqual(summary.score(vessel_code), round(100 - mean, 2))
+
+    def test_compliance_leaderboard(self):
+        """
+        Test that the leaderboard ranks the scores of the valid rows within the period,
+        and is cached per dataset version.
+        """
+        rows = [
+            '"7","2023-06-01 00:00:00","10.3","-14.8","100","5","10","10","5"',
+            '"7","2023-06-04 00:00:00","10.3","-14.8","100","5","9","10","5"',
+        ]
+        write_csv(self.csv_path, CSV_ROWS + rows)
+        data = MaritimeData(self.csv_path)
+        leaderboard = data.compliance_leaderboard()
+        self.assertEqual(list(leaderboard["vessel_code"]), [19310, 3001, 7])
+        self.assertEqual(list(leaderboard["rank"]), [1, 2, 3])
+        self.assertEqual(list(leaderboard["percentile"]), [100.0, 66.67, 33.33])
+        self.assertEqual(
+            list(leaderboard["compliance_score"]),
+            [data.calculate_compliance_score(code) for code in (19310, 3001, 7)],
+        )
+        self.assertIs(data.compliance_leaderboard(None, ""), leaderboard)
+
+        period = data.compliance_leaderboard("2023-06-01", "2023-06-01T00:00:00Z")
+        within = copy.copy(data)
+        within.rows = data.rows._replace(
+            flags=np.where(data.raw_data["datetime"] > "2023-06-01", 1, data.flags)
+        )
+        self.assertEqual(
+            dict(zip(period["vessel_code"], period["compliance_score"])),
+            compliance_by_vessel(within),
+        )
+        # Ties share the best rank
+        self.assertEqual(list(period["rank"]), [1, 1, 3])
+        self.assertEqual(list(period["vessel_code"]), [7, 19310, 3001])
+        self.assertTrue(data.compliance_leaderboard(end_date="2023-05-31").empty)
+
+        with open(self.csv_path, "a", encoding="utf-8") as file:
+            file.write(rows[0].replace("00:00:00", "00:02:00") + "\n")
+        data.ingest_appended_rows()
+        leaderboard = data.compliance_leaderboard()
+        self.assertEqual(list(leaderboard["vessel_code"]), [19310, 7, 3001])
+        self.assertEqual(list(leaderboard["scored_rows"]), [2, 3, 2])
+        with self.assertRaises(ValueError):
+            data.compliance_leaderboard("2023-06-02", "2023-06-01")
+
+    def test_validation_flags(self):
+        """
+        Test that every failing check of a row is flagged and can be queried.
+        """
+        data = MaritimeData(self.csv_path)
+        rules = data.validation.rules.keys()
+        below_zero_power = 1 << rules.index(("below_zero", "power"))
+        missing_latitude = 1 << rules.index(("missing_value", "latitude"))
+        self.assertEqual(data.flags[2] & below_zero_power, below_zero_power)
+        self.assertEqual(data.flags[3] & missing_latitude, missing_latitude)
+        self.assertEqual(
+            list(first_failures(data.flags)[:4]),
+            [
+                -1,
+                -1,
+                rules.index(("below_zero", "power")),
+                rules.index(("missing_value", "latitude")),
+            ],
+        )
+        rows = data.get_invalid_rows_for_vessel(3001, "invalid_latitude", "latitude")
+        self.assertEqual(list(rows["latitude"]), [95.0])
+        self.assertTrue(
+            data.get_invalid_rows_for_vessel(19310, "below_zero", "power").empty
+        )
+        with self.assertRaises(ValueError):
+            data.get_invalid_rows_for_vessel(3001, "below_zero", "latitude")
+
+    def test_invalid_data_summary(self):
+        """
+        Test the per-vessel counts, their sorted view and merging summaries.
+        """
+        rules = [("below_zero", "power"), ("below_zero", "speed"), ("outlier", "power")]
+        summary = InvalidDataSummary.from_first_failures(
+            rules,
+            np.array([7, 7, 7, 5, 7]),
+            np.array([0, 1, 1, 2, -1], dtype=np.int8),
+        )
+        self.assertEqual(
+            summary.for_vessel(7), {"below_zero": {"speed": 2, "power": 1}}
+        )
+        self.assertEqual(list(summary.to_nested()), [7, 5])
+        merged = summary.merge(
+            InvalidDataSummary.from_first_failures(
+                rules, np.array([9, 5]), np.array([2, 2], dtype=np.int8)
+            )
+        )
+        self.assertEqual(merged.for_vessel(5), {"outlier": {"power": 2}})
+        self.assertEqual(merged.for_vessel(9), {"outlier": {"power": 1}})
+        self.assertEqual(merged.for_vessel(1), {})
+
+    def test_declared_schema(self):
+        """
+        Test that the CSV is parsed with the declared compact dtypes.
+        """
+        df = read_vessel_csv(self.csv_path)
+        self.assertEqual(str(df["vessel_code"].dtype), "int32")
+        self.assertEqual(str(df["datetime"].dtype), "datetime64[ns]")
+        self.assertEqual(str(df["power"].dtype), "float64")
+
+    def test_schema_fallback_on_missing_vessel_code(self):
+        """
+        Test that a CSV violating the schema still loads through type inference.
+        """
+        write_csv(
+            self.csv_path,
+            CSV_ROWS + ['"","2023-06-04 00:00:00","1","1","1","1","1","1","1"'],
+        )
+        data = MaritimeData(self.csv_path)
+        self.assertEqual(len(data.raw_data), len(CSV_ROWS) + 1)
+        self.assertFalse(data.filtered_data["vessel_code"].isna().any())
+
+    def test_streaming_ingestion_matches_full_load(self):
+        """
+        Test that streaming the CSV in small chunks gives the same result as a full load.
+        """
+        full = MaritimeData(self.csv_path)
+        streamed = MaritimeData(self.csv_path, chunk_mb=0.0001)
+        self.assertTrue(full.raw_data.equals(streamed.raw_data))
+        self.assertTrue(full.filtered_data.equals(streamed.filtered_data))
+        self.assertEqual(full.invalid_data, streamed.invalid_data)
+        self.assertEqual(
+            list(full.invalid_data[3001]), list(streamed.invalid_data[3001])
+        )
+
+    def test_warm_start_maps_shared_columns(self):
+        """
+        Test that warm starts attach read-only memory-mapped columns instead of copies.
+        """
+        cold = MaritimeData(self.csv_path, cache_dir=self.cache_dir)
+        warm = MaritimeData(self.csv_path, cache_dir=self.cache_dir)
+        values = warm.raw_data["power"].to_numpy()
+        self.assertIsInstance(values.base, np.memmap)
+        self.assertFalse(values.flags.writeable)
+        for name in VesselIndex.ARRAYS:
+            values = getattr(warm.rows.vessel_index, name)
+            self.assertIsInstance(values, np.memmap, name)
+            self.assertFalse(values.flags.writeable)
+            np.testing.assert_array_equal(values, getattr(cold.rows.vessel_index, name))
+        for name, values in warm.rows.derived_columns.items():
+            self.assertIsInstance(values, np.memmap, name)
+            self.assertFalse(values.flags.writeable)
+            np.testing.assert_array_equal(values, cold.rows.derived_columns[name])
+        self.assertFalse(glob.glob(os.path.join(self.cache_dir, "*.filtered.*")))
+        self.assertEqual(
+            warm.get_invalid_data_for_vessel(3001)["below_zero"]["power"], 1
+        )
+
+    def test_resident_memory_of_loaded_dataset(self):
+        """
+        Test that the loaded dataset holds its columns once, the filtered data being
+        derived from the raw columns and the validation flags instead of copied, besides
+        the per-vessel index and the derived columns.
+        """
+        rng = np.random.default_rng(0)
+        rows = [
+            power_row(3001 + index % 4, index % 60, int(power))
+            for index, power in enumerate(rng.normal(100, 10, 20000))
+        ]
+        write_csv(self.csv_path, rows)
+        tracemalloc.start()
+        try:
+            baseline = tracemalloc.get_traced_memory()[0]
+            data = MaritimeData(self.csv_path)
+            retained = tracemalloc.get_traced_memory()[0] - baseline
+        finally:
+            tracemalloc.stop()
+        raw_bytes = data.raw_data.memory_usage(deep=True).sum()
+        index_bytes = (
+            data.rows.vessel_index.order.nbytes
+            + data.rows.vessel_index.timestamps.nbytes
+        )
+        derived_bytes = sum(
+            values.nbytes for values in data.rows.derived_columns.values()
+        )
+        self.assertLess(retained, 1.3 * raw_bytes + index_bytes + derived_bytes)
+        self.assertGreater(data.valid_rows, 0)
+        self.assertEqual(len(data.filtered_data), data.valid_rows)
+
+    def test_parallel_parse_matches_single_process(self):
+        """
+        Test that parsing byte ranges in worker processes gives the same frame.
+        """
+        header, ranges = split_byte_ranges(self.csv_path, 3)
+        self.assertEqual(header.decode("utf-8").strip(), CSV_HEADER)
+        self.assertEqual(len(ranges), 3)
+        expected = read_vessel_csv(self.csv_path)
+        self.assertTrue(expected.equals(read_vessel_csv_parallel(self.csv_path, 3)))
+
+    def test_ingest_appended_rows(self):
+        """
+        Test that appended rows are validated and ingested without a full reload.
+        """
+        data = MaritimeData(self.csv_path, cache_dir=self.cache_dir)
+        raw_size, filtered_size = len(data.raw_data), len(data.filtered_data)
+        with open(self.csv_path, "a", encoding="utf-8") as file:
+            file.write(
+                '"3001","2023-06-03 00:00:00","10.31","-14.83","100","5","10","10.5","5"\n'
+            )
+            file.write(
+                '"3001","2023-06-03 00:01:00","10.32","-14.84","-5","5","10","10.5","5"\n'
+            )
+            # Incomplete line still being written
+            file.write('"19310","2023-06-03 00:02:00"')
+        self.assertEqual(data.ingest_appended_rows(), 2)
+        self.assertEqual(len(data.raw_data), raw_size + 2)
+        self.assertEqual(len(data.filtered_data), filtered_size + 1)
+        self.assertEqual(data.invalid_data[3001]["below_zero"]["power"], 2)
+        self.assertEqual(data.raw_data.index[-1], raw_size + 1)
+        self.assertEqual(data.ingest_appended_rows(), 0)
+
+        with open(self.csv_path, "a", encoding="utf-8") as file:
+            file.write(',"49.3","-123.2","200","9","12","12","9"\n')
+        self.assertEqual(data.ingest_appended_rows(), 1)
+        self.assertEqual(data.filtered_data["vessel_code"].iloc[-1], 19310)
+
+    def test_rewritten_csv_is_not_appended_to(self):
+        """
+        Test that a CSV rewritten in place with more bytes is reloaded in full rather
+        than parsed from the ingested offset.
+        """
+        data = MaritimeData(self.csv_path)
+        self.assertFalse(data.source_replaced())
+        with open(self.csv_path, "a", encoding="utf-8") as file:
+            file.write(CSV_ROWS[0].replace("00:00:00", "00:05:00") + "\n")
+        self.assertFalse(data.source_replaced())
+        self.assertEqual(data.ingest_appended_rows(), 1)
+        self.assertFalse(data.source_replaced())
+
+        inode = os.stat(self.csv_path).st_ino
+        write_csv(self.csv_path, [row.replace("10.5", "10.25") for row in CSV_ROWS * 2])
+        self.assertEqual(os.stat(self.csv_path).st_ino, inode)
+        self.assertGreater(os.path.getsize(self.csv_path), data.source.loaded_bytes)
+        self.assertTrue(data.source_replaced())
+
+    def test_vessel_index(self):
+        """
+        Test that vessel queries read the rows of the vessel from the index, in
+        chronological order, with the same rows as a scan of the whole fleet.
+        """
+        rows = [CSV_ROWS[5], CSV_ROWS[1], CSV_ROWS[7], CSV_ROWS[0], CSV_ROWS[6]]
+        rows += [CSV_ROWS[4], CSV_ROWS[2], CSV_ROWS[3]]
+        write_csv(self.csv_path, rows)
+        data = MaritimeData(self.csv_path)
+        self.assertEqual(list(data.rows.vessel_index.vessel_codes), [3001, 19310])
+        self.assertEqual(data.rows.vessel_index.bounds(3001), (0, 5))
+        self.assertEqual(len(data.rows.vessel_index.positions(9999)), 0)
+        records = data.get_vessel_records(3001, valid_only=False)
+        self.assertEqual(list(records.index), [3, 1, 6, 7, 5])
+        self.assertTrue(records["datetime"].is_monotonic_increasing)
+
+        indexed = {
+            "speed": data.get_speed_differences_for_vessel(19310),
+            "score": data.calculate_compliance_score(3001),
+            "invalid": list(
+                data.get_invalid_rows_for_vessel(
+                    3001, "missing_value", "latitude"
+                ).index
+            ),
+            "period": data.get_raw_metrics_for_vessel_period(
+                3001, "2023-06-01", "2023-06-02"
+            ),
+        }
+        data.rows = data.rows._replace(vessel_index=None)
+        self.assertEqual(indexed["speed"], data.get_speed_differences_for_vessel(19310))
+        self.assertEqual(indexed["score"], data.calculate_compliance_score(3001))
+        self.assertEqual(indexed["invalid"], [7])
+        scanned = data.get_raw_metrics_for_vessel_period(
+            3001, "2023-06-01", "2023-06-02"
+        )
+        self.assertEqual(list(indexed["period"].index), [3, 1, 6, 7, 5])
+        self.assertTrue(indexed["period"].sort_index().equals(scanned.sort_index()))
+
+    def test_vessel_index_merges_appended_rows(self):
+        """
+        Test that merging appended rows into the index gives the index built over all
+        rows, without changing the index merged into.
+        """
+        rng = np.random.default_rng(0)
+        codes = rng.choice([7, 3001, 19310, 20000], 500).astype(np.int32)
+        timestamps = np.datetime64("2023-06-01") + rng.integers(0, 50, 500).astype(
+            "m8[m]"
+        )
+        timestamps[rng.choice(500, 20)] = np.datetime64("NaT")
+        for split in (0, 1, 200, 499):
+            # The vessel 20000 only appears among the appended rows
+            codes[:split][codes[:split] == 20000] = 7
+            expected = VesselIndex.build(codes, timestamps)
+            index = VesselIndex.build(
+                codes[: max(split, 1)], timestamps[: max(split, 1)]
+            )
+            order = index.order.copy()
+            merged = index.append(
+                codes[max(split, 1) :], timestamps[max(split, 1) :], max(split, 1)
+            )
+            np.testing.assert_array_equal(index.order, order)
+            for name in ("order", "vessel_codes", "offsets", "timestamps"):
+                np.testing.assert_array_equal(
+                    getattr(merged, name), getattr(expected, name), name
+                )
+            self.assertEqual(merged.order.dtype, expected.order.dtype)
+
+        data = MaritimeData(self.csv_path)
+        with open(self.csv_path, "a", encoding="utf-8") as file:
+            file.write(CSV_ROWS[0].replace("00:00:00", "00:00:30") + "\n")
+            file.write(CSV_ROWS[0].replace('"3001"', '"7"') + "\n")
+        self.assertEqual(data.ingest_appended_rows(), 2)
+        self.assertEqual(list(data.rows.vessel_index.vessel_codes), [7, 3001, 19310])
+        self.assertEqual(
+            list(data.rows.vessel_index.positions(3001)), [0, 8, 1, 2, 3, 4]
+        )
+        self.assertEqual(list(data.rows.vessel_index.positions(7)), [9])
+
+    def test_mismatched_cached_vessel_index_rebuilt(self):
+        """
+        Test that cached index arrays covering another number of rows than the loaded
+        data are rebuilt instead of used.
+        """
+        MaritimeData(self.csv_path, cache_dir=self.cache_dir)
+        data = MaritimeData(self.csv_path, cache_dir=self.cache_dir)
+        shorter = VesselIndex.build(
+            data.raw_data["vessel_code"].to_numpy()[:5],
+            data.raw_data["datetime"].to_numpy()[:5],
+        )
+        data.cache.store_arrays(
+            self.csv_path,
+            "vessel_index",
+            {name: getattr(shorter, name) for name in VesselIndex.ARRAYS},
+        )
+        reloaded = MaritimeData(self.csv_path, cache_dir=self.cache_dir)
+        self.assertEqual(len(reloaded.rows.vessel_index.order), len(CSV_ROWS))
+        self.assertEqual(list(reloaded.rows.vessel_index.positions(19310)), [5, 6, 7])
+        self.assertEqual(
+            len(reloaded.cache.load_arrays(self.csv_path, "vessel_index")["order"]),
+            len(CSV_ROWS),
+        )
+
+    def test_period_lookup(self):
+        """
+        Test that period queries accept dates and ISO-8601 timestamps and locate the
+        rows of the vessel within the period by binary search.
+        """
+        data = MaritimeData(self.csv_path)
+        raw = data.get_raw_metrics_for_vessel_period(
+            3001, "2023-06-01T00:01:00", "2023-06-01T00:03:00.5"
+        )
+        self.assertEqual(list(raw.index), [1, 2, 3])
+        self.assertEqual(
+            list(
+                data.get_raw_metrics_for_vessel_period(
+                    3001, "2023-06-01T02:01:00+02:00", "2023-06-02"
+                ).index
+            ),
+            [1, 2, 3, 4],
+        )
+        self.assertEqual(
+            list(
+                data.get_metrics_for_vessel_period(
+                    3001, "2023-05-31T23:59:59Z", "2023-06-01T00:01:00Z"
+                ).index
+            ),
+            [0, 1],
+        )
+        self.assertEqual(
+            list(
+                data.rows.vessel_index.period(
+                    19310, *np.array(["2023-06-02", "2023-07-01"], "M8[s]")
+                )
+            ),
+            [7],
+        )
+        self.assertEqual(
+            len(
+                data.rows.vessel_index.period(
+                    9999, *np.array(["2023", "2024"], "M8[s]")
+                )
+            ),
+            0,
+        )
+        for start, end in (("2023-06-01", "June 2"), ("2023-06-02", "2023-06-01")):
+            with self.assertRaises(ValueError):
+                data.get_raw_metrics_for_vessel_period(3001, start, end)
+
+    def test_period_lookup_with_missing_timestamps(self):
+        """
+        Test that rows without a timestamp come first in the block of their vessel and
+        are never located within a period, as with a scan of the whole fleet.
+        """
+        write_csv(
+            self.csv_path,
+            [
+                CSV_ROWS[0],
+                '"3001","","10.3","-14.8","100","5","10","10.5","5"',
+                CSV_ROWS[4],
+                '"3001","2023-06-03 00:00:00","10.3","-14.8","100","5","10","10.5","5"',
+                '"3001","2023-06-04 00:00:00","10.3","-14.8","100","5","10","10.5","5"',
+            ],
+        )
+        data = MaritimeData(self.csv_path)
+        self.assertTrue(data.raw_data["datetime"].isna().iloc[1])
+        self.assertEqual(list(data.rows.vessel_index.positions(3001)), [1, 0, 2, 3, 4])
+        periods = [("2023-06-01", "2023-06-03"), ("2023-06-02", "2023-06-10")]
+        indexed = [
+            (
+                list(data.get_metrics_for_vessel_period(3001, *period).index),
+                list(data.get_raw_metrics_for_vessel_period(3001, *period).index),
+            )
+            for period in periods
+        ]
+        self.assertEqual(indexed, [([0, 3], [0, 2, 3]), ([3, 4], [2, 3, 4])])
+        data.rows = data.rows._replace(vessel_index=None)
+        self.assertEqual(
+            [
+                (
+                    list(data.get_metrics_for_vessel_period(3001, *period).index),
+                    list(data.get_raw_metrics_for_vessel_period(3001, *period).index),
+                )
+                for period in periods
+            ],
+            indexed,
+        )
+
+    def test_derived_columns(self):
+        """
+        Test that the speed metrics are derived once for every row, extended as rows are
+        appended, and served by the vessel queries.
+        """
+        data = MaritimeData(self.csv_path)
+        actual = data.raw_data["actual_speed_overground"]
+        proposed = data.raw_data["proposed_speed_overground"]
+        np.testing.assert_array_equal(
+            data.rows.derived_columns["speed_difference"], (actual - proposed).abs()
+        )
+        np.testing.assert_array_equal(
+            data.rows.derived_columns["speed_deviation_pct"],
+            (actual - proposed).abs() / proposed * 100,
+        )
+        self.assertEqual(
+            [
+                record["speed_difference"]
+                for record in data.get_speed_differences_for_vessel(19310, limit=1)
+            ],
+            [0.0],
+        )
+        self.assertEqual(
+            list(
+                data.get_metrics_for_vessel_period(3001, "2023-06-01", "2023-06-02")[
+                    "speed_difference"
+                ]
+            ),
+            [0.5, 0.5],
+        )
+
+        previous = data.rows.derived_columns
+        with open(self.csv_path, "a", encoding="utf-8") as file:
+            file.write(
+                '"19310","2023-06-03 00:01:00","49.3","-123.2","200","9","3","0","9"\n'
+            )
+        self.assertEqual(data.ingest_appended_rows(), 1)
+        self.assertEqual(len(previous["speed_difference"]), len(CSV_ROWS))
+        self.assertEqual(data.rows.derived_columns["speed_difference"][-1], 3)
+        # Rows with a proposed speed of zero have no deviation and are not scored
+        self.assertTrue(np.isnan(data.rows.derived_columns["speed_deviation_pct"][-1]))
+        self.assertEqual(data.calculate_compliance_score(19310), 97.92)
+
+    def test_partitioned_dataset(self):
+        """
+        Test that a directory of partitions loads like the single CSV and that period
+        queries are answered from the vessel index like on the single CSV.
+        """
+        data_dir = os.path.join(self.tmp_dir, "partitions")
+        for vessel_code in ("3001", "19310"):
+            os.makedirs(os.path.join(data_dir, vessel_code))
+            write_csv(
+                os.path.join(data_dir, vessel_code, "2023-06.csv"),
+                [row for row in CSV_ROWS if row.startswith(f'"{vessel_code}"')],
+            )
+        self.assertEqual(
+            list_partition_files(data_dir),
+            [os.path.join("19310", "2023-06.csv"), os.path.join("3001", "2023-06.csv")],
+        )
+        single = MaritimeData(self.csv_path)
+        MaritimeData(data_dir, cache_dir=self.cache_dir)
+        partitioned = MaritimeData(data_dir, cache_dir=self.cache_dir)
+        self.assertEqual(single.invalid_data, partitioned.invalid_data)
+
+        start, end = "2023-06-01", "2023-06-02"
+        self.assertIsNotNone(partitioned.rows.vessel_index)
+        for method in (
+            "get_metrics_for_vessel_period",
+            "get_raw_metrics_for_vessel_period",
+        ):
+            expected = getattr(single, method)(3001, start, end)
+            actual = getattr(partitioned, method)(3001, start, end)
+            self.assertTrue(
+                expected.reset_index(drop=True).equals(actual.reset_index(drop=True))
+            )
+        self.assertEqual(
+            len(partitioned.get_raw_metrics_for_vessel_period(19310, start, end)), 2
+        )
+
+        os.remove(os.path.join(data_dir, "19310", "2023-06.csv"))
+        self.assertTrue(partitioned.source_replaced())
+
+
+if __name__ == "__main__":
+    unittest.main()